@@ -0,0 +1,115 @@
+"""
+Kaltstart-Benchmark: Import-Profil von main und Detector-Kaltstart
+
+Aufruf:
+    python bench_startup.py                  # Import-Profil von main + 5 Messläufe
+    python bench_startup.py --runs 10 --budget-ms 300
+
+Jeder Messlauf startet einen frischen Interpreter, importiert nur den
+Detector, lädt den Snapshot (DETECTOR_SNAPSHOT_PATH) und fällt ein Urteil.
+Das ist eine Untergrenze, nicht die Zeit bis zum ersten Urteil des Bots:
+Import von main (FastAPI, Telegram), MongoDB-Verbindung und Vorladen fehlen.
+Maßgeblich ist `first_verdict_ms` unter /health -> startup des laufenden Bots.
+Liegt der Median über dem Budget, endet das Skript mit Exit-Code 1.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# Läuft im frischen Interpreter, gibt die Teilzeiten als JSON aus
+DETECTOR_COLD_START_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+from spam_detector import spam_detector
+t1 = time.perf_counter()
+snapshot = spam_detector.load_snapshot()
+t2 = time.perf_counter()
+spam_detector.detect_spam("Claim your airdrop now 🚀🚀 https://bit.ly/x", is_new_user=True)
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "snapshot_ms": (t2 - t1) * 1000,
+    "verdict_ms": (t3 - t2) * 1000,
+    "snapshot": snapshot,
+}))
+"""
+
+
+def import_profile(module: str, limit: int) -> Tuple[float, List[Tuple[str, float]]]:
+    """`python -X importtime` auswerten: Gesamtzeit und teuerste Top-Level-Pakete (ms)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import von {module} fehlgeschlagen:\n{result.stderr[-2000:]}")
+
+    top_level: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nur direkt importierte Module (Einrückung 1) zählen für die Gesamtzeit
+        if len(name) - len(name.lstrip(" ")) == 1:
+            top_level[name.strip()] = int(cumulative_us) / 1000
+
+    total = sum(top_level.values())
+    ranked = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return total, ranked
+
+
+def detector_cold_start(runs: int) -> List[Dict[str, float]]:
+    """Detector-Kaltstart (Import, Snapshot, ein Urteil) in `runs` frischen Interpretern messen"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", DETECTOR_COLD_START_SNIPPET],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Messlauf fehlgeschlagen:\n{result.stderr[-2000:]}")
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample["process_ms"] = (time.perf_counter() - started) * 1000
+        samples.append(sample)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Kaltstart-Benchmark für den Spam-Bot")
+    parser.add_argument("--module", default="main", help="Modul für das Import-Profil")
+    parser.add_argument("--runs", type=int, default=5, help="Anzahl Messläufe")
+    parser.add_argument("--top", type=int, default=15, help="Anzahl Pakete im Import-Profil")
+    parser.add_argument("--budget-ms", type=float, default=500.0, help="Budget für den Median des Detector-Kaltstarts")
+    args = parser.parse_args()
+
+    try:
+        total, ranked = import_profile(args.module, args.top)
+        print(f"📦 Import-Profil von {args.module}: {total:.0f} ms")
+        for name, ms in ranked:
+            print(f"   {ms:8.1f} ms  {name}")
+    except RuntimeError as e:
+        print(f"⚠️ {e}")
+
+    samples = detector_cold_start(args.runs)
+    median = statistics.median(sample["process_ms"] for sample in samples)
+    print(f"\n⚖️ Detector-Kaltstart ({args.runs} Läufe, Snapshot: {samples[0]['snapshot']})")
+    for key in ("import_ms", "snapshot_ms", "verdict_ms", "process_ms"):
+        values = [sample[key] for sample in samples]
+        print(f"   {key:18} median {statistics.median(values):7.1f} ms   min {min(values):7.1f} ms")
+
+    print("   (ohne main, MongoDB und Vorladen - echte Zeit: /health -> startup -> first_verdict_ms)")
+
+    if median > args.budget_ms:
+        print(f"\n❌ Budget überschritten: {median:.0f} ms > {args.budget_ms:.0f} ms")
+        return 1
+    print(f"\n✅ Im Budget: {median:.0f} ms <= {args.budget_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Kurzlebiger Async-Cache mit Single-Flight und Stale-While-Revalidate
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class AsyncTTLCache:
+    """
+    Cacht Ergebnisse teurer Abfragen für `ttl` Sekunden.
+
+    Gleichzeitige Aufrufer für denselben Schlüssel teilen sich eine laufende
+    Berechnung (Single-Flight). Ist ein Eintrag abgelaufen, aber jünger als
+    `ttl + stale_ttl`, wird der alte Wert sofort geliefert und im Hintergrund
+    neu geladen (Stale-While-Revalidate).
+
+    Schlüssel können aus Request-Parametern stammen: beim Einfügen werden
+    abgelaufene Einträge entfernt und über `max_entries` hinaus die am
+    längsten nicht genutzten verdrängt (LRU).
+    """
+
+    def __init__(
+        self,
+        ttl: float = config.STATS_CACHE_TTL,
+        stale_ttl: float = config.STATS_CACHE_STALE,
+        max_entries: int = config.STATS_CACHE_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        # key -> (geladen um, Wert), älteste Nutzung zuerst
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+
+    async def get(self, key: Hashable, loader: Loader) -> Any:
+        """Wert aus dem Cache oder über `loader` laden"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self.hits += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._load(key, loader)
+                return entry[1]
+
+        self.misses += 1
+        # shield: Abbruch eines Aufrufers bricht die geteilte Berechnung nicht ab
+        return await asyncio.shield(self._load(key, loader))
+
+    def _load(self, key: Hashable, loader: Loader) -> asyncio.Task:
+        """Laufende Berechnung zurückgeben oder eine neue starten"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, loader))
+            # Fehler einer Hintergrund-Aktualisierung sind bereits geloggt
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _refresh(self, key: Hashable, loader: Loader) -> Any:
+        try:
+            self.loads += 1
+            value = await loader()
+            self._store(key, value)
+            return value
+        except Exception as e:
+            self.load_errors += 1
+            logger.error(f"❌ Fehler beim Laden von Cache-Eintrag {key!r}: {e}")
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: Hashable, value: Any):
+        """Eintrag speichern, abgelaufene entfernen und auf max_entries begrenzen"""
+        now = time.monotonic()
+        self._entries[key] = (now, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) <= self.max_entries:
+            return
+
+        expired = [k for k, (loaded, _) in self._entries.items() if now - loaded >= self.ttl + self.stale_ttl]
+        for k in expired:
+            del self._entries[k]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable = None):
+        """Einen oder alle Einträge verwerfen"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+        }
+
+
+# Globaler Cache für Statistik-Abfragen (/health, /stats)
+stats_cache = AsyncTTLCache()
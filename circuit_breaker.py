@@ -0,0 +1,103 @@
+"""
+Circuit Breaker und Latenz-Statistiken für Datenbank-Aufrufe
+"""
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+
+
+class CircuitBreaker:
+    """
+    Öffnet nach `failure_threshold` aufeinanderfolgenden Fehlern.
+
+    Solange der Breaker offen ist, gehen Aufrufe direkt an den Fallback.
+    Ob die Gegenstelle wieder erreichbar ist, prüft ein Hintergrund-Probe,
+    der den Breaker per `reset()` wieder schließt.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = config.MONGODB_BREAKER_THRESHOLD):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def record_success(self):
+        self.consecutive_failures = 0
+
+    def record_failure(self, error: Exception):
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"[:200]
+        if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self):
+        """Breaker sofort öffnen (z.B. beim fehlgeschlagenen Verbindungsaufbau)"""
+        if self.state == OPEN:
+            return
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning(f"⚡ Circuit Breaker '{self.name}' offen: {self.last_error}")
+
+    def reset(self):
+        """Breaker nach erfolgreichem Probe schließen"""
+        if self.state == OPEN:
+            logger.info(f"✅ Circuit Breaker '{self.name}' geschlossen")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "open_for_s": round(time.monotonic() - self.opened_at, 1) if self.opened_at else None,
+            "last_error": self.last_error,
+        }
+
+
+class OperationStats:
+    """Anzahl, Fehler und Latenz pro Operation"""
+
+    __slots__ = ("count", "errors", "timeouts", "total_ms", "max_ms", "last_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, elapsed_ms: float, error: bool = False, timeout: bool = False):
+        self.count += 1
+        self.errors += error
+        self.timeouts += timeout
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "max_ms": round(self.max_ms, 1),
+            "last_ms": round(self.last_ms, 1),
+        }
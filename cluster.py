@@ -0,0 +1,355 @@
+"""
+Cluster-Modus: ein Poller (Leader-Lease), Worker pro Shard (chat_id), Zustand in MongoDB
+"""
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from telegram import Update
+from telegram.ext import Application, Updater
+
+import config
+from database import db
+from membership import MemberRecord, MembershipStore
+from startup import refresh_learned_keywords
+
+logger = logging.getLogger(__name__)
+
+POLLER_LEASE = "poller"
+
+
+def shard_for(chat_id: int, shards: int) -> int:
+    """Stabiler Shard pro Chat (alle Updates eines Chats landen beim selben Worker)"""
+    return chat_id % shards
+
+
+def update_chat_id(update: Update) -> int:
+    """Chat eines Updates, 0 für Updates ohne Chat (z.B. Inline-Queries)"""
+    chat = update.effective_chat
+    return chat.id if chat else 0
+
+
+class ClusterNode:
+    """
+    Eine Bot-Instanz im Cluster.
+
+    Alle Koordination läuft über Leases in MongoDB, die alle `lease_ttl / 3`
+    Sekunden verlängert werden:
+
+    - Wer die Poller-Lease hält, pollt Telegram (Ingress) und reiht jedes
+      Update mit seinem Shard (`chat_id % shards`) in die Update-Queue ein.
+      Fällt er aus, übernimmt eine andere Instanz nach Ablauf der Lease.
+    - Wer eine Shard-Lease hält, arbeitet die Updates dieses Shards der Reihe
+      nach ab. CAPTCHA-Batches und Neue-User-Fenster eines Chats liegen
+      damit immer bei genau einem Worker.
+    - Whitelist, Einstellungen und gelernte Keywords werden neu geladen,
+      sobald sich der Änderungszähler (`state_version`) ändert, Beitritte und
+      Verifizierungen in MongoDB gesichert und bei Shard-Übernahme geladen.
+
+    Schlägt die Verlängerung einer Lease fehl, läuft die Arbeit weiter, bis
+    die Lease vor dem nächsten Durchlauf ablaufen würde; dann stoppt der
+    Knoten Ingress bzw. Worker, bevor ein anderer übernehmen kann.
+    """
+
+    def __init__(
+        self,
+        node_id: str = config.CLUSTER_NODE_ID,
+        shards: int = config.CLUSTER_SHARDS,
+        max_shards: int = config.CLUSTER_MAX_SHARDS_PER_NODE,
+        lease_ttl: float = config.CLUSTER_LEASE_TTL
+    ):
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.shards = shards
+        self.max_shards = max_shards or shards
+        self.lease_ttl = lease_ttl
+
+        self.application: Optional[Application] = None
+        self.membership: Optional[MembershipStore] = None  # Store des (einzigen) Tenants
+        self.is_leader = False
+        self._updater: Optional[Updater] = None
+        self._ingress_queue: Optional[asyncio.Queue] = None
+        self._forwarder: Optional[asyncio.Task] = None
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._pending_writes: Set[asyncio.Task] = set()
+        self._draining: Set[asyncio.Task] = set()  # Forwarder abgegebener Ingress-Phasen
+        self._synced_version: Optional[int] = None  # Änderungszähler beim letzten Sync
+        self._renewed: Dict[str, float] = {}  # Lease -> letzte erfolgreiche Verlängerung (Loop-Zeit)
+
+        self.stats = {"forwarded": 0, "processed": 0, "failed": 0, "takeovers": 0}
+
+    # ===== Lebenszyklus =====
+
+    async def start(self, application: Application):
+        """Leases übernehmen und Koordinations-Loop starten (Application ist gestartet)"""
+        self.application = application
+        self.membership = application.bot_data["tenant"].membership
+        self.membership.on_change = self._persist_member
+        await self._tick()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🛰️ Cluster-Knoten {self.node_id} gestartet ({self.shards} Shards)")
+
+    async def stop(self):
+        """Ingress und Worker stoppen, Leases freigeben"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader:
+            await self._stop_ingress()
+            # Sofort freigeben, damit ein anderer Knoten nicht bis zum Ablauf wartet
+            await db.release_lease(POLLER_LEASE, self.node_id)
+        for shard in list(self._workers):
+            await self._stop_worker(shard)
+        if self.membership:
+            self.membership.on_change = None
+        if self._pending_writes or self._draining:
+            await asyncio.gather(*self._pending_writes, *self._draining, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                await self._tick()
+            except Exception as e:
+                logger.error(f"❌ Cluster-Koordination fehlgeschlagen: {e}")
+
+    async def _tick(self):
+        """Leases verlängern/übernehmen und lokale Caches synchronisieren"""
+        leader = await self._renew(POLLER_LEASE)
+        if leader is None:
+            leader = self.is_leader and not self._expiring(POLLER_LEASE)
+        if leader and not self.is_leader:
+            await self._start_ingress()
+        elif not leader and self.is_leader:
+            await self._stop_ingress()
+
+        self._reap_workers()
+        for shard in range(self.shards):
+            owned = shard in self._workers
+            if not owned and len(self._workers) >= self.max_shards:
+                continue
+            acquired = await self._renew(f"shard:{shard}")
+            if acquired is None:
+                acquired = owned and not self._expiring(f"shard:{shard}")
+            if acquired and not owned:
+                await self._start_worker(shard)
+            elif not acquired and owned:
+                await self._stop_worker(shard)
+
+        await self._sync_state()
+
+    async def _renew(self, lease: str) -> Optional[bool]:
+        """Lease übernehmen/verlängern, None wenn der Ausgang unbekannt ist (Fehler)"""
+        started = asyncio.get_running_loop().time()
+        try:
+            acquired = await db.acquire_lease(lease, self.node_id, self.lease_ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Lease {lease} nicht verlängerbar: {e}")
+            return None
+        if acquired:
+            self._renewed[lease] = started
+        else:
+            self._renewed.pop(lease, None)
+        return acquired
+
+    def _expiring(self, lease: str) -> bool:
+        """True wenn die Lease vor dem nächsten Durchlauf abläuft (oder nie verlängert wurde)"""
+        renewed = self._renewed.get(lease)
+        if renewed is None:
+            return True
+        return asyncio.get_running_loop().time() - renewed >= self.lease_ttl * 2 / 3
+
+    def _reap_workers(self):
+        """
+        Unerwartet beendete Worker austragen. Ihre Lease gehört noch diesem
+        Knoten, der Shard wird daher im selben Durchlauf neu gestartet.
+        """
+        for shard, task in list(self._workers.items()):
+            if not task.done():
+                continue
+            del self._workers[shard]
+            error = "abgebrochen" if task.cancelled() else task.exception()
+            logger.error(f"❌ Shard {shard}: Worker beendet ({error}), starte neu")
+
+    async def _sync_state(self):
+        """
+        Änderungen anderer Worker übernehmen (Einstellungen vor Keywords: enthält
+        die Version). Nur wenn sich der Änderungszähler in MongoDB geändert hat -
+        sonst kostet ein Durchlauf eine einzige Abfrage.
+        """
+        version = await db.get_state_version()
+        if version is None or version == self._synced_version:
+            return
+        await db.load_settings()
+        await db.load_whitelist()
+        await refresh_learned_keywords()
+        self._synced_version = version
+
+    # ===== Ingress (nur Leader) =====
+
+    async def _start_ingress(self):
+        self.is_leader = True
+        self._ingress_queue = asyncio.Queue()
+        self._updater = Updater(self.application.bot, self._ingress_queue)
+        await self._updater.initialize()
+        # Offene Updates nicht verwerfen: ein neuer Leader setzt dort fort, wo der alte aufhörte
+        await self._updater.start_polling(drop_pending_updates=False)
+        self._forwarder = asyncio.create_task(self._forward(self._ingress_queue))
+        logger.info(f"👑 {self.node_id} ist Poller (Leader)")
+
+    async def _stop_ingress(self):
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        if self._updater:
+            await self._updater.stop()
+            await self._updater.shutdown()
+            self._updater = None
+        if self._forwarder:
+            # Empfangene Updates sind bei Telegram bereits bestätigt: der Forwarder
+            # leert die Queue bis zum Ende-Marker und beendet sich dann selbst
+            self._ingress_queue.put_nowait(None)
+            self._draining.add(self._forwarder)
+            self._forwarder.add_done_callback(self._draining.discard)
+            self._forwarder = None
+            self._ingress_queue = None
+        logger.warning(f"👑 {self.node_id} ist nicht mehr Poller")
+
+    async def _forward(self, queue: asyncio.Queue):
+        """Empfangene Updates gebündelt in die Update-Queue schreiben (bis zum Ende-Marker None)"""
+        finished = False
+        while not finished:
+            batch: List[Update] = []
+            update = await queue.get()
+            while update is not None:
+                batch.append(update)
+                if len(batch) >= config.CLUSTER_BATCH_SIZE or queue.empty():
+                    break
+                update = queue.get_nowait()
+            finished = update is None
+            if not batch:
+                continue
+
+            docs = [
+                {
+                    "shard": shard_for(update_chat_id(update), self.shards),
+                    "update": update.to_dict(),
+                    "enqueued_at": datetime.utcnow(),
+                }
+                for update in batch
+            ]
+            # Bis MongoDB die Updates angenommen hat erneut versuchen (nichts verwerfen)
+            while True:
+                try:
+                    await db.enqueue_updates(docs)
+                    break
+                except Exception as e:
+                    logger.warning(f"⚠️ Updates nicht einreihbar, neuer Versuch: {e}")
+                    await asyncio.sleep(1)
+            self.stats["forwarded"] += len(docs)
+
+    # ===== Worker (pro Shard) =====
+
+    async def _start_worker(self, shard: int):
+        """Shard übernehmen: gesicherte Mitglieder laden, dann Updates abarbeiten"""
+        restored = 0
+        for doc in await db.load_members(shard):
+            self.membership.restore(doc["chat_id"], doc["user_id"], doc["joined_at"], doc.get("verified_at", 0))
+            restored += 1
+        self._workers[shard] = asyncio.create_task(self._work(shard))
+        self.stats["takeovers"] += 1
+        logger.info(f"🧩 Shard {shard} übernommen ({restored} Mitglieder geladen)")
+
+    async def _stop_worker(self, shard: int):
+        task = self._workers.pop(shard, None)
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            self._renewed.pop(f"shard:{shard}", None)
+            try:
+                await db.release_lease(f"shard:{shard}", self.node_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Lease shard:{shard} nicht freigegeben (läuft ab): {e}")
+            logger.info(f"🧩 Shard {shard} abgegeben")
+
+    async def _work(self, shard: int):
+        """
+        Updates des Shards in Reihenfolge verarbeiten und danach bestätigen.
+        Stirbt der Worker vor der Bestätigung, verarbeitet der Nachfolger
+        den Batch erneut (at-least-once).
+        """
+        while True:
+            try:
+                docs = await db.next_updates(shard, config.CLUSTER_BATCH_SIZE)
+            except Exception as e:
+                logger.warning(f"⚠️ Shard {shard}: Update-Queue nicht lesbar: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            if not docs:
+                await asyncio.sleep(config.CLUSTER_POLL_INTERVAL)
+                continue
+
+            for doc in docs:
+                try:
+                    update = Update.de_json(doc["update"], self.application.bot)
+                    await self.application.process_update(update)
+                    self.stats["processed"] += 1
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.error(f"❌ Shard {shard}: Update {doc['_id']} fehlgeschlagen: {e}")
+
+            # Bis zur Bestätigung erneut versuchen: ein Fehler darf den Worker nicht beenden
+            ids = [doc["_id"] for doc in docs]
+            while True:
+                try:
+                    await db.ack_updates(ids)
+                    break
+                except Exception as e:
+                    logger.warning(f"⚠️ Shard {shard}: Bestätigung fehlgeschlagen, neuer Versuch: {e}")
+                    await asyncio.sleep(1)
+
+    # ===== Gemeinsamer Zustand =====
+
+    def _persist_member(self, chat_id: int, user_id: int, record: MemberRecord):
+        """Beitritt/Verifizierung im Hintergrund sichern (Handler warten nicht)"""
+        task = asyncio.create_task(db.save_member(
+            chat_id, user_id,
+            shard_for(chat_id, self.shards),
+            record.joined_at,
+            record.verified_at,
+            record.joined_at + self.membership.window
+        ))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def status(self) -> Dict[str, Any]:
+        """Zustand für /health"""
+        try:
+            queue_depth = await db.update_queue_depth()
+            leases = {
+                lease["_id"]: {"owner": lease["owner"], "expires_at": lease["expires_at"].isoformat()}
+                for lease in await db.get_leases()
+            }
+        except Exception as e:
+            queue_depth, leases = None, {"error": str(e)}
+
+        return {
+            "node_id": self.node_id,
+            "leader": self.is_leader,
+            "shards": self.shards,
+            "owned_shards": sorted(self._workers),
+            "queue_depth": queue_depth,
+            "leases": leases,
+            **self.stats,
+        }
+
+
+# Globale Cluster-Instanz (nur im Cluster-Modus gestartet)
+cluster = ClusterNode()
@@ -0,0 +1,85 @@
+"""
+Lokaler Cluster-Test: startet mehrere Bot-Instanzen im Cluster-Modus
+
+Als MongoDB-Ersatz genügt ein lokaler mongod, z.B.:
+    docker run --rm -p 27017:27017 mongo:7
+
+Aufruf:
+    TELEGRAM_TOKEN=... python cluster_local.py --nodes 3 --shards 6
+
+Jede Instanz bekommt eine eigene Node-ID, einen eigenen HTTP-Port
+(8000, 8001, ...) und einen eigenen SQLite-Fallback. Der kompilierte
+Keyword-Matcher wird geteilt (eine Datei, von allen Instanzen gemappt).
+Zustand der Leases und Shards: GET http://localhost:800X/health → cluster.
+Beenden einer Instanz (oder Strg+C) testet die Übernahme nach CLUSTER_LEASE_TTL.
+"""
+import argparse
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+from typing import List
+
+
+def _pipe_output(prefix: str, process: subprocess.Popen):
+    for line in process.stdout:
+        sys.stdout.write(f"[{prefix}] {line}")
+    sys.stdout.flush()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mehrere Bot-Instanzen lokal im Cluster-Modus starten")
+    parser.add_argument("--nodes", type=int, default=3, help="Anzahl Instanzen")
+    parser.add_argument("--shards", type=int, default=6, help="Anzahl Shards (CLUSTER_SHARDS)")
+    parser.add_argument("--base-port", type=int, default=8000, help="HTTP-Port der ersten Instanz")
+    parser.add_argument("--mongodb-url", default=os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--lease-ttl", type=float, default=6, help="CLUSTER_LEASE_TTL (kurz für schnelle Übernahme)")
+    args = parser.parse_args()
+
+    if not os.getenv("TELEGRAM_TOKEN"):
+        print("❌ TELEGRAM_TOKEN nicht gesetzt")
+        return 1
+
+    os.makedirs(".cluster", exist_ok=True)
+    processes: List[subprocess.Popen] = []
+    for index in range(args.nodes):
+        node_id = f"node-{index}"
+        env = dict(
+            os.environ,
+            CLUSTER_MODE="true",
+            CLUSTER_NODE_ID=node_id,
+            CLUSTER_SHARDS=str(args.shards),
+            # Shards gleichmäßig verteilen statt alle bei der ersten Instanz
+            CLUSTER_MAX_SHARDS_PER_NODE=str(math.ceil(args.shards / args.nodes)),
+            CLUSTER_LEASE_TTL=str(args.lease_ttl),
+            MONGODB_URL=args.mongodb_url,
+            PORT=str(args.base_port + index),
+            SQLITE_FALLBACK_PATH=f".cluster/{node_id}-fallback.db",
+            # Gemeinsamer Matcher für alle Instanzen (ein Mal gebaut, von allen gemappt)
+            DETECTOR_SNAPSHOT_PATH=".cluster/detector_snapshot.bin",
+            LOG_FORMAT=os.getenv("LOG_FORMAT", "text"),
+        )
+        process = subprocess.Popen(
+            [sys.executable, "main.py"],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        threading.Thread(target=_pipe_output, args=(node_id, process), daemon=True).start()
+        processes.append(process)
+        print(f"🚀 {node_id} gestartet (PID {process.pid}, Port {args.base_port + index})")
+
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        print("\n🛑 Stoppe Cluster...")
+        for process in processes:
+            process.send_signal(signal.SIGINT)
+        for process in processes:
+            process.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
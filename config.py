@@ -2,14 +2,29 @@
 Zentrale Konfiguration für den Telegram Anti-Spam Bot
 """
 import os
-from typing import List
+from typing import Dict, List
 
 # Telegram Bot Token
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
 
+# Mehrere Bots in einem Prozess: TELEGRAM_TOKENS=name=token,name2=token2 (leer = nur TELEGRAM_TOKEN)
+# Pro Tenant zusätzliche Keywords/Domains: TENANT_<NAME>_KEYWORDS, TENANT_<NAME>_DOMAINS
+TELEGRAM_TOKENS = os.getenv("TELEGRAM_TOKENS", "")
+
 # MongoDB Connection
 MONGODB_URL = os.getenv("MONGODB_URL", "")
 
+# Timeouts des MongoDB-Clients (Server-Auswahl, Verbindung, Socket) in Millisekunden
+MONGODB_TIMEOUT_MS = int(os.getenv("MONGODB_TIMEOUT_MS", "5000"))
+
+# Zeitbudget pro Aufruf (Sekunden): Lesen im Nachrichtenpfad / gebündeltes Schreiben
+MONGODB_OP_TIMEOUT = float(os.getenv("MONGODB_OP_TIMEOUT", "2"))
+MONGODB_WRITE_TIMEOUT = float(os.getenv("MONGODB_WRITE_TIMEOUT", "10"))
+
+# Circuit Breaker: nach N Fehlern in Folge auf Fallback umschalten, Probe-Intervall in Sekunden
+MONGODB_BREAKER_THRESHOLD = int(os.getenv("MONGODB_BREAKER_THRESHOLD", "3"))
+MONGODB_PROBE_INTERVAL = float(os.getenv("MONGODB_PROBE_INTERVAL", "10"))
+
 # Admin User IDs (komma-separiert in Railway Variable)
 # Beispiel in Railway: ADMIN_USER_IDS=539342443,123456789,987654321
 admin_ids_str = os.getenv("ADMIN_USER_IDS", os.getenv("ADMIN_USER_ID", "539342443"))
@@ -24,6 +39,38 @@ ADMIN_USER_ID = ADMIN_USER_IDS[0]
 # Server Port
 PORT = int(os.getenv("PORT", "8000"))
 
+# Token für geschützte Admin-Endpoints (/export), leer = deaktiviert
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+# Dokumente pro Cursor-Batch beim NDJSON-Export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Sampling-Profiler (/profile): Abtastintervall und maximale Dauer
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Event-Loop-Monitor: Messintervall (Sekunden) und Schwelle für Blockaden (Millisekunden)
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100"))
+
+# Logging: Level, Format ("json" oder "text"), maximale Queue-Länge des Writer-Threads
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Rate-Limit für Einträge pro Nachricht (pro Aufrufstelle): Einträge/Sekunde und Burst
+LOG_RATE_PER_SECOND = float(os.getenv("LOG_RATE_PER_SECOND", "5"))
+LOG_RATE_BURST = float(os.getenv("LOG_RATE_BURST", "20"))
+
+# Cluster-Modus: mehrere Instanzen teilen sich Updates nach chat_id (erfordert MongoDB)
+CLUSTER_MODE = os.getenv("CLUSTER_MODE", "false").lower() in ("1", "true", "yes")
+CLUSTER_NODE_ID = os.getenv("CLUSTER_NODE_ID", "")  # leer = hostname-pid
+CLUSTER_SHARDS = int(os.getenv("CLUSTER_SHARDS", "8"))
+CLUSTER_MAX_SHARDS_PER_NODE = int(os.getenv("CLUSTER_MAX_SHARDS_PER_NODE", "0"))  # 0 = alle
+CLUSTER_LEASE_TTL = float(os.getenv("CLUSTER_LEASE_TTL", "15"))  # Sekunden bis zur Übernahme
+CLUSTER_POLL_INTERVAL = float(os.getenv("CLUSTER_POLL_INTERVAL", "0.2"))  # Worker: Pause bei leerer Queue
+CLUSTER_BATCH_SIZE = int(os.getenv("CLUSTER_BATCH_SIZE", "50"))
+
 # Spam Detection Keywords
 SPAM_KEYWORDS: List[str] = [
     # Crypto/Trading
@@ -91,10 +138,92 @@ SUSPICIOUS_DOMAINS: List[str] = [
 SPAM_KEYWORD_THRESHOLD = 3  # Anzahl Keywords für Spam
 EMOJI_THRESHOLD = 10  # Anzahl Emojis (mit Links) für Spam
 NEW_USER_KEYWORD_THRESHOLD = 2  # Niedrigere Schwelle für neue User
+MEDIA_KEYWORD_THRESHOLD = 2  # Noch niedrigere Schwelle für Nachrichten mit Media
+SPAM_SCORE_THRESHOLD = 50  # Spam ab diesem Score
+
+# Punkte pro Regel in detect_spam (Keywords: keywords_base + keyword_each * Anzahl)
+SPAM_WEIGHTS: Dict[str, int] = {
+    "suspicious_link": 50,
+    "keywords_base": 30,
+    "keyword_each": 5,
+    "emoji_links": 25,
+    "caps": 15,
+    "repeated_chars": 10,
+    "new_user": 20,
+    "media_keywords": 20,
+}
 
 # New User Detection (in Sekunden)
 NEW_USER_WINDOW = 604800  # 7 Tage - User gilt als "neu" wenn vor weniger als 7 Tagen beigetreten
 # Neue User dürfen in dieser Zeit keine Videos/Fotos/Dokumente posten (nur Text)
 
+# Shadow-Mode: Kandidaten-Detector (JSON, z.B. aus tuner.py) parallel zum Live-Detector
+SHADOW_CANDIDATE_PATH = os.getenv("SHADOW_CANDIDATE_PATH", "")  # leer = aus
+SHADOW_BUDGET_MS = float(os.getenv("SHADOW_BUDGET_MS", "2"))  # Kein Limit pro Aufruf: Überschreitungen zählen
+SHADOW_MAX_OVERRUNS = int(os.getenv("SHADOW_MAX_OVERRUNS", "5"))  # Überschreitungen in Folge bis zur Pause
+SHADOW_TIMEOUT_MS = float(os.getenv("SHADOW_TIMEOUT_MS", "100"))  # Hartes Limit pro Urteil (pausiert sofort)
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "1000"))
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "1.0"))  # Anteil bewerteter Nachrichten
+
+# Pruning gelernter Keywords (keyword_pruning.py), Intervall in Sekunden (0 = aus)
+KEYWORD_PRUNE_INTERVAL = float(os.getenv("KEYWORD_PRUNE_INTERVAL", "21600"))
+KEYWORD_PRUNE_MIN_AGE_DAYS = int(os.getenv("KEYWORD_PRUNE_MIN_AGE_DAYS", "14"))  # Schonfrist ab Hinzufügen bzw. Beginn der Zählung
+KEYWORD_PRUNE_MIN_SPAM_HITS = int(os.getenv("KEYWORD_PRUNE_MIN_SPAM_HITS", "1"))  # Weniger Spam-Treffer = nutzlos
+KEYWORD_PRUNE_MIN_HITS_FOR_RATIO = int(os.getenv("KEYWORD_PRUNE_MIN_HITS_FOR_RATIO", "50"))
+KEYWORD_PRUNE_MIN_SPAM_RATIO = float(os.getenv("KEYWORD_PRUNE_MIN_SPAM_RATIO", "0.2"))  # Spam-Anteil der Treffer
+KEYWORD_PRUNE_MIN_FALSE_POSITIVES = int(os.getenv("KEYWORD_PRUNE_MIN_FALSE_POSITIVES", "2"))
+KEYWORD_PRUNE_MIN_PRECISION = float(os.getenv("KEYWORD_PRUNE_MIN_PRECISION", "0.7"))
+KEYWORD_PRUNE_DRY_RUN = os.getenv("KEYWORD_PRUNE_DRY_RUN", "false").lower() in ("1", "true", "yes")
+
+# Intervall für das Aufräumen abgelaufener Neue-User-Einträge (in Sekunden)
+MEMBERSHIP_SWEEP_INTERVAL = int(os.getenv("MEMBERSHIP_SWEEP_INTERVAL", "600"))
+
+# CAPTCHA Settings
+CAPTCHA_TIMEOUT = int(os.getenv("CAPTCHA_TIMEOUT", "120"))  # Sekunden bis zum Kick
+# Beitritte innerhalb dieses Fensters (Sekunden) teilen sich eine CAPTCHA-Nachricht
+CAPTCHA_BATCH_WINDOW = float(os.getenv("CAPTCHA_BATCH_WINDOW", "3"))
+CAPTCHA_BATCH_MAX_USERS = int(os.getenv("CAPTCHA_BATCH_MAX_USERS", "20"))
+# Verzögerung, um mehrere Lösungen zu einem Nachrichten-Edit zusammenzufassen
+CAPTCHA_EDIT_DELAY = float(os.getenv("CAPTCHA_EDIT_DELAY", "1"))
+
+# Restrict-on-Join: neue User bis zum gelösten CAPTCHA stummschalten statt Nachrichten zu löschen
+CAPTCHA_RESTRICT_ON_JOIN = os.getenv("CAPTCHA_RESTRICT_ON_JOIN", "false").lower() in ("1", "true", "yes")
+RESTRICT_RATE_PER_SECOND = float(os.getenv("RESTRICT_RATE_PER_SECOND", "10"))  # Max. restrict-Calls pro Sekunde
+RESTRICT_BATCH_SIZE = int(os.getenv("RESTRICT_BATCH_SIZE", "25"))
+
+# Write-Behind Buffer für Event-Logs (messages, spam_reports, captcha_kicks, media_blocks)
+WRITE_BUFFER_MAX_SIZE = int(os.getenv("WRITE_BUFFER_MAX_SIZE", "10000"))  # Max. gepufferte Dokumente
+WRITE_BUFFER_BATCH_SIZE = int(os.getenv("WRITE_BUFFER_BATCH_SIZE", "500"))  # Flush ab dieser Anzahl pro Collection
+WRITE_BUFFER_FLUSH_INTERVAL = float(os.getenv("WRITE_BUFFER_FLUSH_INTERVAL", "2"))  # Spätestens alle X Sekunden
+WRITE_BUFFER_POLICY = os.getenv("WRITE_BUFFER_POLICY", "drop")  # "drop" oder "block" bei voller Queue
+
+# Intervall (Sekunden) für das Schreiben der vorab aggregierten Statistik-Zähler
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("ROLLUP_FLUSH_INTERVAL", "10"))
+
+# Cache für Statistik-Abfragen: frisch für TTL Sekunden, danach noch STALE Sekunden
+# sofort ausgeliefert, während im Hintergrund neu geladen wird
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "5"))
+STATS_CACHE_STALE = float(os.getenv("STATS_CACHE_STALE", "60"))
+STATS_CACHE_MAX_ENTRIES = int(os.getenv("STATS_CACHE_MAX_ENTRIES", "1000"))  # Darüber LRU-Verdrängung
+
+# Aufbewahrung (Tage) pro Collection, 0 = unbegrenzt (TTL-Index auf timestamp bzw. hour).
+# Opt-in: ein TTL löscht beim ersten Start sofort die ältere Historie (Tuner, Pruning-Statistik)
+RETENTION_DAYS = {
+    "messages": int(os.getenv("RETENTION_DAYS_MESSAGES", "0")),
+    "spam_reports": int(os.getenv("RETENTION_DAYS_SPAM_REPORTS", "0")),
+    "captcha_kicks": int(os.getenv("RETENTION_DAYS_CAPTCHA_KICKS", "0")),
+    "media_blocks": int(os.getenv("RETENTION_DAYS_MEDIA_BLOCKS", "0")),
+    "hourly_stats": int(os.getenv("RETENTION_DAYS_HOURLY_STATS", "0")),
+    "shadow_disagreements": int(os.getenv("RETENTION_DAYS_SHADOW_DISAGREEMENTS", "0")),
+}
+
+# SQLite-Fallback (lokale Kopie + Puffer für Schreibzugriffe während MongoDB-Ausfällen)
+SQLITE_FALLBACK_PATH = os.getenv("SQLITE_FALLBACK_PATH", "fallback.db")
+SQLITE_REPLAY_BATCH_SIZE = int(os.getenv("SQLITE_REPLAY_BATCH_SIZE", "1000"))
+SQLITE_MAX_EVENTS = int(os.getenv("SQLITE_MAX_EVENTS", "500000"))  # Älteste Events darüber verwerfen (0 = unbegrenzt)
+
+# Detector-Snapshot: kompilierter Keyword-Matcher (mmap, von allen Prozessen des Hosts geteilt)
+DETECTOR_SNAPSHOT_PATH = os.getenv("DETECTOR_SNAPSHOT_PATH", "detector_snapshot.bin")
+
 # Whitelist Settings
 WHITELIST_ENABLED = True
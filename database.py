@@ -1,14 +1,68 @@
 """
 MongoDB Datenbank-Handler
 """
+import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, AsyncIterator, Awaitable, Callable, List, Set, Tuple, Union
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, ServerSelectionTimeoutError
 import config
+from circuit_breaker import CircuitBreaker, OperationStats
+from fallback_store import SQLiteFallbackStore
+from metrics import MONGODB_OPERATION_ERRORS_TOTAL, MONGODB_OPERATION_SECONDS
+from rollups import GLOBAL_CHAT_ID, MAX_RANGE, RollupBuffer, decode_field, encode_field, hour_bucket
+from write_buffer import WriteBehindBuffer
 
 logger = logging.getLogger(__name__)
 
+# Event Collections mit Zeitstempel (Retention per TTL-Index)
+EVENT_COLLECTIONS = ["messages", "spam_reports", "captcha_kicks", "media_blocks"]
+
+# MongoDB Fehlercode für doppelte Schlüssel (beim Replay bereits übertragener Events)
+DUPLICATE_KEY_ERROR = 11000
+
+# Per /export streambare Collections und ihr Zeitfeld für since/until
+EXPORT_COLLECTIONS = {
+    "spam_reports": "timestamp",
+    "messages": "timestamp",
+    "learned_keywords": "added_at",
+    "whitelist": "added_at",
+    "feedback": "timestamp",
+}
+
+# Settings-Key der Keyword-Version (wird bei jeder Änderung der gelernten Keywords erhöht)
+KEYWORDS_VERSION_KEY = "keywords_version"
+
+# Settings-Key: Zähler für jede Änderung an Einstellungen, Whitelist oder Keywords
+# (Cluster-Worker laden ihren Zustand nur neu, wenn er sich geändert hat)
+STATE_VERSION_KEY = "state_version"
+
+# Trefferzähler pro gelerntem Keyword (Rollups) und Admin-Feedback (/spam, /notspam)
+KEYWORD_STATS_COLLECTION = "keyword_stats"
+FEEDBACK_COLLECTION = "feedback"
+
+# Settings-Key: Beginn der Trefferzählung (Schonfrist des Prunings läuft frühestens ab hier)
+KEYWORD_STATS_STARTED_KEY = "keyword_stats_started_at"
+
+# Settings-Key: Stunden-Rollups wurden aus den Event-Collections nachgetragen
+HOURLY_STATS_SEEDED_KEY = "hourly_stats_seeded_at"
+
+# Zeitstempel auf die volle Stunde abrunden (Aggregation, ab MongoDB 4.0)
+_HOUR_EXPR = {"$subtract": ["$timestamp", {"$mod": [{"$toLong": "$timestamp"}, 3600 * 1000]}]}
+
+# Shadow-Mode: Verdict-Matrix pro Kandidat und Tag (Rollups), einzelne Abweichungen
+SHADOW_STATS_COLLECTION = "shadow_stats"
+SHADOW_DISAGREEMENTS_COLLECTION = "shadow_disagreements"
+
+# Cluster-Modus: Leases (Poller, Shards), Update-Queue und Mitglieder-Zustand
+LEASES_COLLECTION = "cluster_leases"
+UPDATE_QUEUE_COLLECTION = "update_queue"
+MEMBERS_COLLECTION = "members"
+
 
 class Database:
     """MongoDB Datenbank Handler mit Fallback"""
@@ -16,7 +70,30 @@ class Database:
     def __init__(self):
         self.client: Optional[AsyncIOMotorClient] = None
         self.db: Optional[AsyncIOMotorDatabase] = None
-        self.available = False
+        
+        # Bei gehäuften Fehlern/Timeouts sofort auf den Fallback umschalten
+        self.breaker = CircuitBreaker("mongodb")
+        self.op_stats: Dict[str, OperationStats] = {}
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._recovery_hooks: List[Callable[[], Awaitable[Any]]] = []
+        
+        # Write-Behind Buffer für Event-Logs (messages, spam_reports, ...)
+        self.buffer = WriteBehindBuffer(self._insert_batch)
+        
+        # Vorab aggregierte Zähler (daily_stats, hourly_stats)
+        self.rollups = RollupBuffer(self._write_rollups)
+        
+        # Lokaler SQLite-Speicher während MongoDB-Ausfällen (Replay nach Reconnect)
+        self.fallback = SQLiteFallbackStore()
+        self._replay_lock = asyncio.Lock()
+        self._replay_task: Optional[asyncio.Task] = None
+        self.replayed_events = 0
+        self.skipped_events = 0  # Ohne MONGODB_URL nicht gepuffert (kein Replay-Ziel)
+        
+        # Beim Start vorgeladene Caches (None = nicht geladen, direkt in DB nachschlagen)
+        self.whitelist_cache: Optional[Set[int]] = None
+        self.settings_cache: Optional[Dict[str, Any]] = None
+        self.settings_from_mongodb = False  # Cache aus MongoDB (sonst SQLite-Kopie)
         
         # Fallback Stats (wenn MongoDB nicht verfügbar)
         self.fallback_stats = {
@@ -25,35 +102,45 @@ class Database:
             "last_reset": datetime.utcnow().date()
         }
     
+    @property
+    def available(self) -> bool:
+        """MongoDB verbunden und Circuit Breaker geschlossen"""
+        return self.db is not None and not self.breaker.is_open
+    
     async def connect(self) -> bool:
         """Verbindung zu MongoDB herstellen"""
+        # Gebündeltes Schreiben läuft immer, ohne MongoDB landen Events in SQLite
+        self.buffer.start()
+        self.rollups.start()
+        
         if not config.MONGODB_URL:
-            logger.warning("⚠️ MONGODB_URL nicht gesetzt - verwende Fallback")
+            logger.warning("⚠️ MONGODB_URL nicht gesetzt - verwende SQLite-Fallback")
             return False
         
         try:
             logger.info("🔄 Verbinde mit MongoDB...")
             logger.info(f"📍 MongoDB URL: {config.MONGODB_URL[:30]}...")
             
+            # Kurze Timeouts: ein langsamer Cluster darf keinen Handler blockieren
             self.client = AsyncIOMotorClient(
                 config.MONGODB_URL,
-                serverSelectionTimeoutMS=30000,  # 30 Sekunden statt 5
-                connectTimeoutMS=30000,
-                socketTimeoutMS=30000
+                serverSelectionTimeoutMS=config.MONGODB_TIMEOUT_MS,
+                connectTimeoutMS=config.MONGODB_TIMEOUT_MS,
+                socketTimeoutMS=config.MONGODB_TIMEOUT_MS
             )
+            self.db = self.client.telegram_spam_bot
             
-            # Test connection mit Retry
+            # Test connection
             logger.info("🔍 Teste Verbindung...")
-            await self.client.admin.command('ping')
-            
-            self.db = self.client.telegram_spam_bot
-            self.available = True
+            await self._call("ping", self.client.admin.command('ping'))
             
-            # Erstelle Indizes
-            await self._create_indexes()
+            # Indizes und Vorladen übernimmt der Startup-Orchestrator (startup.py)
             
             logger.info("✅ MongoDB erfolgreich verbunden!")
             logger.info(f"📊 Datenbank: {self.db.name}")
+            
+            # Während eines Ausfalls gepufferte Events nachliefern
+            self.schedule_replay()
             return True
             
         except Exception as e:
@@ -61,49 +148,490 @@ class Database:
             logger.error(f"❌ Fehlertyp: {type(e).__name__}")
             logger.error(f"❌ Fehlermeldung: {str(e)}")
             logger.error(f"❌ MongoDB URL (gekürzt): {config.MONGODB_URL[:50]}...")
-            logger.warning("⚠️ Verwende Memory-Fallback")
-            self.available = False
+            logger.warning("⚠️ Verwende SQLite-Fallback, neuer Versuch im Hintergrund")
+            self.breaker.trip()
             return False
+            
+        finally:
+            self._start_monitor()
+    
+    # ===== CIRCUIT BREAKER / RECONNECT =====
     
-    async def _create_indexes(self):
-        """Erstelle Datenbank-Indizes für Performance"""
+    async def _call(self, op: str, awaitable: Awaitable[Any], timeout: float = config.MONGODB_OP_TIMEOUT) -> Any:
+        """MongoDB-Aufruf mit Zeitbudget, Latenzmessung und Circuit Breaker"""
+        stats = self.op_stats.get(op)
+        if stats is None:
+            stats = self.op_stats[op] = OperationStats()
+        
+        start = time.perf_counter()
+        error: Optional[BaseException] = None
         try:
-            if self.db is None:
-                return
-            
-            # Messages Collection
-            await self.db.messages.create_index("timestamp")
-            await self.db.messages.create_index("chat_id")
-            await self.db.messages.create_index("user_id")
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            error = TimeoutError(f"{op} > {timeout}s")
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.record(elapsed * 1000, error=error is not None, timeout=isinstance(error, TimeoutError))
+            MONGODB_OPERATION_SECONDS.observe(elapsed, op)
+            if error is not None:
+                MONGODB_OPERATION_ERRORS_TOTAL.inc(op)
             
-            # Spam Reports Collection
-            await self.db.spam_reports.create_index("timestamp")
-            await self.db.spam_reports.create_index("user_id")
-            
-            # Whitelist Collection
-            await self.db.whitelist.create_index("user_id", unique=True)
+            if error is None or isinstance(error, OperationFailure):
+                # Server hat geantwortet (ggf. mit Fehler wie Duplicate Key)
+                self.breaker.record_success()
+            elif isinstance(error, Exception):
+                self.breaker.record_failure(error)
+    
+    def add_recovery_hook(self, hook: Callable[[], Awaitable[Any]]):
+        """Coroutine-Funktion, die nach einer Wiederverbindung ausgeführt wird"""
+        self._recovery_hooks.append(hook)
+    
+    def _start_monitor(self):
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._monitor())
+    
+    async def _monitor(self):
+        """Prüft bei offenem Breaker periodisch per Ping, ob MongoDB wieder erreichbar ist"""
+        while True:
+            await asyncio.sleep(config.MONGODB_PROBE_INTERVAL)
+            if not self.breaker.is_open or self.client is None:
+                continue
             
-            # CAPTCHA Kicks Collection
-            await self.db.captcha_kicks.create_index("timestamp")
-            await self.db.captcha_kicks.create_index("user_id")
+            try:
+                await self._call("probe", self.client.admin.command('ping'))
+            except Exception as e:
+                logger.warning(f"⚠️ MongoDB weiterhin nicht erreichbar: {type(e).__name__}")
+                continue
             
-            # Media Blocks Collection
-            await self.db.media_blocks.create_index("timestamp")
-            await self.db.media_blocks.create_index("user_id")
+            self.breaker.reset()
+            logger.info("✅ MongoDB wieder erreichbar")
+            await self._on_recovered()
+    
+    async def _on_recovered(self):
+        """Gepufferte Operationen übertragen und Caches/Indizes neu laden"""
+        await self.replay_fallback()
+        for hook in self._recovery_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                logger.error(f"❌ Fehler nach Wiederverbindung: {e}")
+    
+    def health_status(self) -> Dict[str, Any]:
+        """Breaker-Zustand und Latenzen pro Operation für /health"""
+        return {
+            "breaker": self.breaker.status(),
+            "operations": {op: stats.status() for op, stats in sorted(self.op_stats.items())},
+        }
+    
+    async def create_indexes(self):
+        """Erstelle Datenbank-Indizes für Performance (Collections parallel)"""
+        try:
+            if self.db is None:
+                return
             
-            # Settings Collection
-            await self.db.settings.create_index("key", unique=True)
+            # Pro Collection nacheinander, Collections untereinander parallel
+            await asyncio.gather(
+                *(self._create_event_indexes(collection) for collection in EVENT_COLLECTIONS),
+                
+                # Whitelist Collection
+                self.db.whitelist.create_index("user_id", unique=True),
+                
+                # Settings Collection
+                self.db.settings.create_index("key", unique=True),
+                
+                # Gelernte Keywords (eindeutig, Grundlage für Bulk-Upserts)
+                self.db.learned_keywords.create_index("keyword", unique=True),
+                self.db[KEYWORD_STATS_COLLECTION].create_index("keyword", unique=True),
+                self.db[FEEDBACK_COLLECTION].create_index([("chat_id", 1), ("timestamp", 1)]),
+                self.db[SHADOW_STATS_COLLECTION].create_index([("candidate", 1), ("day", 1)], unique=True),
+                self._ensure_ttl_index(SHADOW_DISAGREEMENTS_COLLECTION, "timestamp", config.RETENTION_DAYS.get(SHADOW_DISAGREEMENTS_COLLECTION, 0)),
+                
+                # Daily Stats Collection (Rollups)
+                self.db.daily_stats.create_index([("day", 1), ("chat_id", 1)], unique=True),
+                self._create_hourly_indexes(),
+                
+                # Cluster: Updates pro Shard in Eingangsreihenfolge, Mitglieder mit TTL
+                self.db[UPDATE_QUEUE_COLLECTION].create_index([("shard", 1), ("_id", 1)]),
+                self.db[MEMBERS_COLLECTION].create_index([("chat_id", 1), ("user_id", 1)], unique=True),
+                self.db[MEMBERS_COLLECTION].create_index([("shard", 1), ("expires_at", 1)]),
+                self.db[MEMBERS_COLLECTION].create_index("expires_at", expireAfterSeconds=0),
+            )
             
             logger.info("✅ Datenbank-Indizes erstellt")
             
         except Exception as e:
             logger.warning(f"⚠️ Index-Erstellung fehlgeschlagen: {e}")
     
+    async def _create_event_indexes(self, collection: str):
+        """TTL auf timestamp + Compound-Indizes passend zu den Abfragen (Chat/User + Zeitraum)"""
+        await self._ensure_ttl_index(collection, "timestamp", config.RETENTION_DAYS.get(collection, 0))
+        await self.db[collection].create_index([("chat_id", 1), ("timestamp", 1)])
+        await self.db[collection].create_index([("user_id", 1), ("timestamp", 1)])
+        
+        # Einzelfeld-Indizes sind durch die Compound-Indizes abgedeckt
+        await self._drop_indexes(collection, ["chat_id_1", "user_id_1"])
+    
+    async def _create_hourly_indexes(self):
+        """Indizes der Stunden-Rollups"""
+        await self.db.hourly_stats.create_index([("chat_id", 1), ("hour", 1)], unique=True)
+        await self._ensure_ttl_index("hourly_stats", "hour", config.RETENTION_DAYS.get("hourly_stats", 0))
+    
+    async def _ensure_ttl_index(self, collection: str, field: str, retention_days: int):
+        """Index auf Zeitfeld mit TTL (retention_days > 0) bzw. ohne TTL (0 = unbegrenzt)"""
+        if retention_days <= 0:
+            try:
+                await self.db[collection].create_index(field)
+            except OperationFailure as e:
+                # Bestehender TTL-Index bleibt aktiv, bis er manuell entfernt wird
+                logger.warning(f"⚠️ {collection}.{field}: TTL-Index existiert bereits ({e.code})")
+            return
+        
+        expire_seconds = retention_days * 86400
+        # MongoDB löscht ältere Dokumente sofort nach dem Anlegen/Umstellen
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        expiring = await self.db[collection].count_documents({field: {"$lt": cutoff}})
+        if expiring:
+            logger.warning(
+                f"⚠️ {collection}: TTL {retention_days} Tage löscht {expiring} Dokumente "
+                f"älter als {cutoff:%Y-%m-%d}"
+            )
+        try:
+            await self.db[collection].create_index(field, expireAfterSeconds=expire_seconds)
+        except OperationFailure as e:
+            if e.code not in (85, 86):  # IndexOptionsConflict / IndexKeySpecsConflict
+                raise
+            # Bestehenden Index (ohne TTL oder mit anderer Dauer) umstellen
+            await self.db.command(
+                "collMod", collection,
+                index={"keyPattern": {field: 1}, "expireAfterSeconds": expire_seconds}
+            )
+        logger.info(f"🗑️ {collection}: Aufbewahrung {retention_days} Tage")
+    
+    async def _drop_indexes(self, collection: str, names: List[str]):
+        """Veraltete Indizes entfernen (falls vorhanden)"""
+        existing = await self.db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await self.db[collection].drop_index(name)
+                logger.info(f"🗑️ Veralteter Index {collection}.{name} entfernt")
+    
+    async def get_index_report(self) -> List[Dict[str, Any]]:
+        """Index-Nutzung ($indexStats) und Größen pro Collection"""
+        report = []
+        try:
+            if self.available and self.db is not None:
+                for collection in sorted(await self.db.list_collection_names()):
+                    coll_stats = await self.db.command("collStats", collection)
+                    usage = {}
+                    async for stat in self.db[collection].aggregate([{"$indexStats": {}}]):
+                        usage[stat["name"]] = stat["accesses"]
+                    
+                    report.append({
+                        "collection": collection,
+                        "documents": coll_stats.get("count", 0),
+                        "size_bytes": coll_stats.get("size", 0),
+                        "index_sizes": coll_stats.get("indexSizes", {}),
+                        "index_usage": {
+                            name: {"ops": access.get("ops", 0), "since": access.get("since")}
+                            for name, access in usage.items()
+                        }
+                    })
+                    
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Erstellen des Index-Reports: {e}")
+        
+        return report
+    
     async def close(self):
         """Verbindung schließen"""
+        # Gepufferte Dokumente vor dem Schließen wegschreiben
+        await self.buffer.stop()
+        await self.rollups.stop()
+        
+        for task in (self._replay_task, self._monitor_task):
+            if task and not task.done():
+                task.cancel()
+        
         if self.client:
             self.client.close()
             logger.info("MongoDB Verbindung geschlossen")
+        
+        self.fallback.close()
+    
+    async def _insert_batch(self, collection: str, docs: List[Dict[str, Any]]):
+        """Gebündelter Insert aus dem Write-Behind Buffer (MongoDB oder SQLite)"""
+        if self.available and self.db is not None:
+            try:
+                await self._call(f"{collection}.insert_many", self.db[collection].insert_many(docs, ordered=False), config.MONGODB_WRITE_TIMEOUT)
+                if self.fallback.pending_events:
+                    self.schedule_replay()
+                return
+            except BulkWriteError as e:
+                if self._only_duplicates(e):
+                    return
+                logger.warning(f"⚠️ Insert in {collection} teilweise fehlgeschlagen, puffere in SQLite: {e}")
+            except Exception as e:
+                logger.warning(f"⚠️ Insert in {collection} fehlgeschlagen, puffere in SQLite: {e}")
+        
+        # Feste _id: beim Replay werden bereits geschriebene Dokumente übersprungen
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        await self._queue_fallback(collection, "insert", docs)
+    
+    async def _write_rollups(self, collection: str, updates: List[tuple]) -> Union[bool, List[tuple]]:
+        """
+        Gebündelte $inc-Upserts aus dem Rollup-Buffer. False bzw. die Liste
+        der abgelehnten Updates nur, wenn sicher nichts davon angewendet
+        wurde (später erneut versuchen); Timeouts gehen als Fehler durch.
+        """
+        if not self.available or self.db is None:
+            return False
+        try:
+            await self._call(
+                f"{collection}.rollups",
+                self.db[collection].bulk_write(
+                    [UpdateOne(key, {"$inc": counters}, upsert=True) for key, counters in updates],
+                    ordered=False
+                ),
+                config.MONGODB_WRITE_TIMEOUT
+            )
+        except ServerSelectionTimeoutError:
+            # Kein Server erreicht, nichts gesendet
+            return False
+        except BulkWriteError as e:
+            # Ungeordnet: nur die abgelehnten Updates sind nicht angewendet
+            failed = sorted({error["index"] for error in e.details.get("writeErrors", [])})
+            if e.details.get("writeConcernErrors") or not failed:
+                raise
+            return [updates[index] for index in failed]
+        return True
+    
+    # ===== SQLITE FALLBACK / REPLAY =====
+    
+    @staticmethod
+    def _only_duplicates(error: BulkWriteError) -> bool:
+        """True wenn ein Bulk-Write nur an bereits vorhandenen Dokumenten scheiterte"""
+        write_errors = error.details.get("writeErrors", [])
+        return bool(write_errors) and all(e.get("code") == DUPLICATE_KEY_ERROR for e in write_errors)
+    
+    async def _queue_fallback(self, collection: str, op: str, payloads: List[Dict[str, Any]]):
+        """Für das Replay puffern - ohne konfiguriertes MongoDB gibt es nichts nachzuliefern"""
+        if not config.MONGODB_URL:
+            self.skipped_events += len(payloads)
+            return
+        await self.fallback.queue(collection, op, payloads)
+    
+    async def _queue_or_write(self, collection: str, op: str, payload: Dict[str, Any]) -> bool:
+        """Einzelne Schreiboperation direkt ausführen oder für das Replay puffern"""
+        if self.available and self.db is not None:
+            try:
+                await self._call(f"{collection}.{op}", self.db[collection].bulk_write([self._replay_op(op, payload)]))
+                return True
+            except Exception as e:
+                logger.warning(f"⚠️ Schreiben in {collection} fehlgeschlagen, puffere in SQLite: {e}")
+        
+        if op == "insert":
+            payload.setdefault("_id", ObjectId())
+        await self._queue_fallback(collection, op, [payload])
+        return False
+    
+    @staticmethod
+    def _replay_op(op: str, payload: Dict[str, Any]):
+        """Gepufferte Operation in eine pymongo Bulk-Operation umwandeln"""
+        if op == "insert":
+            return InsertOne(payload)
+        if op == "upsert":
+            return UpdateOne(payload["filter"], payload["update"], upsert=True)
+        if op == "update":
+            return UpdateOne(payload["filter"], payload["update"])
+        if op == "delete":
+            return DeleteOne(payload["filter"])
+        raise ValueError(f"Unbekannte Operation: {op}")
+    
+    def schedule_replay(self):
+        """Replay im Hintergrund starten (falls nicht bereits aktiv)"""
+        if self._replay_task is None or self._replay_task.done():
+            self._replay_task = asyncio.create_task(self.replay_fallback())
+    
+    async def replay_fallback(self) -> int:
+        """Gepufferte Operationen gebündelt und in Reihenfolge nach MongoDB übertragen"""
+        async with self._replay_lock:
+            replayed = 0
+            try:
+                while self.available and self.db is not None:
+                    events = await self.fallback.next_events(config.SQLITE_REPLAY_BATCH_SIZE)
+                    if not events:
+                        break
+                    
+                    # Aufeinanderfolgende Events derselben Collection zu einem bulk_write zusammenfassen
+                    runs: List[tuple] = []
+                    for _, collection, op, payload in events:
+                        if not runs or runs[-1][0] != collection:
+                            runs.append((collection, []))
+                        runs[-1][1].append(self._replay_op(op, payload))
+                    
+                    for collection, ops in runs:
+                        await self._bulk_write_tolerant(collection, ops)
+                    
+                    await self.fallback.ack_events(events[-1][0])
+                    replayed += len(events)
+                
+            except Exception as e:
+                logger.error(f"❌ Replay aus SQLite abgebrochen (wird später fortgesetzt): {e}")
+            
+            if replayed:
+                self.replayed_events += replayed
+                logger.info(f"🔁 {replayed} gepufferte Operationen nach MongoDB übertragen")
+            return replayed
+    
+    async def _bulk_write_tolerant(self, collection: str, ops: List[Any]):
+        """Geordneter bulk_write, der bereits übertragene Dokumente überspringt"""
+        while ops:
+            try:
+                await self._call(f"{collection}.replay", self.db[collection].bulk_write(ops, ordered=True), config.MONGODB_WRITE_TIMEOUT)
+                return
+            except BulkWriteError as e:
+                if not self._only_duplicates(e):
+                    raise
+                # Geordnet bricht MongoDB beim ersten Duplikat ab: Rest erneut senden
+                ops = ops[e.details["writeErrors"][0]["index"] + 1:]
+    
+    def fallback_status(self) -> Dict[str, Any]:
+        """Zustand des SQLite-Fallbacks für /health"""
+        return {
+            "path": self.fallback.path,
+            "pending_events": self.fallback.pending_events,
+            "replayed_events": self.replayed_events,
+            "dropped_events": self.fallback.dropped_events,
+            "skipped_events": self.skipped_events,
+            "replay_running": self._replay_task is not None and not self._replay_task.done(),
+        }
+    
+    @staticmethod
+    def _day_key(chat_id: int, day: Optional[str] = None) -> Dict[str, Any]:
+        """Schlüssel eines daily_stats Dokuments"""
+        return {"day": day or datetime.utcnow().strftime("%Y-%m-%d"), "chat_id": chat_id}
+    
+    def _count_event(self, field: str, chat_id: Optional[int], details: Optional[List[str]] = None):
+        """Event in Tages- und Stundenzählern des Chats und der globalen Summe zählen"""
+        now = datetime.utcnow()
+        day = now.strftime("%Y-%m-%d")
+        hour = hour_bucket(now)
+        
+        chat_ids = [GLOBAL_CHAT_ID, chat_id] if chat_id else [GLOBAL_CHAT_ID]
+        for cid in chat_ids:
+            self.rollups.inc("daily_stats", self._day_key(cid, day), field)
+            
+            hour_key = {"chat_id": cid, "hour": hour}
+            self.rollups.inc("hourly_stats", hour_key, field)
+            for detail in details or []:
+                self.rollups.inc("hourly_stats", hour_key, detail)
+    
+    @staticmethod
+    def _spam_details(spam_data: Dict[str, Any]) -> List[str]:
+        """Zähler-Felder für Spam-Gründe und Domains eines Spam-Reports"""
+        details = []
+        for part in (spam_data.get("reason") or "").split(" | "):
+            # "Spam-Keywords (3): pump, ..." -> "Spam-Keywords"
+            category = part.split(":")[0].split(" (")[0].strip()
+            if category:
+                details.append(f"reasons.{encode_field(category)}")
+        for domain in spam_data.get("domains") or []:
+            details.append(f"domains.{encode_field(domain)}")
+        return details
+    
+    async def seed_daily_stats(self):
+        """Tageszähler und Stunden-Rollups aus bestehenden Events anlegen, falls sie fehlen (Migration)"""
+        if not self.available or self.db is None:
+            return
+        await asyncio.gather(self._seed_today_stats(), self._seed_hourly_stats())
+    
+    async def _seed_today_stats(self):
+        """Legt den heutigen Tageszähler an, falls er noch fehlt"""
+        try:
+            key = self._day_key(GLOBAL_CHAT_ID)
+            if await self.db.daily_stats.find_one(key) is not None:
+                return
+            
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            query = {"timestamp": {"$gte": today}}
+            spam, messages, captcha_kicks, media_blocks = await asyncio.gather(
+                self.db.spam_reports.count_documents(query),
+                self.db.messages.count_documents(query),
+                self.db.captcha_kicks.count_documents(query),
+                self.db.media_blocks.count_documents(query),
+            )
+            counts = {
+                "spam": spam,
+                "messages": messages,
+                "captcha_kicks": captcha_kicks,
+                "media_blocks": media_blocks,
+            }
+            await self.db.daily_stats.update_one(key, {"$setOnInsert": counts}, upsert=True)
+            logger.info(f"📊 Tageszähler initialisiert: {counts}")
+            
+        except Exception as e:
+            logger.warning(f"⚠️ Tageszähler konnte nicht initialisiert werden: {e}")
+    
+    async def _seed_hourly_stats(self):
+        """
+        Stunden-Rollups einmalig aus den Event-Collections nachtragen (höchstens
+        MAX_RANGE zurück), damit /stats 7d/30d auch die Zeit vor dem ersten
+        Rollup abdeckt. Nur Stunden vor dem ersten vorhandenen Rollup-Dokument,
+        ab da zählt _count_event; $setOnInsert lässt bestehende Dokumente
+        unverändert (parallele Instanzen zählen nichts doppelt).
+        """
+        try:
+            if await self.db.settings.find_one({"key": HOURLY_STATS_SEEDED_KEY}) is not None:
+                return
+            
+            first = await self.db.hourly_stats.find_one({}, {"hour": 1}, sort=[("hour", 1)])
+            until = first["hour"] if first else hour_bucket()
+            query = {"timestamp": {"$gte": hour_bucket(datetime.utcnow() - MAX_RANGE), "$lt": until}}
+            hours: Dict[Tuple[int, datetime], Dict[str, int]] = {}
+            
+            def count(chat_id: Optional[int], hour: datetime, field: str, amount: int = 1):
+                for cid in ([GLOBAL_CHAT_ID, chat_id] if chat_id else [GLOBAL_CHAT_ID]):
+                    counters = hours.setdefault((cid, hour), {})
+                    counters[field] = counters.get(field, 0) + amount
+            
+            for collection, field in (("messages", "messages"), ("captcha_kicks", "captcha_kicks"), ("media_blocks", "media_blocks")):
+                pipeline = [
+                    {"$match": query},
+                    {"$group": {"_id": {"chat_id": "$chat_id", "hour": _HOUR_EXPR}, "count": {"$sum": 1}}},
+                ]
+                async for doc in self.db[collection].aggregate(pipeline):
+                    count(doc["_id"].get("chat_id"), doc["_id"]["hour"], field, doc["count"])
+            
+            # Spam mit Gründen/Domains wie in log_spam
+            projection = {"_id": 0, "chat_id": 1, "timestamp": 1, "reason": 1, "domains": 1}
+            async for doc in self.db.spam_reports.find(query, projection):
+                hour = hour_bucket(doc["timestamp"])
+                for field in ["spam"] + self._spam_details(doc):
+                    count(doc.get("chat_id"), hour, field)
+            
+            if hours:
+                await self.db.hourly_stats.bulk_write(
+                    [
+                        UpdateOne({"chat_id": cid, "hour": hour}, {"$setOnInsert": counters}, upsert=True)
+                        for (cid, hour), counters in hours.items()
+                    ],
+                    ordered=False
+                )
+            now = datetime.utcnow()
+            await self.db.settings.update_one(
+                {"key": HOURLY_STATS_SEEDED_KEY},
+                {"$setOnInsert": {"key": HOURLY_STATS_SEEDED_KEY, "value": now, "updated_at": now}},
+                upsert=True
+            )
+            logger.info(f"📊 Stunden-Rollups nachgetragen: {len(hours)} Dokumente vor {until:%Y-%m-%d %H:%M} UTC")
+            
+        except Exception as e:
+            logger.warning(f"⚠️ Stunden-Rollups konnten nicht nachgetragen werden: {e}")
     
     def _reset_daily_fallback(self):
         """Reset fallback stats wenn neuer Tag"""
@@ -114,15 +642,14 @@ class Database:
             self.fallback_stats["last_reset"] = today
     
     async def log_message(self, message_data: Dict[str, Any]) -> bool:
-        """Nachricht in Datenbank loggen"""
+        """Nachricht in Datenbank loggen (ohne MongoDB in SQLite gepuffert)"""
         try:
-            if self.available and self.db is not None:
-                await self.db.messages.insert_one(message_data)
-                return True
-            else:
+            self._count_event("messages", message_data.get("chat_id"))
+            if not self.available:
                 # Fallback counter
                 self._reset_daily_fallback()
                 self.fallback_stats["messages_today"] += 1
+            return await self.buffer.add("messages", message_data)
                 
         except Exception as e:
             logger.error(f"❌ Fehler beim Loggen der Nachricht: {e}")
@@ -130,15 +657,14 @@ class Database:
         return False
     
     async def log_spam(self, spam_data: Dict[str, Any]) -> bool:
-        """Spam-Report in Datenbank loggen"""
+        """Spam-Report in Datenbank loggen (ohne MongoDB in SQLite gepuffert)"""
         try:
-            if self.available and self.db is not None:
-                await self.db.spam_reports.insert_one(spam_data)
-                return True
-            else:
+            self._count_event("spam", spam_data.get("chat_id"), self._spam_details(spam_data))
+            if not self.available:
                 # Fallback counter
                 self._reset_daily_fallback()
                 self.fallback_stats["spam_blocked_today"] += 1
+            return await self.buffer.add("spam_reports", spam_data)
                 
         except Exception as e:
             logger.error(f"❌ Fehler beim Loggen des Spam-Reports: {e}")
@@ -148,9 +674,8 @@ class Database:
     async def log_captcha_kick(self, kick_data: Dict[str, Any]) -> bool:
         """CAPTCHA-Kick in Datenbank loggen"""
         try:
-            if self.available and self.db is not None:
-                await self.db.captcha_kicks.insert_one(kick_data)
-                return True
+            self._count_event("captcha_kicks", kick_data.get("chat_id"))
+            return await self.buffer.add("captcha_kicks", kick_data)
         except Exception as e:
             logger.error(f"❌ Fehler beim Loggen des CAPTCHA-Kicks: {e}")
         return False
@@ -158,9 +683,8 @@ class Database:
     async def log_media_block(self, block_data: Dict[str, Any]) -> bool:
         """Media-Block in Datenbank loggen"""
         try:
-            if self.available and self.db is not None:
-                await self.db.media_blocks.insert_one(block_data)
-                return True
+            self._count_event("media_blocks", block_data.get("chat_id"))
+            return await self.buffer.add("media_blocks", block_data)
         except Exception as e:
             logger.error(f"❌ Fehler beim Loggen des Media-Blocks: {e}")
         return False
@@ -169,23 +693,20 @@ class Database:
         """Heutige Statistiken abrufen"""
         try:
             if self.available and self.db is not None:
-                today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-                
-                spam_count = await self.db.spam_reports.count_documents({
-                    "timestamp": {"$gte": today}
-                })
+                # Ein indizierter Lookup auf den Tageszähler statt count_documents
+                key = self._day_key(GLOBAL_CHAT_ID)
+                doc = await self._call("daily_stats.find_one", self.db.daily_stats.find_one(key)) or {}
                 
-                message_count = await self.db.messages.count_documents({
-                    "timestamp": {"$gte": today}
-                })
+                # Noch nicht geschriebene Zähler dazurechnen
+                pending = self.rollups.pending("daily_stats", key)
                 
-                captcha_kicks = await self.db.captcha_kicks.count_documents({
-                    "timestamp": {"$gte": today}
-                })
+                def counter(field: str) -> int:
+                    return doc.get(field, 0) + pending.get(field, 0)
                 
-                media_blocks = await self.db.media_blocks.count_documents({
-                    "timestamp": {"$gte": today}
-                })
+                spam_count = counter("spam")
+                message_count = counter("messages")
+                captcha_kicks = counter("captcha_kicks")
+                media_blocks = counter("media_blocks")
                 
                 spam_rate = round((spam_count / max(message_count, 1)) * 100, 1)
                 
@@ -215,24 +736,113 @@ class Database:
             "source": "Memory-Fallback"
         }
     
-    async def add_to_whitelist(self, user_id: int, username: str, added_by: int) -> bool:
-        """User zur Whitelist hinzufügen"""
+    async def _load_hourly_stats(self, start: datetime, end: datetime, chat_id: Optional[int]) -> Dict[datetime, Dict[str, Any]]:
+        """Stunden-Rollups im Zeitraum inkl. noch nicht geschriebener Zähler"""
+        cid = chat_id or GLOBAL_CHAT_ID
+        hours: Dict[datetime, Dict[str, Any]] = {}
+        
+        cursor = self.db.hourly_stats.find(
+            {"chat_id": cid, "hour": {"$gte": start, "$lt": end}},
+            {"_id": 0, "chat_id": 0}
+        )
+        for doc in await self._call("hourly_stats.find", cursor.to_list(length=None)):
+            hours[doc.pop("hour")] = doc
+        
+        for key, counters in self.rollups.iter_pending("hourly_stats"):
+            if key["chat_id"] != cid or not (start <= key["hour"] < end):
+                continue
+            doc = hours.setdefault(key["hour"], {})
+            for field, amount in counters.items():
+                # "reasons.xyz" -> verschachteltes Dict wie in MongoDB
+                if "." in field:
+                    group, name = field.split(".", 1)
+                    nested = doc.setdefault(group, {})
+                    nested[name] = nested.get(name, 0) + amount
+                else:
+                    doc[field] = doc.get(field, 0) + amount
+        
+        return hours
+    
+    async def get_range_stats(self, start: datetime, end: datetime, chat_id: Optional[int] = None, top: int = 5) -> Dict[str, Any]:
+        """Statistiken für einen Zeitraum aus den Stunden-Rollups"""
+        try:
+            if self.available and self.db is not None:
+                hours = await self._load_hourly_stats(start, end, chat_id)
+                
+                totals = {"messages": 0, "spam": 0, "captcha_kicks": 0, "media_blocks": 0}
+                reasons: Dict[str, int] = {}
+                domains: Dict[str, int] = {}
+                
+                for doc in hours.values():
+                    for field in totals:
+                        totals[field] += doc.get(field, 0)
+                    for name, amount in doc.get("reasons", {}).items():
+                        reasons[name] = reasons.get(name, 0) + amount
+                    for name, amount in doc.get("domains", {}).items():
+                        domains[name] = domains.get(name, 0) + amount
+                
+                def top_items(counts: Dict[str, int]) -> List[Dict[str, Any]]:
+                    ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:top]
+                    return [{"name": decode_field(name), "count": count} for name, count in ranked]
+                
+                return {
+                    "start": start.isoformat(),
+                    "end": end.isoformat(),
+                    "chat_id": chat_id,
+                    "spam_blocked": totals["spam"],
+                    "captcha_kicks": totals["captcha_kicks"],
+                    "media_blocks": totals["media_blocks"],
+                    "messages_total": totals["messages"],
+                    "spam_rate": round((totals["spam"] / max(totals["messages"], 1)) * 100, 1),
+                    "top_reasons": top_items(reasons),
+                    "top_domains": top_items(domains),
+                    "source": "MongoDB"
+                }
+                
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Abrufen der Zeitraum-Stats: {e}")
+        
+        return {}
+    
+    async def get_hourly_series(self, start: datetime, end: datetime, chat_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Zeitreihe der Stunden-Rollups (eine Zeile pro Stunde mit Events)"""
         try:
             if self.available and self.db is not None:
-                await self.db.whitelist.update_one(
-                    {"user_id": user_id},
+                hours = await self._load_hourly_stats(start, end, chat_id)
+                return [
                     {
-                        "$set": {
-                            "user_id": user_id,
-                            "username": username,
-                            "added_by": added_by,
-                            "added_at": datetime.utcnow()
-                        }
-                    },
-                    upsert=True
-                )
-                logger.info(f"✅ User {username} ({user_id}) zur Whitelist hinzugefügt")
-                return True
+                        "hour": hour.isoformat(),
+                        "messages": doc.get("messages", 0),
+                        "spam": doc.get("spam", 0),
+                        "captcha_kicks": doc.get("captcha_kicks", 0),
+                        "media_blocks": doc.get("media_blocks", 0),
+                    }
+                    for hour, doc in sorted(hours.items())
+                ]
+                
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Abrufen der Stunden-Zeitreihe: {e}")
+        
+        return []
+    
+    async def add_to_whitelist(self, user_id: int, username: str, added_by: int) -> bool:
+        """User zur Whitelist hinzufügen"""
+        try:
+            doc = {
+                "user_id": user_id,
+                "username": username,
+                "added_by": added_by,
+                "added_at": datetime.utcnow()
+            }
+            await self._queue_or_write(
+                "whitelist", "upsert", {"filter": {"user_id": user_id}, "update": {"$set": doc}}
+            )
+            await self.fallback.upsert_whitelist(doc)
+            if self.whitelist_cache is not None:
+                self.whitelist_cache.add(user_id)
+            await self._bump_state_version()
+            logger.info(f"✅ User {username} ({user_id}) zur Whitelist hinzugefügt")
+            return True
                 
         except Exception as e:
             logger.error(f"❌ Fehler beim Hinzufügen zur Whitelist: {e}")
@@ -242,11 +852,18 @@ class Database:
     async def remove_from_whitelist(self, user_id: int) -> bool:
         """User von Whitelist entfernen"""
         try:
-            if self.available and self.db is not None:
-                result = await self.db.whitelist.delete_one({"user_id": user_id})
-                if result.deleted_count > 0:
-                    logger.info(f"✅ User {user_id} von Whitelist entfernt")
-                    return True
+            if self.whitelist_cache is not None and user_id not in self.whitelist_cache:
+                return False
+            
+            await self._queue_or_write("whitelist", "delete", {"filter": {"user_id": user_id}})
+            deleted = await self.fallback.delete_whitelist(user_id)
+            if self.whitelist_cache is not None:
+                self.whitelist_cache.discard(user_id)
+                deleted = True
+            if deleted:
+                await self._bump_state_version()
+                logger.info(f"✅ User {user_id} von Whitelist entfernt")
+                return True
                 
         except Exception as e:
             logger.error(f"❌ Fehler beim Entfernen von Whitelist: {e}")
@@ -255,9 +872,13 @@ class Database:
     
     async def is_whitelisted(self, user_id: int) -> bool:
         """Prüfen ob User auf Whitelist ist"""
+        # Vorgeladener Cache: kein DB-Roundtrip pro Nachricht
+        if self.whitelist_cache is not None:
+            return user_id in self.whitelist_cache
+        
         try:
             if self.available and self.db is not None:
-                result = await self.db.whitelist.find_one({"user_id": user_id})
+                result = await self._call("whitelist.find_one", self.db.whitelist.find_one({"user_id": user_id}))
                 return result is not None
                 
         except Exception as e:
@@ -265,12 +886,34 @@ class Database:
         
         return False
     
+    async def load_whitelist(self) -> int:
+        """Whitelist in den Cache laden (MongoDB, sonst lokale SQLite-Kopie)"""
+        try:
+            docs = None
+            if self.available and self.db is not None:
+                try:
+                    docs = await self._call("whitelist.load", self.db.whitelist.find({}, {"_id": 0}).to_list(length=None))
+                    await self.fallback.replace_whitelist(docs)
+                except Exception as e:
+                    logger.warning(f"⚠️ Whitelist aus MongoDB nicht ladbar, nutze SQLite-Kopie: {e}")
+            if docs is None:
+                docs = await self.fallback.get_whitelist()
+            
+            self.whitelist_cache = {doc["user_id"] for doc in docs}
+            return len(self.whitelist_cache)
+                
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Laden der Whitelist: {e}")
+        
+        return 0
+    
     async def get_whitelist(self) -> List[Dict[str, Any]]:
         """Alle Whitelist-Einträge abrufen"""
         try:
             if self.available and self.db is not None:
                 cursor = self.db.whitelist.find().sort("added_at", -1)
-                return await cursor.to_list(length=100)
+                return await self._call("whitelist.find", cursor.to_list(length=100))
+            return (await self.fallback.get_whitelist())[:100]
                 
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen der Whitelist: {e}")
@@ -279,9 +922,12 @@ class Database:
     
     async def get_setting(self, key: str, default: Any = None) -> Any:
         """Einstellung aus DB abrufen"""
+        if self.settings_cache is not None:
+            return self.settings_cache.get(key, default)
+        
         try:
             if self.available and self.db is not None:
-                result = await self.db.settings.find_one({"key": key})
+                result = await self._call("settings.find_one", self.db.settings.find_one({"key": key}))
                 if result:
                     return result.get("value", default)
                 
@@ -293,63 +939,198 @@ class Database:
     async def set_setting(self, key: str, value: Any) -> bool:
         """Einstellung in DB speichern"""
         try:
-            if self.available and self.db is not None:
-                await self.db.settings.update_one(
-                    {"key": key},
-                    {
-                        "$set": {
-                            "key": key,
-                            "value": value,
-                            "updated_at": datetime.utcnow()
-                        }
-                    },
-                    upsert=True
-                )
-                return True
+            await self._queue_or_write(
+                "settings", "upsert",
+                {
+                    "filter": {"key": key},
+                    "update": {"$set": {"key": key, "value": value, "updated_at": datetime.utcnow()}}
+                }
+            )
+            await self.fallback.set_setting(key, value)
+            if self.settings_cache is not None:
+                self.settings_cache[key] = value
+            await self._bump_state_version()
+            return True
                 
         except Exception as e:
             logger.error(f"❌ Fehler beim Speichern der Einstellung: {e}")
         
         return False
     
+    async def _bump_state_version(self):
+        """Änderungszähler für den Cluster-Sync erhöhen ($inc, auch über den SQLite-Puffer)"""
+        await self._queue_or_write(
+            "settings", "upsert",
+            {
+                "filter": {"key": STATE_VERSION_KEY},
+                "update": {"$inc": {"value": 1}, "$set": {"updated_at": datetime.utcnow()}}
+            }
+        )
+    
+    async def get_state_version(self) -> Optional[int]:
+        """Änderungszähler direkt aus MongoDB (None ohne MongoDB)"""
+        if not self.available or self.db is None:
+            return None
+        doc = await self._call("settings.find_one", self.db.settings.find_one({"key": STATE_VERSION_KEY}))
+        return (doc or {}).get("value", 0)
+    
+    async def load_settings(self) -> int:
+        """Alle Einstellungen in den Cache laden (MongoDB, sonst lokale SQLite-Kopie)"""
+        try:
+            cache = None
+            if self.available and self.db is not None:
+                try:
+                    cursor = self.db.settings.find({}, {"key": 1, "value": 1, "_id": 0})
+                    docs = await self._call("settings.load", cursor.to_list(length=None))
+                    cache = {doc["key"]: doc.get("value") for doc in docs}
+                    await self.fallback.replace_settings(cache)
+                    self.settings_from_mongodb = True
+                except Exception as e:
+                    logger.warning(f"⚠️ Einstellungen aus MongoDB nicht ladbar, nutze SQLite-Kopie: {e}")
+            if cache is None:
+                cache = await self.fallback.get_settings()
+                self.settings_from_mongodb = False
+            
+            self.settings_cache = cache
+            return len(cache)
+                
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Laden der Einstellungen: {e}")
+        
+        return 0
+    
     # ===== LEARNED KEYWORDS =====
     
     async def add_learned_keyword(self, keyword: str, category: str, added_by: int, source_message: str = "") -> bool:
         """Neues gelerntes Keyword hinzufügen"""
+        inserted, _ = await self.add_learned_keywords([keyword], category, added_by, source_message)
+        if not inserted:
+            logger.info(f"ℹ️ Keyword '{keyword}' existiert bereits")
+        return inserted > 0
+    
+    async def add_learned_keywords(self, keywords: List[str], category: str, added_by: int, source_message: str = "") -> Tuple[int, int]:
+        """
+        Mehrere Keywords mit einem bulk_write lernen.
+        
+        Upsert mit $setOnInsert auf den eindeutigen Index `keyword`: vorhandene
+        (auch deaktivierte) Keywords bleiben unverändert. Gibt (neu, übersprungen)
+        zurück und erhöht bei Änderungen einmal die Keyword-Version.
+        """
+        now = datetime.utcnow()
+        source = source_message[:500] if source_message else ""
+        unique = list(dict.fromkeys(k.lower() for k in keywords if k))
+        docs = [
+            {
+                "keyword": keyword,
+                "category": category,
+                "added_by": added_by,
+                "added_at": now,
+                "source_message": source,
+                "confidence": 0.8,
+                "active": True
+            }
+            for keyword in unique
+        ]
+        if not docs:
+            return 0, 0
+        
+        inserted: List[Dict[str, Any]] = []
         try:
             if self.available and self.db is not None:
-                # Prüfe ob Keyword schon existiert
-                existing = await self.db.learned_keywords.find_one({"keyword": keyword.lower()})
-                if existing:
-                    logger.info(f"ℹ️ Keyword '{keyword}' existiert bereits")
-                    return False
-                
-                await self.db.learned_keywords.insert_one({
-                    "keyword": keyword.lower(),
-                    "category": category,
-                    "added_by": added_by,
-                    "added_at": datetime.utcnow(),
-                    "source_message": source_message[:500] if source_message else "",
-                    "confidence": 0.8,
-                    "active": True
-                })
-                logger.info(f"✅ Keyword '{keyword}' gelernt!")
-                return True
+                ops = [UpdateOne({"keyword": doc["keyword"]}, {"$setOnInsert": doc}, upsert=True) for doc in docs]
+                try:
+                    result = await self._call(
+                        "learned_keywords.bulk_upsert", self.db.learned_keywords.bulk_write(ops, ordered=False)
+                    )
+                    upserted = result.upserted_ids.keys()
+                except BulkWriteError as e:
+                    # Parallele Upserts desselben Keywords: Duplikate zählen als übersprungen
+                    if not self._only_duplicates(e):
+                        raise
+                    upserted = [entry["index"] for entry in e.details.get("upserted", [])]
+                
+                inserted = [docs[index] for index in upserted]
+                await self.fallback.insert_learned_keywords(inserted)
+            else:
+                inserted = await self.fallback.insert_learned_keywords(docs)
+                
+                # Upsert statt Insert: beim Replay nicht doppelt anlegen
+                await self._queue_fallback("learned_keywords", "upsert", [
+                    {"filter": {"keyword": doc["keyword"]}, "update": {"$setOnInsert": doc}}
+                    for doc in inserted
+                ])
+            
+            if inserted:
+                await self._bump_keywords_version()
+                logger.info(f"✅ {len(inserted)} Keywords gelernt: {', '.join(doc['keyword'] for doc in inserted)}")
                 
         except Exception as e:
-            logger.error(f"❌ Fehler beim Hinzufügen von Keyword: {e}")
+            logger.error(f"❌ Fehler beim Hinzufügen von Keywords: {e}")
         
-        return False
+        return len(inserted), len(docs) - len(inserted)
+    
+    async def get_keywords_version(self) -> Optional[int]:
+        """
+        Aktuelle Version der gelernten Keywords. None, wenn sie unbekannt ist
+        (MongoDB nicht erreichbar und nicht in der lokalen Kopie) - das ist
+        keine Version 0 und darf keinen gültigen Snapshot verwerfen.
+        """
+        if self.settings_cache is not None:
+            version = self.settings_cache.get(KEYWORDS_VERSION_KEY)
+            if version is not None or self.settings_from_mongodb:
+                return version or 0
+        
+        if self.available and self.db is not None:
+            try:
+                doc = await self._call("settings.find_one", self.db.settings.find_one({"key": KEYWORDS_VERSION_KEY}))
+                return (doc or {}).get("value") or 0
+            except Exception as e:
+                logger.warning(f"⚠️ Keyword-Version nicht abrufbar: {e}")
+        return None
+    
+    async def _bump_keywords_version(self) -> int:
+        """
+        Keyword-Version erhöhen ($inc, damit parallele Änderungen nicht verloren
+        gehen). Mit MongoDB gilt der von MongoDB zurückgegebene Wert - der lokale
+        Cache kann hinter anderen Workern liegen; ohne MongoDB lokal + 1.
+        """
+        update = {"$inc": {"value": 1}, "$set": {"updated_at": datetime.utcnow()}}
+        version = None
+        if self.available and self.db is not None:
+            try:
+                doc = await self._call(
+                    "settings.find_one_and_update",
+                    self.db.settings.find_one_and_update(
+                        {"key": KEYWORDS_VERSION_KEY}, update,
+                        upsert=True, return_document=ReturnDocument.AFTER
+                    )
+                )
+                version = doc["value"]
+            except Exception as e:
+                logger.warning(f"⚠️ Keyword-Version nicht in MongoDB erhöhbar, puffere in SQLite: {e}")
+        
+        if version is None:
+            version = (await self.get_keywords_version() or 0) + 1
+            await self._queue_fallback("settings", "upsert", [{"filter": {"key": KEYWORDS_VERSION_KEY}, "update": update}])
+        
+        await self.fallback.set_setting(KEYWORDS_VERSION_KEY, version)
+        await self._bump_state_version()
+        if self.settings_cache is not None:
+            self.settings_cache[KEYWORDS_VERSION_KEY] = version
+        return version
     
     async def get_learned_keywords(self) -> List[str]:
-        """Alle aktiven gelernten Keywords abrufen"""
+        """Alle aktiven gelernten Keywords abrufen (MongoDB, sonst lokale SQLite-Kopie)"""
         try:
             if self.available and self.db is not None:
-                cursor = self.db.learned_keywords.find({"active": True})
-                keywords = []
-                async for doc in cursor:
-                    keywords.append(doc["keyword"])
-                return keywords
+                try:
+                    docs = await self._call("learned_keywords.load", self.db.learned_keywords.find({}, {"_id": 0}).to_list(length=None))
+                    await self.fallback.replace_learned_keywords(docs)
+                    return [doc["keyword"] for doc in docs if doc.get("active", True)]
+                except Exception as e:
+                    logger.warning(f"⚠️ Keywords aus MongoDB nicht ladbar, nutze SQLite-Kopie: {e}")
+            
+            return [doc["keyword"] for doc in await self.fallback.get_learned_keywords()]
                 
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen von Keywords: {e}")
@@ -358,30 +1139,267 @@ class Database:
     
     async def remove_learned_keyword(self, keyword: str) -> bool:
         """Gelerntes Keyword deaktivieren"""
+        return await self.deactivate_learned_keywords([keyword], "manual") > 0
+    
+    async def deactivate_learned_keywords(self, keywords: List[str], reason: str) -> int:
+        """
+        Mehrere gelernte Keywords deaktivieren (manuell oder durch das Pruning).
+        Gibt die Anzahl tatsächlich deaktivierter zurück und erhöht bei
+        Änderungen einmal die Keyword-Version.
+        """
         try:
+            keywords = list(dict.fromkeys(k.lower() for k in keywords if k))
+            if not keywords:
+                return 0
+            update = {"$set": {"active": False, "deactivated_at": datetime.utcnow(), "deactivated_reason": reason}}
+            
             if self.available and self.db is not None:
-                result = await self.db.learned_keywords.update_one(
-                    {"keyword": keyword.lower()},
-                    {"$set": {"active": False, "deactivated_at": datetime.utcnow()}}
+                result = await self._call(
+                    "learned_keywords.update_many",
+                    self.db.learned_keywords.update_many({"keyword": {"$in": keywords}, "active": True}, update)
                 )
-                return result.modified_count > 0
+                for keyword in keywords:
+                    await self.fallback.deactivate_learned_keyword(keyword)
+                removed = result.modified_count
+            else:
+                removed = 0
+                for keyword in keywords:
+                    if await self.fallback.deactivate_learned_keyword(keyword):
+                        removed += 1
+                        await self._queue_fallback("learned_keywords", "update", [{"filter": {"keyword": keyword}, "update": update}])
+            
+            if removed:
+                await self._bump_keywords_version()
+            return removed
                 
         except Exception as e:
-            logger.error(f"❌ Fehler beim Entfernen von Keyword: {e}")
+            logger.error(f"❌ Fehler beim Deaktivieren von Keywords: {e}")
         
-        return False
+        return 0
     
-    async def get_learned_keywords_list(self) -> List[Dict[str, Any]]:
-        """Alle gelernten Keywords mit Details abrufen"""
+    async def get_learned_keywords_list(self, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """Aktive gelernte Keywords mit Details abrufen (neueste zuerst, None = alle)"""
         try:
             if self.available and self.db is not None:
                 cursor = self.db.learned_keywords.find({"active": True}).sort("added_at", -1)
-                return await cursor.to_list(length=100)
+                return await self._call("learned_keywords.find", cursor.to_list(length=limit))
+            return (await self.fallback.get_learned_keywords())[:limit]
                 
         except Exception as e:
             logger.error(f"❌ Fehler beim Abrufen von Keywords-Liste: {e}")
         
         return []
+    
+    # ===== KEYWORD-STATISTIK / FEEDBACK =====
+    
+    def count_keyword_hits(self, keywords: List[str], is_spam: bool):
+        """Treffer gelernter Keywords im Speicher zählen (Flush über den Rollup-Buffer)"""
+        for keyword in keywords:
+            key = {"keyword": keyword}
+            self.rollups.inc(KEYWORD_STATS_COLLECTION, key, "hits")
+            if is_spam:
+                self.rollups.inc(KEYWORD_STATS_COLLECTION, key, "spam_hits")
+    
+    async def log_feedback(self, label: str, keywords: List[str], feedback_data: Dict[str, Any]) -> bool:
+        """
+        Admin-Feedback speichern: label "spam" (/spam) zählt die enthaltenen
+        gelernten Keywords als bestätigt, "ham" (/notspam) als False Positive.
+        """
+        try:
+            field = "confirmed" if label == "spam" else "false_positives"
+            for keyword in keywords:
+                self.rollups.inc(KEYWORD_STATS_COLLECTION, {"keyword": keyword}, field)
+            return await self.buffer.add(FEEDBACK_COLLECTION, {**feedback_data, "label": label, "keywords": keywords})
+        except Exception as e:
+            logger.error(f"❌ Fehler beim Speichern von Feedback: {e}")
+        return False
+    
+    async def get_keyword_stats(self) -> Optional[Dict[str, Dict[str, int]]]:
+        """
+        Zähler aller Keywords (MongoDB + noch nicht geschriebene Rollups).
+        None ohne MongoDB: dann fehlt die Historie, das Pruning setzt aus.
+        """
+        if not self.available or self.db is None:
+            return None
+        
+        docs = await self._call(
+            f"{KEYWORD_STATS_COLLECTION}.find",
+            self.db[KEYWORD_STATS_COLLECTION].find({}, {"_id": 0}).to_list(length=None)
+        )
+        stats = {doc["keyword"]: {k: v for k, v in doc.items() if k != "keyword"} for doc in docs}
+        for key, counters in self.rollups.iter_pending(KEYWORD_STATS_COLLECTION):
+            entry = stats.setdefault(key["keyword"], {})
+            for field, amount in counters.items():
+                entry[field] = entry.get(field, 0) + amount
+        return stats
+    
+    async def get_keyword_stats_started_at(self) -> Optional[datetime]:
+        """
+        Zeitpunkt, ab dem Treffer gezählt werden. Beim ersten Aufruf mit
+        MongoDB atomar gesetzt ($setOnInsert), danach unverändert.
+        """
+        if self.settings_cache and self.settings_cache.get(KEYWORD_STATS_STARTED_KEY):
+            return self.settings_cache[KEYWORD_STATS_STARTED_KEY]
+        if not self.available or self.db is None:
+            return None
+        
+        now = datetime.utcnow()
+        doc = await self._call(
+            "settings.find_one_and_update",
+            self.db.settings.find_one_and_update(
+                {"key": KEYWORD_STATS_STARTED_KEY},
+                {"$setOnInsert": {"key": KEYWORD_STATS_STARTED_KEY, "value": now, "updated_at": now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        )
+        started = doc["value"]
+        if self.settings_cache is not None:
+            self.settings_cache[KEYWORD_STATS_STARTED_KEY] = started
+        return started
+    
+    async def get_shadow_stats(self, candidate: str, days: int) -> Optional[List[Dict[str, Any]]]:
+        """Tages-Rollups eines Shadow-Kandidaten inkl. noch nicht geschriebener Zähler (None ohne MongoDB)"""
+        if not self.available or self.db is None:
+            return None
+        
+        since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        docs = await self._call(
+            f"{SHADOW_STATS_COLLECTION}.find",
+            self.db[SHADOW_STATS_COLLECTION].find({"candidate": candidate, "day": {"$gte": since}}, {"_id": 0}).to_list(length=None)
+        )
+        for key, counters in self.rollups.iter_pending(SHADOW_STATS_COLLECTION):
+            if key["candidate"] == candidate and key["day"] >= since:
+                docs.append(counters)
+        return docs
+    
+    # ===== CLUSTER =====
+    
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Lease übernehmen oder verlängern. Gehört sie einem anderen und ist
+        noch gültig, schlägt der Upsert mit doppeltem Schlüssel fehl.
+        """
+        if not self.available or self.db is None:
+            return False
+        
+        now = datetime.utcnow()
+        try:
+            await self._call(f"{LEASES_COLLECTION}.acquire", self.db[LEASES_COLLECTION].update_one(
+                {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl), "renewed_at": now}},
+                upsert=True
+            ))
+            return True
+        except OperationFailure as e:
+            if e.code == DUPLICATE_KEY_ERROR:
+                return False
+            raise
+    
+    async def release_lease(self, name: str, owner: str):
+        """Eigene Lease sofort freigeben (geordnetes Herunterfahren)"""
+        if self.available and self.db is not None:
+            await self._call(f"{LEASES_COLLECTION}.release", self.db[LEASES_COLLECTION].delete_one({"_id": name, "owner": owner}))
+    
+    async def get_leases(self) -> List[Dict[str, Any]]:
+        """Alle Leases (für /health)"""
+        if not self.available or self.db is None:
+            return []
+        return await self._call(f"{LEASES_COLLECTION}.find", self.db[LEASES_COLLECTION].find().to_list(length=None))
+    
+    async def enqueue_updates(self, docs: List[Dict[str, Any]]):
+        """Updates für die Worker einreihen (Reihenfolge = _id)"""
+        await self._call(
+            f"{UPDATE_QUEUE_COLLECTION}.insert_many",
+            self.db[UPDATE_QUEUE_COLLECTION].insert_many(docs, ordered=True),
+            timeout=config.MONGODB_WRITE_TIMEOUT
+        )
+    
+    async def next_updates(self, shard: int, limit: int) -> List[Dict[str, Any]]:
+        """Älteste Updates eines Shards (ohne sie zu entfernen)"""
+        cursor = self.db[UPDATE_QUEUE_COLLECTION].find({"shard": shard}).sort("_id", 1).limit(limit)
+        return await self._call(f"{UPDATE_QUEUE_COLLECTION}.find", cursor.to_list(length=limit))
+    
+    async def ack_updates(self, ids: List[Any]):
+        """Verarbeitete Updates entfernen"""
+        await self._call(
+            f"{UPDATE_QUEUE_COLLECTION}.delete_many",
+            self.db[UPDATE_QUEUE_COLLECTION].delete_many({"_id": {"$in": ids}})
+        )
+    
+    async def update_queue_depth(self) -> int:
+        if not self.available or self.db is None:
+            return 0
+        return await self._call(
+            f"{UPDATE_QUEUE_COLLECTION}.count",
+            self.db[UPDATE_QUEUE_COLLECTION].estimated_document_count()
+        )
+    
+    async def save_member(self, chat_id: int, user_id: int, shard: int, joined_at: int, verified_at: int, expires_at: int):
+        """Beitritt/Verifizierung für andere Worker sichern (Epoch-Sekunden)"""
+        await self._queue_or_write(
+            MEMBERS_COLLECTION, "upsert",
+            {
+                "filter": {"chat_id": chat_id, "user_id": user_id},
+                "update": {"$set": {
+                    "shard": shard,
+                    "joined_at": joined_at,
+                    "verified_at": verified_at,
+                    "expires_at": datetime.utcfromtimestamp(expires_at),
+                }}
+            }
+        )
+    
+    async def load_members(self, shard: int) -> List[Dict[str, Any]]:
+        """Noch nicht abgelaufene Mitglieder eines Shards"""
+        if not self.available or self.db is None:
+            return []
+        cursor = self.db[MEMBERS_COLLECTION].find(
+            {"shard": shard, "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0, "chat_id": 1, "user_id": 1, "joined_at": 1, "verified_at": 1}
+        )
+        return await self._call(f"{MEMBERS_COLLECTION}.find", cursor.to_list(length=None), timeout=config.MONGODB_WRITE_TIMEOUT)
+    
+    # ===== EXPORT =====
+    
+    async def export_documents(
+        self,
+        collection: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        chat_id: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Dokumente einer Collection gebatcht streamen (konstanter Speicherbedarf).
+        Seitenweise nach `_id` (immer indiziert): jede Seite ist ein eigener
+        Aufruf über _call, mit Zeitbudget und Circuit Breaker.
+        """
+        time_field = EXPORT_COLLECTIONS[collection]
+        query: Dict[str, Any] = {}
+        if start or end:
+            query[time_field] = {}
+            if start:
+                query[time_field]["$gte"] = start
+            if end:
+                query[time_field]["$lt"] = end
+        if chat_id is not None:
+            query["chat_id"] = chat_id
+        
+        last_id = None
+        while True:
+            if not self.available or self.db is None:
+                raise RuntimeError("MongoDB nicht verfügbar")
+            
+            page_query = {**query, "_id": {"$gt": last_id}} if last_id is not None else query
+            cursor = self.db[collection].find(page_query).sort("_id", 1).limit(config.EXPORT_BATCH_SIZE)
+            docs = await self._call(
+                f"{collection}.export", cursor.to_list(length=config.EXPORT_BATCH_SIZE), config.MONGODB_WRITE_TIMEOUT
+            )
+            for doc in docs:
+                yield doc
+            if len(docs) < config.EXPORT_BATCH_SIZE:
+                return
+            last_id = docs[-1]["_id"]
 
 
 # Globale Datenbank-Instanz
@@ -0,0 +1,237 @@
+"""
+Lokaler SQLite-Fallback-Speicher (WAL) für MongoDB-Ausfälle
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    op TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS whitelist (
+    user_id INTEGER PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS learned_keywords (
+    keyword TEXT PRIMARY KEY,
+    active INTEGER NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteFallbackStore:
+    """
+    Spiegelt Whitelist, gelernte Keywords und Einstellungen lokal und puffert
+    Schreibzugriffe während eines MongoDB-Ausfalls.
+
+    Gepufferte Operationen liegen in der Tabelle `events` (insert, upsert,
+    update, delete) und werden nach der Wiederverbindung in Reihenfolge und
+    gebündelt nach MongoDB übertragen. Alle Zugriffe laufen in einem
+    Worker-Thread, damit der Event-Loop nicht blockiert. Über `max_events`
+    hinaus werden die ältesten Events verworfen und gezählt.
+    """
+
+    def __init__(self, path: str = config.SQLITE_FALLBACK_PATH, max_events: int = config.SQLITE_MAX_EVENTS):
+        self.path = path
+        self.max_events = max_events
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.pending_events = 0  # Zuletzt bekannte Anzahl offener Events
+        self.dropped_events = 0  # Wegen max_events verworfen
+
+    # ===== Interne Helfer (laufen im Worker-Thread) =====
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self.pending_events = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+            logger.info(f"💾 SQLite-Fallback geöffnet: {self.path} ({self.pending_events} offene Events)")
+        return self._conn
+
+    def _execute(self, func, *args):
+        with self._lock:
+            conn = self._connection()
+            with conn:  # Transaktion
+                return func(conn, *args)
+
+    async def _run(self, func, *args):
+        return await asyncio.to_thread(self._execute, func, *args)
+
+    @staticmethod
+    def _dump(value: Any) -> str:
+        return json_util.dumps(value)
+
+    @staticmethod
+    def _load(value: str) -> Any:
+        return json_util.loads(value)
+
+    # ===== Event-Queue für Replay =====
+
+    async def queue(self, collection: str, op: str, payloads: List[Dict[str, Any]]):
+        """Operationen für späteres Replay speichern (ein Insert-Batch pro Aufruf)"""
+        rows = [(collection, op, self._dump(payload)) for payload in payloads]
+
+        def insert(conn):
+            conn.executemany("INSERT INTO events (collection, op, payload) VALUES (?, ?, ?)", rows)
+            overflow = self.pending_events + len(rows) - self.max_events
+            if self.max_events <= 0 or overflow <= 0:
+                return 0
+            return conn.execute(
+                "DELETE FROM events WHERE id IN (SELECT id FROM events ORDER BY id LIMIT ?)", (overflow,)
+            ).rowcount
+
+        dropped = await self._run(insert)
+        self.pending_events += len(rows) - dropped
+        if dropped:
+            if not self.dropped_events:
+                logger.warning(f"⚠️ SQLite-Fallback voll ({self.max_events} Events), verwerfe die ältesten")
+            self.dropped_events += dropped
+
+    async def next_events(self, limit: int) -> List[Tuple[int, str, str, Dict[str, Any]]]:
+        """Älteste offene Events (id, collection, op, payload)"""
+        def select(conn):
+            return conn.execute(
+                "SELECT id, collection, op, payload FROM events ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+
+        rows = await self._run(select)
+        return [(row[0], row[1], row[2], self._load(row[3])) for row in rows]
+
+    async def ack_events(self, last_id: int):
+        """Übertragene Events (bis einschließlich last_id) löschen"""
+        def delete(conn):
+            conn.execute("DELETE FROM events WHERE id <= ?", (last_id,))
+            return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+        self.pending_events = await self._run(delete)
+
+    # ===== Whitelist =====
+
+    async def replace_whitelist(self, docs: List[Dict[str, Any]]):
+        """Lokale Kopie der Whitelist ersetzen"""
+        rows = [(doc["user_id"], self._dump(doc)) for doc in docs]
+
+        def replace(conn):
+            conn.execute("DELETE FROM whitelist")
+            conn.executemany("INSERT INTO whitelist (user_id, doc) VALUES (?, ?)", rows)
+
+        await self._run(replace)
+
+    async def upsert_whitelist(self, doc: Dict[str, Any]):
+        def upsert(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO whitelist (user_id, doc) VALUES (?, ?)",
+                (doc["user_id"], self._dump(doc))
+            )
+
+        await self._run(upsert)
+
+    async def delete_whitelist(self, user_id: int) -> bool:
+        def delete(conn):
+            return conn.execute("DELETE FROM whitelist WHERE user_id = ?", (user_id,)).rowcount > 0
+
+        return await self._run(delete)
+
+    async def get_whitelist(self) -> List[Dict[str, Any]]:
+        def select(conn):
+            return conn.execute("SELECT doc FROM whitelist").fetchall()
+
+        docs = [self._load(row[0]) for row in await self._run(select)]
+        return sorted(docs, key=lambda d: d.get("added_at") or datetime.min, reverse=True)
+
+    # ===== Gelernte Keywords =====
+
+    async def replace_learned_keywords(self, docs: List[Dict[str, Any]]):
+        """Lokale Kopie der gelernten Keywords ersetzen"""
+        rows = [(doc["keyword"], int(doc.get("active", True)), self._dump(doc)) for doc in docs]
+
+        def replace(conn):
+            conn.execute("DELETE FROM learned_keywords")
+            conn.executemany("INSERT INTO learned_keywords (keyword, active, doc) VALUES (?, ?, ?)", rows)
+
+        await self._run(replace)
+
+    async def insert_learned_keywords(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keywords anlegen, gibt die neu angelegten (nicht bereits vorhandenen) zurück"""
+        def insert(conn):
+            return [
+                doc for doc in docs
+                if conn.execute(
+                    "INSERT OR IGNORE INTO learned_keywords (keyword, active, doc) VALUES (?, ?, ?)",
+                    (doc["keyword"], int(doc.get("active", True)), self._dump(doc))
+                ).rowcount > 0
+            ]
+
+        return await self._run(insert)
+
+    async def deactivate_learned_keyword(self, keyword: str) -> bool:
+        def update(conn):
+            return conn.execute(
+                "UPDATE learned_keywords SET active = 0 WHERE keyword = ? AND active = 1", (keyword,)
+            ).rowcount > 0
+
+        return await self._run(update)
+
+    async def get_learned_keywords(self, active_only: bool = True) -> List[Dict[str, Any]]:
+        def select(conn):
+            query = "SELECT doc FROM learned_keywords"
+            if active_only:
+                query += " WHERE active = 1"
+            return conn.execute(query).fetchall()
+
+        docs = [self._load(row[0]) for row in await self._run(select)]
+        return sorted(docs, key=lambda d: d.get("added_at") or datetime.min, reverse=True)
+
+    # ===== Einstellungen =====
+
+    async def replace_settings(self, settings: Dict[str, Any]):
+        rows = [(key, self._dump(value)) for key, value in settings.items()]
+
+        def replace(conn):
+            conn.execute("DELETE FROM settings")
+            conn.executemany("INSERT INTO settings (key, value) VALUES (?, ?)", rows)
+
+        await self._run(replace)
+
+    async def set_setting(self, key: str, value: Any):
+        def upsert(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, self._dump(value))
+            )
+
+        await self._run(upsert)
+
+    async def get_settings(self) -> Dict[str, Any]:
+        def select(conn):
+            return conn.execute("SELECT key, value FROM settings").fetchall()
+
+        return {key: self._load(value) for key, value in await self._run(select)}
+
+    def close(self):
+        """Verbindung schließen"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -2,12 +2,21 @@
 Telegram Bot Command Handlers
 """
 import logging
+import uuid
 from datetime import datetime
-from telegram import Update
+from typing import Any, Dict, List
+from telegram import InputFile, Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 import config
+from cache import stats_cache
 from database import db
+from keyword_pruning import keyword_precision, keyword_pruner
+from profiler import ProfilerBusyError, profiler
+from rollups import parse_range
+from shadow import shadow
+from spam_detector import spam_detector
+from startup import refresh_learned_keywords
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +26,24 @@ def is_admin(user_id: int) -> bool:
     return user_id in config.ADMIN_USER_IDS
 
 
+def learned_hits(text: str) -> List[str]:
+    """Gelernte Keywords, die der aktive Matcher im Text findet"""
+    return [word[:-1] for word in spam_detector.contains_spam_keywords(text) if word.endswith("*")]
+
+
+def feedback_data(message, admin_id: int, text: str) -> Dict[str, Any]:
+    """Feedback-Dokument zu einer Nachricht (über chat_id/message_id mit `messages` verknüpfbar)"""
+    return {
+        "id": str(uuid.uuid4()),
+        "message_id": message.message_id,
+        "chat_id": message.chat_id,
+        "user_id": message.from_user.id if message.from_user else None,
+        "admin_id": admin_id,
+        "message": text[:500],
+        "timestamp": datetime.utcnow()
+    }
+
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler für /start Command"""
     user = update.effective_user
@@ -59,7 +86,10 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if is_admin_user:
         help_text += """👑 **Admin Commands:**
 /stats - Heutige Statistiken anzeigen
+/stats 7d - Statistiken für Zeitraum (24h, 7d, 30d; `chat` = nur dieser Chat)
 /config - Konfiguration verwalten
+/indexes - Index-Nutzung und Collection-Größen
+/profile <sekunden> - Sampling-Profil des laufenden Bots
 /whitelist - Whitelist verwalten
 /whitelist add @username - User zur Whitelist hinzufügen
 /whitelist remove @username - User von Whitelist entfernen
@@ -71,6 +101,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /keywords - Gelernte Keywords verwalten
 /keywords list - Alle gelernten Keywords anzeigen
 /keywords remove <keyword> - Keyword entfernen
+/keywords stats - Treffer und Präzision der Keywords
+/keywords prune - Pruning-Vorschau, `prune now` deaktiviert
+/shadow - Shadow-Kandidat: Verdict-Matrix und Kosten (`pause`, `resume`, `reload`)
 
 """
     
@@ -102,8 +135,13 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Stats abrufen
-    stats = await db.get_today_stats()
+    # Zeitraum-Variante: /stats 7d [chat]
+    if context.args:
+        await range_stats_command(update, context)
+        return
+    
+    # Stats abrufen (kurz gecacht, geteilt mit /health und /stats)
+    stats = await stats_cache.get("today", db.get_today_stats)
     
     db_status = "✅ MongoDB" if stats["source"] == "MongoDB" else "🔧 Memory-Fallback"
     
@@ -128,6 +166,58 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
 
 
+async def range_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Statistiken für einen Zeitraum aus den Stunden-Rollups (/stats <range> [chat])"""
+    args = context.args
+    
+    try:
+        delta = parse_range(args[0])
+    except ValueError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n\nBeispiele: `/stats 24h`, `/stats 7d`, `/stats 30d chat`",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    # Optional nur für den aktuellen Chat
+    chat_id = update.effective_chat.id if len(args) > 1 and args[1].lower() == "chat" else None
+    
+    end = datetime.utcnow()
+    stats = await db.get_range_stats(end - delta, end, chat_id)
+    
+    if not stats:
+        await update.message.reply_text(
+            "⚠️ Zeitraum-Statistiken sind nur mit MongoDB verfügbar.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    scope = f"Chat `{chat_id}`" if chat_id else "Alle Chats"
+    
+    reasons = "\n".join(f"• {r['name']}: {r['count']}" for r in stats["top_reasons"]) or "• -"
+    domains = "\n".join(f"• {d['name']}: {d['count']}" for d in stats["top_domains"]) or "• -"
+    
+    message = f"""📊 **STATISTIKEN ({args[0]})**
+━━━━━━━━━━━━━━━━━━━━
+🌐 **Bereich:** {scope}
+
+🚫 **Spam blockiert:** {stats['spam_blocked']}
+👢 **CAPTCHA-Kicks:** {stats['captcha_kicks']}
+📹 **Media blockiert (neue User):** {stats['media_blocks']}
+
+📈 **Gesamt Nachrichten:** {stats['messages_total']}
+🛡️ **Spam-Rate:** {stats['spam_rate']}%
+
+📋 **Top-Gründe:**
+{reasons}
+
+🔗 **Top-Domains:**
+{domains}
+"""
+    
+    await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+
+
 async def config_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler für /config Command"""
     user = update.effective_user
@@ -167,6 +257,103 @@ Konfigurationsänderungen müssen in der `config.py` vorgenommen werden.
     await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
 
 
+async def indexes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler für /indexes Command - Index-Nutzung und Collection-Größen"""
+    user = update.effective_user
+    
+    if not is_admin(user.id):
+        await update.message.reply_text(
+            "❌ Nur Admins können den Index-Report abrufen.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    report = await db.get_index_report()
+    
+    if not report:
+        await update.message.reply_text(
+            "⚠️ Index-Report ist nur mit MongoDB verfügbar.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    message = "🗂️ **INDEX-REPORT**\n━━━━━━━━━━━━━━━━━━━━\n\n"
+    
+    for entry in report:
+        size_mb = entry["size_bytes"] / (1024 * 1024)
+        retention = config.RETENTION_DAYS.get(entry["collection"])
+        retention_text = f", {retention}d" if retention else ""
+        
+        message += f"📁 `{entry['collection']}` ({entry['documents']} Docs, {size_mb:.1f} MB{retention_text})\n"
+        for name, usage in entry["index_usage"].items():
+            index_kb = entry["index_sizes"].get(name, 0) / 1024
+            unused = " ⚠️" if usage["ops"] == 0 else ""
+            message += f"   • `{name}`: {usage['ops']} Zugriffe, {index_kb:.0f} KB{unused}\n"
+        message += "\n"
+    
+    message += "⚠️ = seit letztem Server-Neustart nicht genutzt"
+    
+    await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler für /profile Command - Sampling-Profil als Collapsed-Stack-Datei"""
+    user = update.effective_user
+    
+    if not is_admin(user.id):
+        await update.message.reply_text(
+            "❌ Nur Admins können den Profiler starten.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    try:
+        seconds = float(context.args[0]) if context.args else 10.0
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Bitte Dauer in Sekunden angeben: `/profile 10`",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    if profiler.running:
+        await update.message.reply_text("⚠️ Es läuft bereits ein Profiling.")
+        return
+    
+    await update.message.reply_text(
+        f"🔬 Profiling läuft ({min(seconds, config.PROFILE_MAX_SECONDS):.0f}s)...",
+        parse_mode=ParseMode.MARKDOWN
+    )
+    
+    # Im Hintergrund, damit Updates währenddessen weiter verarbeitet werden
+    context.application.create_task(_send_profile(update, seconds))
+
+
+async def _send_profile(update: Update, seconds: float):
+    """Profil aufnehmen und als Datei + Top-Funktionen zurückschicken"""
+    try:
+        collapsed, summary = await profiler.profile(seconds)
+    except ProfilerBusyError:
+        await update.message.reply_text("⚠️ Es läuft bereits ein Profiling.")
+        return
+    
+    top = profiler.top_functions(collapsed)
+    message = (
+        f"🔬 **PROFIL** ({summary['seconds']}s, {summary['loop_cpu_samples']} Loop-CPU-Samples)\n"
+        f"━━━━━━━━━━━━━━━━━━━━\n\n"
+        f"**Top-Funktionen (Self-Time):**\n"
+    )
+    for function, count in top:
+        message += f"• `{function}`: {count}\n"
+    
+    filename = f"profile_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.collapsed"
+    await update.message.reply_document(
+        document=InputFile(collapsed.encode("utf-8"), filename=filename),
+        caption="Collapsed Stacks (flamegraph.pl / speedscope)"
+    )
+    await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+
+
 async def whitelist_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler für /whitelist Command"""
     user = update.effective_user
@@ -383,6 +570,9 @@ async def spam_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     keywords = [w for w in words if w not in stopwords and len(w) >= 4]
     
+    # Bereits gelernte Keywords in der Nachricht gelten als bestätigt (Präzision)
+    await db.log_feedback("spam", learned_hits(spam_text), feedback_data(spam_message, user.id, spam_text))
+    
     # Entferne Duplikate
     keywords = list(set(keywords))
     
@@ -393,17 +583,15 @@ async def spam_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Speichere Keywords in DB
-    added_count = 0
-    for keyword in keywords[:10]:  # Max 10 Keywords pro Nachricht
-        success = await db.add_learned_keyword(
-            keyword=keyword,
-            category="learned_spam",
-            added_by=user.id,
-            source_message=spam_text[:500]
-        )
-        if success:
-            added_count += 1
+    # Speichere Keywords in DB (ein bulk_write, max 10 Keywords pro Nachricht)
+    added_count, _ = await db.add_learned_keywords(
+        keywords[:10],
+        category="learned_spam",
+        added_by=user.id,
+        source_message=spam_text[:500]
+    )
+    if added_count:
+        await refresh_learned_keywords()
     
     # Lösche die Spam-Nachricht
     try:
@@ -446,13 +634,21 @@ async def notspam_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Hier könnte man in Zukunft Keywords aus der False-Positive-Nachricht
-    # aus der learned_keywords Collection entfernen
-    # Für jetzt: Einfach Bestätigung
+    # Gelernte Keywords der Nachricht als False Positive zählen; das Pruning
+    # deaktiviert sie, sobald ihre Präzision unter KEYWORD_PRUNE_MIN_PRECISION fällt
+    ham_message = update.message.reply_to_message
+    ham_text = ham_message.text or ham_message.caption or ""
+    hits = learned_hits(ham_text)
+    await db.log_feedback("ham", hits, feedback_data(ham_message, user.id, ham_text))
     
+    hits_info = (
+        f"🧠 **False Positive gezählt für:** {', '.join(f'`{k}`' for k in hits[:10])}\n\n"
+        if hits else ""
+    )
     await update.message.reply_text(
         "✅ Nachricht als legitim markiert!\n\n"
-        "ℹ️ **Hinweis:** Um gelernte Keywords zu entfernen, nutze `/keywords remove <keyword>`",
+        f"{hits_info}"
+        "ℹ️ **Hinweis:** Um gelernte Keywords sofort zu entfernen, nutze `/keywords remove <keyword>`",
         parse_mode=ParseMode.MARKDOWN
     )
 
@@ -515,6 +711,7 @@ async def keywords_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         success = await db.remove_learned_keyword(keyword)
         
         if success:
+            await refresh_learned_keywords()
             await update.message.reply_text(
                 f"✅ Keyword `{keyword}` entfernt!",
                 parse_mode=ParseMode.MARKDOWN
@@ -525,10 +722,135 @@ async def keywords_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parse_mode=ParseMode.MARKDOWN
             )
     
+    elif args[0].lower() == "stats":
+        keyword_stats = await db.get_keyword_stats()
+        if keyword_stats is None:
+            await update.message.reply_text("❌ Keyword-Statistik benötigt MongoDB.", parse_mode=ParseMode.MARKDOWN)
+            return
+        
+        active = {entry["keyword"] for entry in await db.get_learned_keywords_list(limit=None)}
+        ranked = sorted(
+            ((keyword, keyword_stats.get(keyword, {})) for keyword in active),
+            key=lambda item: item[1].get("hits", 0),
+            reverse=True
+        )
+        
+        message = "📊 **KEYWORD-STATISTIK**\n━━━━━━━━━━━━━━━━━━━━\n\n"
+        for keyword, stats in ranked[:20]:
+            precision = keyword_precision(stats)
+            message += (
+                f"• `{keyword}`: {stats.get('hits', 0)} Treffer, "
+                f"{stats.get('spam_hits', 0)} Spam, {stats.get('false_positives', 0)} FP"
+                f"{f', Präzision {precision:.0%}' if precision is not None else ''}\n"
+            )
+        message += f"\n**Aktiv:** {len(active)} Keywords"
+        
+        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+    
+    elif args[0].lower() == "prune":
+        # Ohne "now" nur Vorschau, auch wenn das periodische Pruning aktiv ist
+        apply = len(args) > 1 and args[1].lower() == "now"
+        candidates = await keyword_pruner.prune(dry_run=not apply)
+        # Vor einer vollen Schonfrist an Statistik bleibt es bei der Vorschau
+        warming_up = keyword_pruner.warming_up
+        apply = apply and not warming_up
+        
+        if not candidates:
+            await update.message.reply_text("✅ Keine Keywords zum Deaktivieren.", parse_mode=ParseMode.MARKDOWN)
+            return
+        
+        message = "✂️ **Deaktiviert:**\n" if apply else "🔍 **Pruning-Vorschau:**\n"
+        for keyword, reason in candidates[:30]:
+            message += f"• `{keyword}` ({reason})\n"
+        if len(candidates) > 30:
+            message += f"\n... und {len(candidates)-30} weitere"
+        if warming_up:
+            message += f"\n\n⏳ Trefferzählung läuft noch keine {config.KEYWORD_PRUNE_MIN_AGE_DAYS} Tage - nur Vorschau"
+        elif not apply:
+            message += "\n\n`/keywords prune now` - Jetzt deaktivieren"
+        
+        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+    
     else:
         await update.message.reply_text(
             "❌ Unbekannte Aktion. Nutze:\n"
             "`/keywords list` - Alle Keywords anzeigen\n"
-            "`/keywords remove <keyword>` - Keyword entfernen",
+            "`/keywords remove <keyword>` - Keyword entfernen\n"
+            "`/keywords stats` - Treffer und Präzision\n"
+            "`/keywords prune` - Pruning-Vorschau",
             parse_mode=ParseMode.MARKDOWN
         )
+
+
+async def shadow_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler für /shadow Command - Live vs. Kandidat im Shadow-Mode"""
+    user = update.effective_user
+    
+    if not is_admin(user.id):
+        await update.message.reply_text(
+            "❌ Nur Admins können den Shadow-Mode verwalten.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    args = list(context.args or [])
+    # "/shadow 30" = "/shadow report 30"
+    if args and args[0].isdigit():
+        args.insert(0, "report")
+    action = args[0].lower() if args else "report"
+    
+    if action == "reload":
+        if not config.SHADOW_CANDIDATE_PATH:
+            await update.message.reply_text("❌ `SHADOW_CANDIDATE_PATH` nicht gesetzt.", parse_mode=ParseMode.MARKDOWN)
+            return
+        try:
+            candidate = shadow.load(config.SHADOW_CANDIDATE_PATH)
+        except Exception as e:
+            await update.message.reply_text(f"❌ Kandidat nicht ladbar: {e}")
+            return
+        await update.message.reply_text(f"✅ Kandidat `{candidate.name}` geladen.", parse_mode=ParseMode.MARKDOWN)
+        return
+    
+    if action in ("pause", "resume"):
+        if action == "pause":
+            shadow.pause(f"pausiert von {user.id}")
+        else:
+            shadow.resume()
+        await update.message.reply_text(
+            f"🌓 Shadow-Mode {'aktiv' if shadow.active else 'pausiert'}.", parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    try:
+        days = int(args[1]) if len(args) > 1 else 7
+    except ValueError:
+        days = 7
+    report = await shadow.report(max(1, min(days, 90)))
+    
+    if report["candidate"] is None:
+        await update.message.reply_text(
+            "🌓 Kein Shadow-Kandidat geladen (`SHADOW_CANDIDATE_PATH`).", parse_mode=ParseMode.MARKDOWN
+        )
+        return
+    
+    matrix = report["matrix"]
+    agreement = f"{report['agreement']:.1%}" if report["agreement"] is not None else "-"
+    live_us = f"{report['live_us_per_message']:.0f} µs" if report["live_us_per_message"] is not None else "-"
+    candidate_us = f"{report['candidate_us_per_message']:.0f} µs" if report["candidate_us_per_message"] is not None else "-"
+    status = "✅ aktiv" if report["active"] else f"⏸️ pausiert ({report['paused_reason']})"
+    
+    message = f"""🌓 **SHADOW: {report['candidate']}**
+━━━━━━━━━━━━━━━━━━━━
+{status} · Quelle: {report['source']}
+
+```
+              Kandidat
+              Spam    Ham
+Live  Spam  {matrix['ss']:>6} {matrix['sh']:>6}
+      Ham   {matrix['hs']:>6} {matrix['hh']:>6}
+```
+🤝 **Übereinstimmung:** {agreement} von {report['total']}
+⏱️ **Kosten/Nachricht:** Live {live_us}, Kandidat {candidate_us}
+"""
+    
+    await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
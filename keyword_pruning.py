@@ -0,0 +1,162 @@
+"""
+Pruning gelernter Keywords anhand von Trefferzählern und Admin-Feedback
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+from database import db
+from startup import refresh_learned_keywords
+
+logger = logging.getLogger(__name__)
+
+
+def keyword_precision(stats: Dict[str, int]) -> Optional[float]:
+    """
+    Geschätzte Präzision: Spam-Treffer und per /spam bestätigte Treffer gegen
+    per /notspam gemeldete False Positives. None ohne jede Bewertung.
+    """
+    true_positives = stats.get("spam_hits", 0) + stats.get("confirmed", 0)
+    false_positives = stats.get("false_positives", 0)
+    if true_positives + false_positives == 0:
+        return None
+    return true_positives / (true_positives + false_positives)
+
+
+def prune_reason(
+    stats: Dict[str, int],
+    added_at: Optional[datetime],
+    now: datetime,
+    tracking_started: Optional[datetime] = None
+) -> Optional[str]:
+    """
+    Grund für die Deaktivierung eines Keywords oder None (behalten).
+    Die Schonfrist beginnt beim späteren Zeitpunkt von `added_at` und dem
+    Beginn der Trefferzählung: ältere Keywords haben davor keine Statistik.
+    """
+    hits = stats.get("hits", 0)
+    spam_hits = stats.get("spam_hits", 0) + stats.get("confirmed", 0)
+
+    # Häufige False Positives: unabhängig vom Alter
+    precision = keyword_precision(stats)
+    if (
+        stats.get("false_positives", 0) >= config.KEYWORD_PRUNE_MIN_FALSE_POSITIVES
+        and precision is not None and precision < config.KEYWORD_PRUNE_MIN_PRECISION
+    ):
+        return "false_positives"
+
+    # Alles Weitere erst nach der Schonfrist
+    observed_since = max(filter(None, (added_at, tracking_started)), default=None)
+    if observed_since is None or now - observed_since < timedelta(days=config.KEYWORD_PRUNE_MIN_AGE_DAYS):
+        return None
+
+    # Allgemeine Wörter: trifft oft, aber selten in Spam
+    if hits >= config.KEYWORD_PRUNE_MIN_HITS_FOR_RATIO and spam_hits / hits < config.KEYWORD_PRUNE_MIN_SPAM_RATIO:
+        return "generic"
+
+    # Kein Nutzen: seit der Schonfrist (fast) nie in Spam getroffen
+    if spam_hits < config.KEYWORD_PRUNE_MIN_SPAM_HITS:
+        return "unused"
+
+    return None
+
+
+class KeywordPruner:
+    """
+    Deaktiviert periodisch gelernte Keywords mit geringem Nutzen oder vielen
+    False Positives. Der aktive Matcher bleibt dadurch klein; deaktivierte
+    Keywords bleiben in der Collection und werden von /spam nicht neu angelegt.
+    """
+
+    def __init__(self, interval: float = config.KEYWORD_PRUNE_INTERVAL, dry_run: bool = config.KEYWORD_PRUNE_DRY_RUN):
+        self.interval = interval
+        self.dry_run = dry_run
+        self._lock = asyncio.Lock()
+        self.last_run: Optional[datetime] = None
+        self.last_result: List[Tuple[str, str]] = []
+        self.tracking_started: Optional[datetime] = None
+        self.stats = {"runs": 0, "pruned": 0, "skipped_no_db": 0}
+
+    async def evaluate(self) -> Optional[List[Tuple[str, str]]]:
+        """(Keyword, Grund) aller zu deaktivierenden Keywords, None ohne MongoDB"""
+        keyword_stats = await db.get_keyword_stats()
+        if keyword_stats is None:
+            return None
+        self.tracking_started = await db.get_keyword_stats_started_at()
+
+        now = datetime.utcnow()
+        candidates = []
+        for doc in await db.get_learned_keywords_list(limit=None):
+            reason = prune_reason(keyword_stats.get(doc["keyword"], {}), doc.get("added_at"), now, self.tracking_started)
+            if reason:
+                candidates.append((doc["keyword"], reason))
+        return candidates
+
+    @property
+    def warming_up(self) -> bool:
+        """Noch keine volle Schonfrist an Statistik seit Beginn der Trefferzählung"""
+        return self.tracking_started is None or (
+            datetime.utcnow() - self.tracking_started < timedelta(days=config.KEYWORD_PRUNE_MIN_AGE_DAYS)
+        )
+
+    async def prune(self, dry_run: Optional[bool] = None) -> List[Tuple[str, str]]:
+        """
+        Einen Durchlauf ausführen, gibt die (ggf. nur vorgeschlagenen) Deaktivierungen zurück.
+        Bis eine volle Schonfrist an Statistik vorliegt, wird immer nur vorgeschlagen.
+        """
+        dry_run = self.dry_run if dry_run is None else dry_run
+        async with self._lock:
+            candidates = await self.evaluate()
+            if candidates is None:
+                self.stats["skipped_no_db"] += 1
+                return []
+            dry_run = dry_run or self.warming_up
+
+            self.stats["runs"] += 1
+            self.last_run = datetime.utcnow()
+            self.last_result = candidates
+            if dry_run or not candidates:
+                return candidates
+
+            by_reason: Dict[str, List[str]] = {}
+            for keyword, reason in candidates:
+                by_reason.setdefault(reason, []).append(keyword)
+
+            removed = 0
+            for reason, keywords in by_reason.items():
+                removed += await db.deactivate_learned_keywords(keywords, f"pruned:{reason}")
+            self.stats["pruned"] += removed
+
+            if removed:
+                await refresh_learned_keywords()
+                logger.info(f"✂️ {removed} gelernte Keywords deaktiviert: {', '.join(k for k, _ in candidates[:10])}")
+            return candidates
+
+    async def run(self, is_responsible: Callable[[], bool] = lambda: True):
+        """Periodisches Pruning als Hintergrund-Task (im Cluster nur auf dem Leader)"""
+        while True:
+            await asyncio.sleep(self.interval)
+            if not is_responsible():
+                continue
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.error(f"❌ Fehler beim Keyword-Pruning: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        """Zustand für /health"""
+        return {
+            "interval": self.interval,
+            "dry_run": self.dry_run,
+            "tracking_started": self.tracking_started.isoformat() if self.tracking_started else None,
+            "warming_up": self.warming_up,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_candidates": len(self.last_result),
+            **self.stats,
+        }
+
+
+# Globale Pruner-Instanz
+keyword_pruner = KeywordPruner()
@@ -0,0 +1,165 @@
+"""
+Nicht-blockierendes Logging: Queue + Writer-Thread, JSON-Ausgabe, Rate-Limit
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import config
+
+# Attribute, die jeder LogRecord mitbringt; alles andere stammt aus `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "per_message"}
+
+# Bibliotheken, die pro Request auf INFO loggen (httpx: jeder getUpdates-Poll)
+_NOISY_LOGGERS = ("httpx", "httpcore", "apscheduler")
+
+
+class JsonFormatter(logging.Formatter):
+    """Eine JSON-Zeile pro Eintrag; Felder aus `extra` werden übernommen"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class PerMessageRateLimit(logging.Filter):
+    """
+    Token-Bucket pro Aufrufstelle für Einträge mit `extra={"per_message": True}`.
+
+    Pro Stelle (Logger + Format-String) sind `burst` Einträge sofort und danach
+    `rate` pro Sekunde erlaubt. Unterdrückte Einträge werden gezählt und beim
+    nächsten durchgelassenen Eintrag als `suppressed` mitgeschrieben. Fehler
+    (ERROR und höher) werden nie unterdrückt.
+    """
+
+    def __init__(self, rate: float = config.LOG_RATE_PER_SECOND, burst: float = config.LOG_RATE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Tuple[str, str], list] = {}  # Stelle -> [Tokens, letzte Auffüllung, unterdrückt]
+        self.suppressed_total = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "per_message", False) or record.levelno >= logging.ERROR:
+            return True
+
+        now = time.monotonic()
+        key = (record.name, str(record.msg))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now, 0]
+
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            self.suppressed_total += 1
+            return False
+
+        bucket[0] -= 1
+        if bucket[2]:
+            record.suppressed = bucket[2]
+            bucket[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, der im Event-Loop nichts formatiert und nie blockiert.
+
+    Der Standard-QueueHandler formatiert die Nachricht bereits beim Einreihen;
+    hier übernimmt das der Writer-Thread. Ist die Queue voll, wird der Eintrag
+    verworfen und gezählt.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    """Root-Logger -> Queue -> Writer-Thread -> stdout"""
+
+    def __init__(self):
+        self.queue: Optional[queue.Queue] = None
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.rate_limit: Optional[PerMessageRateLimit] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._lock = threading.Lock()
+
+    def setup(self):
+        """Ersetzt die Handler des Root-Loggers (idempotent)"""
+        with self._lock:
+            if self.listener is not None:
+                return
+
+            stream = logging.StreamHandler(sys.stdout)
+            if config.LOG_FORMAT == "json":
+                stream.setFormatter(JsonFormatter())
+            else:
+                stream.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+            self.queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+            self.rate_limit = PerMessageRateLimit()
+            self.handler = NonBlockingQueueHandler(self.queue)
+            self.handler.addFilter(self.rate_limit)
+
+            root = logging.getLogger()
+            for existing in list(root.handlers):
+                root.removeHandler(existing)
+            root.addHandler(self.handler)
+            root.setLevel(config.LOG_LEVEL)
+            for name in _NOISY_LOGGERS:
+                logging.getLogger(name).setLevel(logging.WARNING)
+
+            self.listener = logging.handlers.QueueListener(self.queue, stream, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Restliche Einträge schreiben und Writer-Thread beenden"""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def status(self) -> Dict[str, Any]:
+        if self.handler is None:
+            return {"active": False}
+        return {
+            "active": self.listener is not None,
+            "format": config.LOG_FORMAT,
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "rate_limited": self.rate_limit.suppressed_total,
+        }
+
+
+# Globale Logging-Pipeline
+logging_pipeline = LoggingPipeline()
@@ -0,0 +1,201 @@
+"""
+Überwachung des Event-Loops: Lag-Messung und Erkennung blockierender Callbacks
+"""
+import asyncio
+import functools
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import config
+from metrics import HANDLER_SECONDS, LOOP_LAG_SECONDS, LOOP_STALLS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any, Any], Awaitable[Any]]
+
+
+class LoopMonitor:
+    """
+    Misst kontinuierlich die Verzögerung des Event-Loops.
+
+    Ein Task schläft `interval` Sekunden und misst, wie viel später er
+    tatsächlich wieder dran ist (Lag). Ein Watchdog-Thread prüft parallel
+    den Herzschlag dieses Tasks: Bleibt er länger als die Schwelle aus,
+    blockiert gerade ein Callback den Loop. Dann wird der Stack des
+    Loop-Threads samt der gerade laufenden Handler (Update, Chat, User)
+    festgehalten.
+    """
+
+    def __init__(
+        self,
+        interval: float = config.LOOP_MONITOR_INTERVAL,
+        threshold: float = config.LOOP_STALL_THRESHOLD_MS / 1000
+    ):
+        self.interval = interval
+        self.threshold = threshold
+
+        self._lags: Deque[float] = deque(maxlen=1000)  # letzte Messungen (Sekunden)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.slow_events: Deque[Dict[str, Any]] = deque(maxlen=20)
+
+        # Laufende Handler (id -> Kontext), vom Watchdog-Thread nur gelesen
+        self._active: Dict[int, Dict[str, Any]] = {}
+
+        self._heartbeat = time.monotonic()
+        self._captured: Optional[Dict[str, Any]] = None  # vom Watchdog erfasste Blockade
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    # ===== Lag-Messung (im Event-Loop) =====
+
+    def start(self):
+        """Startet Messung und Watchdog"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self._heartbeat = time.monotonic()
+
+            self._lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+
+            if lag >= self.threshold:
+                self._record_stall(lag)
+
+    def _record_stall(self, lag: float):
+        """Blockade mit (falls erfasst) Stack und auslösendem Update protokollieren"""
+        captured, self._captured = self._captured, None
+        handlers = captured["handlers"] if captured else self._active_handlers()
+
+        event = {
+            "at": datetime.utcnow().isoformat(),
+            "lag_ms": round(lag * 1000, 1),
+            "handlers": handlers,
+            "stack": captured["stack"] if captured else [],
+        }
+        self.slow_events.append(event)
+        self.stalls += 1
+        LOOP_STALLS_TOTAL.inc()
+
+        where = event["stack"][-1] if event["stack"] else "unbekannt"
+        logger.warning(
+            f"🐢 Event-Loop {event['lag_ms']:.0f} ms blockiert (in {where}), "
+            f"Handler: {handlers or '-'}"
+        )
+
+    # ===== Watchdog (eigener Thread) =====
+
+    def _watch(self):
+        captured_for = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat < self.interval + self.threshold:
+                continue
+            if captured_for == heartbeat:
+                continue  # diese Blockade ist bereits erfasst
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = [
+                f"{entry.name} ({entry.filename.rsplit('/', 1)[-1]}:{entry.lineno})"
+                for entry in traceback.extract_stack(frame, limit=15)
+            ]
+            self._captured = {"stack": stack, "handlers": self._active_handlers()}
+            captured_for = heartbeat
+
+    def _active_handlers(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        handlers = []
+        for context in list(self._active.values()):
+            entry = {key: value for key, value in context.items() if key != "started"}
+            entry["running_ms"] = round((now - context["started"]) * 1000)
+            handlers.append(entry)
+        return handlers
+
+    # ===== Handler-Instrumentierung =====
+
+    def wrap(self, handler: Handler) -> Handler:
+        """Telegram-Handler mit Dauer-Messung und Update-Kontext für Blockade-Reports"""
+        name = handler.__name__
+        series = HANDLER_SECONDS.labels(name)
+
+        @functools.wraps(handler)
+        async def wrapper(update, context):
+            chat = getattr(update, "effective_chat", None)
+            user = getattr(update, "effective_user", None)
+            info = {
+                "handler": name,
+                "update_id": getattr(update, "update_id", None),
+                "chat_id": chat.id if chat else None,
+                "user_id": user.id if user else None,
+                "started": time.monotonic(),
+            }
+            key = id(info)
+            self._active[key] = info
+            start = time.perf_counter()
+            try:
+                return await handler(update, context)
+            finally:
+                self._active.pop(key, None)
+                series.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    # ===== Status =====
+
+    def status(self) -> Dict[str, Any]:
+        """Lag-Verteilung und letzte Blockaden für /health"""
+        lags = sorted(self._lags)
+
+        def percentile(p: float) -> Optional[float]:
+            if not lags:
+                return None
+            return round(lags[min(len(lags) - 1, int(len(lags) * p))] * 1000, 2)
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_p50_ms": percentile(0.5),
+            "lag_p95_ms": percentile(0.95),
+            "lag_p99_ms": percentile(0.99),
+            "lag_max_ms": round(self.max_lag * 1000, 2),
+            "stalls": self.stalls,
+            "active_handlers": len(self._active),
+            "recent_stalls": list(self.slow_events)[-5:],
+        }
+
+
+# Globale Monitor-Instanz
+loop_monitor = LoopMonitor()
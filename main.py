@@ -2,12 +2,18 @@
 Telegram Anti-Spam Bot
 Hauptdatei mit Bot-Logik, CAPTCHA-System und Message Handler
 """
+import time
+
+# Startpunkt für die Kaltstart-Messung (Imports bis zum ersten Urteil)
+PROCESS_START = time.perf_counter()
+
 import logging
 import asyncio
 import uuid
 import random
+import secrets
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from telegram import Update, ChatMemberUpdated, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -20,42 +26,68 @@ from telegram.ext import (
     ContextTypes
 )
 from telegram.constants import ParseMode
-from fastapi import FastAPI
+from telegram.request import HTTPXRequest
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from bson import json_util
 import uvicorn
 
 import config
-from database import db
+from cache import stats_cache
+from cluster import cluster
+from database import EXPORT_COLLECTIONS, db
+from profiler import ProfilerBusyError, profiler
+from loop_monitor import loop_monitor
+from keyword_pruning import keyword_pruner
+from shadow import shadow
+from logging_setup import logging_pipeline
+from metrics import (
+    CAPTCHA_EVENTS_TOTAL,
+    MESSAGES_TOTAL,
+    STAGE_DB_LOG,
+    STAGE_DELETE,
+    STAGE_DETECTION,
+    STAGE_NOTIFY,
+    STAGE_WHITELIST,
+    TELEGRAM_API_ERRORS_TOTAL,
+    TELEGRAM_API_SECONDS,
+    registry,
+)
+from rollups import parse_range
+from startup import StartupTimings, prepare_database, warm_start
 from spam_detector import spam_detector
+from tenants import Tenant, tenant_of, tenants
 from handlers import (
     start_command,
     help_command,
     stats_command,
     config_command,
+    indexes_command,
+    profile_command,
     whitelist_command,
     spam_command,
     notspam_command,
-    keywords_command
+    keywords_command,
+    shadow_command
 )
 
-# Logging Setup
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Logging Setup (Queue + Writer-Thread, siehe logging_setup.py)
+logging_pipeline.setup()
 logger = logging.getLogger(__name__)
 
-# Globale Variable für Bot Application
-bot_app: Optional[Application] = None
+# Bot Applications liegen pro Tenant in der Registry (tenants.py)
 
-# Dictionary um neue User zu tracken (chat_id -> {user_id -> join_time})
-new_users = {}
+# Offene CAPTCHAs (pending_verifications, captcha_batches, open_batches) und
+# neue/verifizierte User (MembershipStore) liegen pro Tenant (tenants.py)
+membership_sweepers: List[asyncio.Task] = []
 
-# Dictionary für CAPTCHA Verifications (user_id -> {challenge, answer, message_id, task})
-pending_verifications: Dict[int, Dict] = {}
+# Periodisches Pruning gelernter Keywords (keyword_pruning.py)
+keyword_pruning_task: Optional[asyncio.Task] = None
 
-# Dictionary für verifizierte User (user_id -> verification_time)
-verified_users: Dict[int, datetime] = {}
+# Dauer der Startphasen (für /health), gemessen ab Prozessstart
+startup_timings = StartupTimings(started=PROCESS_START)
+startup_timings.mark("imports")
 
 
 # CAPTCHA Challenges
@@ -93,19 +125,47 @@ def generate_captcha() -> Tuple[str, str, list]:
     return question, correct_answer, shuffled_options
 
 
-async def send_captcha(chat_id: int, user_id: int, username: str, context: ContextTypes.DEFAULT_TYPE):
-    """Sendet CAPTCHA an neuen User"""
-    try:
-        # Generiere Challenge
-        question, correct_answer, options = generate_captcha()
+class CaptchaBatch:
+    """Gemeinsames CAPTCHA für User, die kurz nacheinander einem Chat beitreten"""
+    
+    def __init__(self, chat_id: int, token: str):
+        self.chat_id = chat_id
+        self.token = token
+        self.question, self.correct_answer, self.options = generate_captcha()
+        self.members: Dict[int, str] = {}  # Offene User (user_id -> username)
+        self.message_id: Optional[int] = None
+        self.flush_task: Optional[asyncio.Task] = None
+        self.timeout_task: Optional[asyncio.Task] = None
+        self.edit_task: Optional[asyncio.Task] = None
+        self.created_at = datetime.utcnow()
+    
+    def render_text(self) -> str:
+        """CAPTCHA-Text für alle noch offenen User"""
+        mentions = ", ".join(f"@{name}" for name in self.members.values())
+        
+        if len(self.members) == 1:
+            return (
+                f"👋 **Willkommen {mentions}!**\n\n"
+                f"🔒 **Bitte verifiziere dich um fortzufahren:**\n\n"
+                f"❓ {self.question}\n\n"
+                f"⏰ Du hast **{config.CAPTCHA_TIMEOUT} Sekunden** Zeit!"
+            )
         
-        # Erstelle Inline Keyboard
+        return (
+            f"👋 **Willkommen {mentions}!**\n\n"
+            f"🔒 **Bitte verifiziert euch um fortzufahren (jeder einzeln):**\n\n"
+            f"❓ {self.question}\n\n"
+            f"⏰ Ihr habt **{config.CAPTCHA_TIMEOUT} Sekunden** Zeit!"
+        )
+    
+    def reply_markup(self) -> InlineKeyboardMarkup:
+        """Inline Keyboard mit kurzem Token statt user_id (max. 64 Bytes callback_data)"""
         keyboard = []
         row = []
-        for i, option in enumerate(options):
+        for i, option in enumerate(self.options):
             row.append(InlineKeyboardButton(
                 option,
-                callback_data=f"captcha_{user_id}_{option}"
+                callback_data=f"captcha_{self.token}_{i}"
             ))
             # 2 Buttons pro Zeile
             if len(row) == 2:
@@ -114,85 +174,189 @@ async def send_captcha(chat_id: int, user_id: int, username: str, context: Conte
         if row:  # Rest hinzufügen
             keyboard.append(row)
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        return InlineKeyboardMarkup(keyboard)
+
+
+async def send_captcha(chat_id: int, user_id: int, username: str, context: ContextTypes.DEFAULT_TYPE):
+    """Fügt neuen User zum offenen CAPTCHA-Batch des Chats hinzu"""
+    try:
+        tenant = tenant_of(context)
+        key = (chat_id, user_id)
+        
+        # Vorherige Challenge im selben Chat aufräumen (z.B. erneuter Beitritt)
+        if key in tenant.pending_verifications:
+            await remove_from_batch(key, context)
         
-        # Sende CAPTCHA-Nachricht
-        message_text = (
-            f"👋 **Willkommen @{username}!**\n\n"
-            f"🔒 **Bitte verifiziere dich um fortzufahren:**\n\n"
-            f"❓ {question}\n\n"
-            f"⏰ Du hast **120 Sekunden** Zeit!"
-        )
+        batch = tenant.open_batches.get(chat_id)
+        if batch is None:
+            # Neues Batch-Fenster öffnen
+            token = secrets.token_hex(4)
+            while token in tenant.captcha_batches:
+                token = secrets.token_hex(4)
+            
+            batch = CaptchaBatch(chat_id, token)
+            tenant.open_batches[chat_id] = batch
+            tenant.captcha_batches[token] = batch
+            batch.flush_task = asyncio.create_task(
+                flush_captcha_batch(batch, context, delay=config.CAPTCHA_BATCH_WINDOW)
+            )
+        
+        batch.members[user_id] = username
+        tenant.pending_verifications[key] = batch
+        CAPTCHA_EVENTS_TOTAL.inc(tenant.name, "joined")
+        
+        # Volles Batch sofort senden
+        if len(batch.members) >= config.CAPTCHA_BATCH_MAX_USERS:
+            batch.flush_task.cancel()
+            await flush_captcha_batch(batch, context)
+        
+    except Exception as e:
+        logger.error(f"❌ Fehler beim Senden von CAPTCHA: {e}")
+
+
+async def flush_captcha_batch(batch: CaptchaBatch, context: ContextTypes.DEFAULT_TYPE, delay: float = 0):
+    """Schließt das Batch-Fenster und sendet eine gemeinsame CAPTCHA-Nachricht"""
+    try:
+        if delay:
+            await asyncio.sleep(delay)
+        
+        tenant = tenant_of(context)
+        if tenant.open_batches.get(batch.chat_id) is batch:
+            del tenant.open_batches[batch.chat_id]
+        
+        if not batch.members:
+            # Alle User haben den Chat im Fenster wieder verlassen/neu betreten
+            tenant.captcha_batches.pop(batch.token, None)
+            return
         
         sent_message = await context.bot.send_message(
-            chat_id=chat_id,
-            text=message_text,
-            reply_markup=reply_markup,
+            chat_id=batch.chat_id,
+            text=batch.render_text(),
+            reply_markup=batch.reply_markup(),
             parse_mode=ParseMode.MARKDOWN
         )
+        batch.message_id = sent_message.message_id
+        CAPTCHA_EVENTS_TOTAL.inc(tenant.name, "sent")
+        
+        # Ein Timeout-Task für das gesamte Batch
+        batch.timeout_task = asyncio.create_task(captcha_timeout(batch, context))
         
-        # Erstelle Timeout-Task
-        timeout_task = asyncio.create_task(
-            captcha_timeout(chat_id, user_id, username, sent_message.message_id, context)
+        logger.info(
+            "🔒 CAPTCHA gesendet an %d User in Chat %s", len(batch.members), batch.chat_id,
+            extra={"per_message": True, "chat_id": batch.chat_id, "user_ids": list(batch.members)}
         )
         
-        # Speichere Verification
-        pending_verifications[user_id] = {
-            "chat_id": chat_id,
+    except asyncio.CancelledError:
+        # Batch wurde vorzeitig (voll) gesendet
+        pass
+    except Exception as e:
+        logger.error(f"❌ Fehler beim Senden von CAPTCHA-Batch: {e}")
+
+
+async def resolve_member(batch: CaptchaBatch, user_id: int, context: ContextTypes.DEFAULT_TYPE):
+    """Entfernt User aus dem Batch und aktualisiert/löscht die CAPTCHA-Nachricht"""
+    tenant = tenant_of(context)
+    batch.members.pop(user_id, None)
+    if tenant.pending_verifications.get((batch.chat_id, user_id)) is batch:
+        del tenant.pending_verifications[(batch.chat_id, user_id)]
+    
+    if batch.message_id is None:
+        # Noch im Sammelfenster - Nachricht existiert noch nicht
+        return
+    
+    if not batch.members:
+        # Letzter User erledigt -> Nachricht löschen
+        tenant.captcha_batches.pop(batch.token, None)
+        if batch.timeout_task and batch.timeout_task is not asyncio.current_task():
+            batch.timeout_task.cancel()
+        if batch.edit_task:
+            batch.edit_task.cancel()
+        try:
+            await context.bot.delete_message(chat_id=batch.chat_id, message_id=batch.message_id)
+        except:
+            pass
+        return
+    
+    # Mehrere Auflösungen kurz nacheinander zu einem Edit zusammenfassen
+    if batch.edit_task is None or batch.edit_task.done():
+        batch.edit_task = asyncio.create_task(edit_captcha_batch(batch, context))
+
+
+async def edit_captcha_batch(batch: CaptchaBatch, context: ContextTypes.DEFAULT_TYPE):
+    """Aktualisiert die gemeinsame CAPTCHA-Nachricht mit den noch offenen Usern"""
+    try:
+        await asyncio.sleep(config.CAPTCHA_EDIT_DELAY)
+        if not batch.members:
+            return
+        await context.bot.edit_message_text(
+            chat_id=batch.chat_id,
+            message_id=batch.message_id,
+            text=batch.render_text(),
+            reply_markup=batch.reply_markup(),
+            parse_mode=ParseMode.MARKDOWN
+        )
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error(f"❌ Fehler beim Aktualisieren von CAPTCHA-Batch: {e}")
+
+
+async def remove_from_batch(key: Tuple[int, int], context: ContextTypes.DEFAULT_TYPE):
+    """Bricht eine offene Verification ab (z.B. bei erneutem Beitritt)"""
+    batch = tenant_of(context).pending_verifications.get(key)
+    if batch is not None:
+        await resolve_member(batch, key[1], context)
+
+
+async def kick_user(chat_id: int, user_id: int, username: str, reason: str, context: ContextTypes.DEFAULT_TYPE):
+    """Kickt User (Ban + Unban) und loggt den CAPTCHA-Kick"""
+    tenant_of(context).restrictions.discard(chat_id, user_id)
+    
+    try:
+        await context.bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
+        await context.bot.unban_chat_member(chat_id=chat_id, user_id=user_id)  # Unban = Kick
+        
+        CAPTCHA_EVENTS_TOTAL.inc(tenant_of(context).name, "kicked")
+        
+        # Log CAPTCHA-Kick
+        await db.log_captcha_kick({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
             "username": username,
-            "question": question,
-            "correct_answer": correct_answer,
-            "message_id": sent_message.message_id,
-            "timeout_task": timeout_task,
+            "chat_id": chat_id,
+            "reason": reason,
             "timestamp": datetime.utcnow()
-        }
+        })
         
-        logger.info(f"🔒 CAPTCHA gesendet an @{username} (ID: {user_id})")
+        logger.info(
+            "👢 User @%s gekickt: %s", username, reason,
+            extra={"per_message": True, "chat_id": chat_id, "user_id": user_id}
+        )
         
     except Exception as e:
-        logger.error(f"❌ Fehler beim Senden von CAPTCHA: {e}")
+        logger.error(f"❌ Fehler beim Kicken: {e}")
 
 
-async def captcha_timeout(chat_id: int, user_id: int, username: str, message_id: int, context: ContextTypes.DEFAULT_TYPE):
-    """Timeout-Handler für CAPTCHA (120 Sekunden)"""
+async def captcha_timeout(batch: CaptchaBatch, context: ContextTypes.DEFAULT_TYPE):
+    """Timeout-Handler für CAPTCHA-Batch (Standard: 120 Sekunden)"""
     try:
-        await asyncio.sleep(120)  # 120 Sekunden warten
+        await asyncio.sleep(config.CAPTCHA_TIMEOUT)
         
-        # Prüfe ob User noch pending ist
-        if user_id in pending_verifications:
-            logger.warning(f"⏰ CAPTCHA Timeout für @{username} (ID: {user_id})")
-            
-            # Lösche CAPTCHA-Nachricht
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-            except:
-                pass
-            
-            # Kicke User
-            try:
-                await context.bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
-                await context.bot.unban_chat_member(chat_id=chat_id, user_id=user_id)  # Unban = Kick
-                
-                # Log CAPTCHA-Kick
-                await db.log_captcha_kick({
-                    "id": str(uuid.uuid4()),
-                    "user_id": user_id,
-                    "username": username,
-                    "chat_id": chat_id,
-                    "reason": "CAPTCHA Timeout (120s)",
-                    "timestamp": datetime.utcnow()
-                })
-                
-                logger.info(f"👢 User @{username} wegen CAPTCHA-Timeout gekickt")
-                
-            except Exception as e:
-                logger.error(f"❌ Fehler beim Kicken: {e}")
-            
-            # Entferne aus pending
-            del pending_verifications[user_id]
+        # Alle noch offenen User des Batches kicken
+        for user_id, username in list(batch.members.items()):
+            logger.warning(
+                "⏰ CAPTCHA Timeout für @%s (ID: %s) in Chat %s", username, user_id, batch.chat_id,
+                extra={"per_message": True, "chat_id": batch.chat_id, "user_id": user_id}
+            )
+            CAPTCHA_EVENTS_TOTAL.inc(tenant_of(context).name, "timeout")
+            await resolve_member(batch, user_id, context)
+            await kick_user(
+                batch.chat_id, user_id, username,
+                f"CAPTCHA Timeout ({config.CAPTCHA_TIMEOUT}s)", context
+            )
             
     except asyncio.CancelledError:
-        # Task wurde abgebrochen (User hat rechtzeitig geantwortet)
+        # Task wurde abgebrochen (alle User haben rechtzeitig geantwortet)
         pass
     except Exception as e:
         logger.error(f"❌ Fehler im CAPTCHA-Timeout: {e}")
@@ -202,107 +366,83 @@ async def handle_captcha_callback(update: Update, context: ContextTypes.DEFAULT_
     """Handler für CAPTCHA Button-Klicks"""
     try:
         query = update.callback_query
-        await query.answer()
         
-        # Parse callback data: "captcha_{user_id}_{answer}"
+        # Parse callback data: "captcha_{token}_{option_index}"
         parts = query.data.split("_")
-        if len(parts) < 3 or parts[0] != "captcha":
+        if len(parts) != 3 or parts[0] != "captcha" or not parts[2].isdigit():
+            await query.answer()
             return
         
-        captcha_user_id = int(parts[1])
-        user_answer = "_".join(parts[2:])  # Falls Antwort "_" enthält
+        token = parts[1]
+        option_index = int(parts[2])
         
-        # Prüfe ob User der Klicker ist
-        if query.from_user.id != captcha_user_id:
-            await query.answer("❌ Das ist nicht dein CAPTCHA!", show_alert=True)
-            return
-        
-        # Prüfe ob Verification pending ist
-        if captcha_user_id not in pending_verifications:
+        # Prüfe ob Batch noch offen ist (O(1) über Token-Index)
+        tenant = tenant_of(context)
+        batch = tenant.captcha_batches.get(token)
+        if batch is None:
             await query.answer("⚠️ CAPTCHA abgelaufen!", show_alert=True)
             return
         
-        verification = pending_verifications[captcha_user_id]
-        correct_answer = verification["correct_answer"]
-        chat_id = verification["chat_id"]
-        username = verification["username"]
-        message_id = verification["message_id"]
-        timeout_task = verification["timeout_task"]
+        chat_id = batch.chat_id
+        captcha_user_id = query.from_user.id
+        
+        # Prüfe ob Klicker zu diesem CAPTCHA gehört
+        if captcha_user_id not in batch.members:
+            await query.answer("❌ Das ist nicht dein CAPTCHA!", show_alert=True)
+            return
         
-        # Stoppe Timeout-Task
-        timeout_task.cancel()
+        username = batch.members[captcha_user_id]
+        user_answer = batch.options[option_index] if option_index < len(batch.options) else None
         
         # Prüfe Antwort
-        if user_answer == correct_answer:
+        if user_answer == batch.correct_answer:
             # ✅ RICHTIG!
-            logger.info(f"✅ CAPTCHA bestanden: @{username} (ID: {captcha_user_id})")
-            
-            # Lösche CAPTCHA-Nachricht
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-            except:
-                pass
-            
-            # Sende Erfolgs-Nachricht (verschwindet nach 5 Sekunden)
-            success_msg = await context.bot.send_message(
-                chat_id=chat_id,
-                text=f"✅ **@{username} erfolgreich verifiziert!**\n\n"
-                     f"ℹ️ Hinweis: Videos/Fotos erst nach 7 Tagen erlaubt.",
-                parse_mode=ParseMode.MARKDOWN
+            logger.info(
+                "✅ CAPTCHA bestanden: @%s (ID: %s) in Chat %s", username, captcha_user_id, chat_id,
+                extra={"per_message": True, "chat_id": chat_id, "user_id": captcha_user_id}
             )
-            
-            await asyncio.sleep(5)
-            try:
-                await success_msg.delete()
-            except:
-                pass
+            CAPTCHA_EVENTS_TOTAL.inc(tenant.name, "passed")
             
             # Markiere als verifiziert
-            verified_users[captcha_user_id] = datetime.utcnow()
+            tenant.membership.mark_verified(chat_id, captcha_user_id)
+            tenant.restrictions.lift(chat_id, captcha_user_id)
             
-            # Entferne aus pending
-            del pending_verifications[captcha_user_id]
+            # Bestätigung als Popup statt eigener Nachricht
+            await query.answer(
+                "✅ Erfolgreich verifiziert!\n"
+                "ℹ️ Videos/Fotos erst nach 7 Tagen erlaubt."
+            )
+            
+            await resolve_member(batch, captcha_user_id, context)
             
         else:
             # ❌ FALSCH!
-            logger.warning(f"❌ CAPTCHA falsch: @{username} (ID: {captcha_user_id})")
-            
-            # Lösche CAPTCHA-Nachricht
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-            except:
-                pass
-            
-            # Kicke User
-            try:
-                await context.bot.ban_chat_member(chat_id=chat_id, user_id=captcha_user_id)
-                await context.bot.unban_chat_member(chat_id=chat_id, user_id=captcha_user_id)
-                
-                # Log CAPTCHA-Kick
-                await db.log_captcha_kick({
-                    "id": str(uuid.uuid4()),
-                    "user_id": captcha_user_id,
-                    "username": username,
-                    "chat_id": chat_id,
-                    "reason": "CAPTCHA falsche Antwort",
-                    "timestamp": datetime.utcnow()
-                })
-                
-                logger.info(f"👢 User @{username} wegen falscher CAPTCHA-Antwort gekickt")
-                
-            except Exception as e:
-                logger.error(f"❌ Fehler beim Kicken: {e}")
+            logger.warning(
+                "❌ CAPTCHA falsch: @%s (ID: %s) in Chat %s", username, captcha_user_id, chat_id,
+                extra={"per_message": True, "chat_id": chat_id, "user_id": captcha_user_id}
+            )
+            CAPTCHA_EVENTS_TOTAL.inc(tenant.name, "failed")
             
-            # Entferne aus pending
-            del pending_verifications[captcha_user_id]
+            await query.answer()
+            await resolve_member(batch, captcha_user_id, context)
+            await kick_user(chat_id, captcha_user_id, username, "CAPTCHA falsche Antwort", context)
             
     except Exception as e:
         logger.error(f"❌ Fehler beim Verarbeiten von CAPTCHA-Callback: {e}")
 
 
-def is_verified(user_id: int) -> bool:
-    """Prüft ob User verifiziert ist"""
-    return user_id in verified_users
+def is_verified(tenant: Tenant, chat_id: int, user_id: int) -> bool:
+    """Prüft ob User im Chat verifiziert ist (durch diesen Bot)"""
+    return tenant.membership.is_verified(chat_id, user_id)
+
+
+def is_chat_member(chat_member) -> bool:
+    """Prüft ob ChatMember-Status eine aktive Mitgliedschaft ist"""
+    if chat_member is None:
+        return False
+    if chat_member.status == "restricted":
+        return bool(chat_member.is_member)
+    return chat_member.status in ["member", "administrator", "creator"]
 
 
 async def track_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -315,21 +455,25 @@ async def track_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_id = result.chat.id
         new_member = result.new_chat_member
         
-        if new_member.status in ["member", "restricted"]:
+        # Nur echte Beitritte (nicht z.B. unsere eigene Beschränkung member -> restricted)
+        if is_chat_member(new_member) and not is_chat_member(result.old_chat_member):
             user = new_member.user
             
             # Ignoriere Bots
             if user.is_bot:
                 return
             
-            # Initialisiere Chat-Dictionary falls nicht vorhanden
-            if chat_id not in new_users:
-                new_users[chat_id] = {}
-            
             # Speichere Beitrittszeit
-            new_users[chat_id][user.id] = datetime.utcnow()
+            tenant_of(context).membership.add_member(chat_id, user.id)
+            
+            logger.info(
+                "👤 Neues Mitglied: @%s (%s) in Chat %s", user.username, user.id, chat_id,
+                extra={"per_message": True, "chat_id": chat_id, "user_id": user.id}
+            )
             
-            logger.info(f"👤 Neues Mitglied: @{user.username} ({user.id}) in Chat {chat_id}")
+            # Bis zum gelösten CAPTCHA stummschalten
+            if config.CAPTCHA_RESTRICT_ON_JOIN:
+                tenant_of(context).restrictions.restrict(chat_id, user.id)
             
             # Sende CAPTCHA
             await send_captcha(chat_id, user.id, user.username or f"user_{user.id}", context)
@@ -338,18 +482,9 @@ async def track_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"❌ Fehler beim Tracken neuer Mitglieder: {e}")
 
 
-def is_new_user(chat_id: int, user_id: int) -> bool:
+def is_new_user(tenant: Tenant, chat_id: int, user_id: int) -> bool:
     """Prüft ob User neu in der Gruppe ist (< 7 Tage)"""
-    if chat_id not in new_users:
-        return False
-    
-    if user_id not in new_users[chat_id]:
-        return False
-    
-    join_time = new_users[chat_id][user_id]
-    time_since_join = (datetime.utcnow() - join_time).total_seconds()
-    
-    return time_since_join < config.NEW_USER_WINDOW
+    return tenant.membership.is_new_user(chat_id, user_id)
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -363,30 +498,45 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if message.from_user.is_bot:
             return
         
+        tenant = tenant_of(context)
         chat_id = message.chat_id
         user_id = message.from_user.id
         username = message.from_user.username or f"user_{user_id}"
         message_id = message.message_id
         
         # Prüfe ob User auf Whitelist ist
+        stage_start = time.perf_counter()
         is_whitelisted = await db.is_whitelisted(user_id)
+        STAGE_WHITELIST.observe(time.perf_counter() - stage_start)
         
         # Whitelist-User überspringen alle Checks
         if is_whitelisted:
+            MESSAGES_TOTAL.inc(tenant.name, "whitelisted")
             return
         
         # CAPTCHA-CHECK: Prüfe ob User noch nicht verifiziert ist
-        if user_id in pending_verifications:
+        if (chat_id, user_id) in tenant.pending_verifications:
+            MESSAGES_TOTAL.inc(tenant.name, "captcha_pending")
+            
+            # Restrict-Modus: User ist nachweislich stummgeschaltet, keine API-Calls nötig.
+            # Solange die Beschränkung noch aussteht oder fehlschlug, wie ohne Restrict löschen.
+            if config.CAPTCHA_RESTRICT_ON_JOIN and tenant.restrictions.is_restricted(chat_id, user_id):
+                return
+            
             # User muss erst CAPTCHA lösen!
             try:
+                stage_start = time.perf_counter()
                 await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
+                STAGE_DELETE.observe(time.perf_counter() - stage_start)
                 
                 # Sende Warnung (verschwindet nach 5 Sekunden)
+                stage_start = time.perf_counter()
                 warning = await context.bot.send_message(
                     chat_id=chat_id,
                     text=f"⚠️ @{username}, bitte löse erst das CAPTCHA!",
                     parse_mode=ParseMode.MARKDOWN
                 )
+                STAGE_NOTIFY.observe(time.perf_counter() - stage_start)
                 await asyncio.sleep(5)
                 try:
                     await warning.delete()
@@ -412,18 +562,22 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         
         # Prüfe ob User neu ist
-        is_new = is_new_user(chat_id, user_id)
+        is_new = is_new_user(tenant, chat_id, user_id)
         
         # NEUE REGEL: Media ohne Text = Spam (für ALLE User!)
         if has_media and not text.strip():
+            MESSAGES_TOTAL.inc(tenant.name, "media_block")
             try:
                 # Lösche Media-Nachricht
+                stage_start = time.perf_counter()
                 await context.bot.delete_message(
                     chat_id=chat_id,
                     message_id=message_id
                 )
+                STAGE_DELETE.observe(time.perf_counter() - stage_start)
                 
                 # Sende Warnung (verschwindet nach 10 Sekunden)
+                stage_start = time.perf_counter()
                 warning_msg = await context.bot.send_message(
                     chat_id=chat_id,
                     text=f"⚠️ **Media ohne Text ist nicht erlaubt!**\n"
@@ -431,6 +585,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                          f"💬 Bitte füge eine Beschreibung hinzu.",
                     parse_mode=ParseMode.MARKDOWN
                 )
+                STAGE_NOTIFY.observe(time.perf_counter() - stage_start)
                 
                 # Lösche Warnung nach 10 Sekunden
                 await asyncio.sleep(10)
@@ -439,9 +594,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     message_id=warning_msg.message_id
                 )
                 
-                logger.info(f"🚫 Media ohne Text blockiert: @{username} (ID: {user_id})")
+                logger.info(
+                    "🚫 Media ohne Text blockiert: @%s (ID: %s)", username, user_id,
+                    extra={"per_message": True, "chat_id": chat_id, "user_id": user_id}
+                )
                 
                 # Log als Media-Block
+                stage_start = time.perf_counter()
                 await db.log_media_block({
                     "id": str(uuid.uuid4()),
                     "message_id": message_id,
@@ -451,6 +610,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     "reason": "Media ohne Text nicht erlaubt",
                     "timestamp": datetime.utcnow()
                 })
+                STAGE_DB_LOG.observe(time.perf_counter() - stage_start)
                 
                 return  # Beende Handler
                 
@@ -458,6 +618,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 logger.error(f"❌ Fehler beim Löschen von Media: {e}")
         
         # Log message to database
+        stage_start = time.perf_counter()
         await db.log_message({
             "id": str(uuid.uuid4()),
             "message_id": message_id,
@@ -470,17 +631,28 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "is_whitelisted": is_whitelisted,
             "timestamp": datetime.utcnow()
         })
+        STAGE_DB_LOG.observe(time.perf_counter() - stage_start)
         
         # Spam-Erkennung
+        stage_start = time.perf_counter()
         is_spam, reason, score = spam_detector.detect_spam(
             text=text,
             has_media=has_media,
             is_new_user=is_new,
-            is_whitelisted=is_whitelisted
+            is_whitelisted=is_whitelisted,
+            overlay=tenant.overlay
         )
+        detection_seconds = time.perf_counter() - stage_start
+        STAGE_DETECTION.observe(detection_seconds)
+        
+        # Kandidaten-Detector nur einreihen, Bewertung läuft nach dem Handler (shadow.py)
+        shadow.submit(text, has_media, is_new, tenant.overlay, is_spam, score, detection_seconds, chat_id, message_id)
+        MESSAGES_TOTAL.inc(tenant.name, "spam" if is_spam else "ham")
+        startup_timings.record_first_verdict()
         
         if is_spam:
             # Log spam to database
+            stage_start = time.perf_counter()
             await db.log_spam({
                 "id": str(uuid.uuid4()),
                 "message_id": message_id,
@@ -489,14 +661,21 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "username": username,
                 "reason": reason,
                 "score": score,
+                "domains": spam_detector.has_suspicious_links(text, tenant.overlay)[1],
                 "message_preview": text[:200],
                 "timestamp": datetime.utcnow()
             })
+            STAGE_DB_LOG.observe(time.perf_counter() - stage_start)
             
             # Lösche Spam-Nachricht
             try:
+                stage_start = time.perf_counter()
                 await message.delete()
-                logger.warning(f"🚫 SPAM gelöscht von @{username} (Score: {score}): {reason}")
+                STAGE_DELETE.observe(time.perf_counter() - stage_start)
+                logger.warning(
+                    "🚫 SPAM gelöscht von @%s (Score: %s): %s", username, score, reason,
+                    extra={"per_message": True, "chat_id": chat_id, "user_id": user_id, "score": score}
+                )
                 
                 # Sende Benachrichtigung
                 notification = (
@@ -507,11 +686,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 
                 # Sende Nachricht und lösche sie nach 10 Sekunden
+                stage_start = time.perf_counter()
                 sent_msg = await context.bot.send_message(
                     chat_id=chat_id,
                     text=notification,
                     parse_mode=ParseMode.MARKDOWN
                 )
+                STAGE_NOTIFY.observe(time.perf_counter() - stage_start)
                 
                 await asyncio.sleep(10)
                 try:
@@ -530,57 +711,84 @@ async def post_init(application: Application):
     """Wird nach Bot-Initialisierung aufgerufen"""
     logger.info("🤖 Bot initialisiert")
     
-    # Verbinde mit MongoDB
-    await db.connect()
+    # MongoDB-Verbindung und Vorladen übernimmt der Startup-Orchestrator (startup.py)
 
 
 async def post_shutdown(application: Application):
     """Wird beim Herunterfahren aufgerufen"""
     logger.info("👋 Bot wird heruntergefahren...")
     
-    # Schließe MongoDB-Verbindung
-    await db.close()
+    # MongoDB-Verbindung wird im Lifespan geschlossen
 
 
-def create_bot_application() -> Application:
-    """Erstellt und konfiguriert die Bot Application"""
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest, der die Latenz jedes Bot-API-Aufrufs nach Tenant und Methode misst"""
+    
+    def __init__(self, tenant: str, **kwargs):
+        super().__init__(**kwargs)
+        self.tenant = tenant
     
-    # Erstelle Application
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            TELEGRAM_API_ERRORS_TOTAL.inc(self.tenant, api_method)
+            raise
+        finally:
+            TELEGRAM_API_SECONDS.observe(time.perf_counter() - start, self.tenant, api_method)
+
+
+def create_bot_application(tenant: Tenant) -> Application:
+    """Erstellt und konfiguriert die Bot Application eines Tenants"""
+    
+    # Erstelle Application (Bot-API-Aufrufe mit Latenzmessung, getUpdates unverändert)
     application = (
         Application.builder()
-        .token(config.TELEGRAM_TOKEN)
+        .token(tenant.token)
+        .request(InstrumentedHTTPXRequest(tenant.name, connection_pool_size=256))
         .post_init(post_init)
         .post_shutdown(post_shutdown)
         .build()
     )
     
+    # Handler finden ihren Tenant über context.application (tenant_of)
+    application.bot_data["tenant"] = tenant
+    tenant.application = application
+    
+    # Alle Handler laufen über den Loop-Monitor (Dauer + Update-Kontext bei Blockaden)
+    
     # Command Handlers
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("stats", stats_command))
-    application.add_handler(CommandHandler("config", config_command))
-    application.add_handler(CommandHandler("whitelist", whitelist_command))
+    application.add_handler(CommandHandler("start", loop_monitor.wrap(start_command)))
+    application.add_handler(CommandHandler("help", loop_monitor.wrap(help_command)))
+    application.add_handler(CommandHandler("stats", loop_monitor.wrap(stats_command)))
+    application.add_handler(CommandHandler("config", loop_monitor.wrap(config_command)))
+    application.add_handler(CommandHandler("indexes", loop_monitor.wrap(indexes_command)))
+    application.add_handler(CommandHandler("profile", loop_monitor.wrap(profile_command)))
+    application.add_handler(CommandHandler("whitelist", loop_monitor.wrap(whitelist_command)))
     
     # Feedback/Learning Commands
-    application.add_handler(CommandHandler("spam", spam_command))
-    application.add_handler(CommandHandler("notspam", notspam_command))
-    application.add_handler(CommandHandler("keywords", keywords_command))
+    application.add_handler(CommandHandler("spam", loop_monitor.wrap(spam_command)))
+    application.add_handler(CommandHandler("notspam", loop_monitor.wrap(notspam_command)))
+    application.add_handler(CommandHandler("keywords", loop_monitor.wrap(keywords_command)))
+    application.add_handler(CommandHandler("shadow", loop_monitor.wrap(shadow_command)))
     
     # CAPTCHA Callback Handler
-    application.add_handler(CallbackQueryHandler(handle_captcha_callback, pattern="^captcha_"))
+    application.add_handler(CallbackQueryHandler(loop_monitor.wrap(handle_captcha_callback), pattern="^captcha_"))
     
     # Chat Member Handler (für neue Mitglieder + CAPTCHA)
-    application.add_handler(ChatMemberHandler(track_new_member, ChatMemberHandler.CHAT_MEMBER))
+    application.add_handler(ChatMemberHandler(loop_monitor.wrap(track_new_member), ChatMemberHandler.CHAT_MEMBER))
     
     # Message Handler (für Spam-Erkennung)
     application.add_handler(
         MessageHandler(
             filters.ALL & ~filters.COMMAND,
-            handle_message
+            loop_monitor.wrap(handle_message)
         )
     )
     
-    logger.info("✅ Bot Application erstellt")
+    logger.info(f"✅ Bot Application erstellt (Tenant '{tenant.name}')")
     
     return application
 
@@ -589,48 +797,96 @@ def create_bot_application() -> Application:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """FastAPI Lifespan Manager"""
-    global bot_app
+    global membership_sweepers, keyword_pruning_task
     
     # Startup
     logger.info("🚀 Starte Bot...")
     
-    if not config.TELEGRAM_TOKEN:
-        logger.error("❌ TELEGRAM_TOKEN nicht gesetzt!")
+    # Event-Loop-Lag von Anfang an messen (auch Blockaden beim Start)
+    loop_monitor.start()
+    
+    tenants.load()
+    if not len(tenants):
+        logger.error("❌ Weder TELEGRAM_TOKEN noch TELEGRAM_TOKENS gesetzt!")
         raise ValueError("TELEGRAM_TOKEN fehlt in Umgebungsvariablen")
     
-    # Verbinde mit MongoDB ZUERST
-    logger.info("🔄 Verbinde mit MongoDB...")
-    await db.connect()
+    if config.CLUSTER_MODE and not config.MONGODB_URL:
+        logger.error("❌ CLUSTER_MODE benötigt MONGODB_URL (Leases und Update-Queue)!")
+        raise ValueError("MONGODB_URL fehlt für CLUSTER_MODE")
     
-    # Erstelle Bot Application
-    bot_app = create_bot_application()
+    if config.CLUSTER_MODE and len(tenants) > 1:
+        # Leases und Update-Queue sind (noch) nicht nach Bot getrennt
+        logger.error("❌ CLUSTER_MODE unterstützt nur einen Tenant!")
+        raise ValueError("CLUSTER_MODE mit mehreren TELEGRAM_TOKENS nicht unterstützt")
     
-    # Starte Bot
-    await bot_app.initialize()
-    await bot_app.start()
-    await bot_app.updater.start_polling(drop_pending_updates=True)
+    # Eine Bot Application pro Tenant (MongoDB-Pool und Detector sind geteilt)
+    for tenant in tenants:
+        create_bot_application(tenant)
     
-    # Lade gelernte Keywords aus DB
-    try:
-        learned_kw = await db.get_learned_keywords()
-        spam_detector.set_learned_keywords(learned_kw)
-        logger.info(f"🧠 {len(learned_kw)} gelernte Keywords geladen")
-    except Exception as e:
-        logger.error(f"❌ Fehler beim Laden von Keywords: {e}")
+    # Gelernte Keywords aus dem lokalen Snapshot (Millisekunden, ohne MongoDB)
+    await warm_start(startup_timings)
+    
+    # MongoDB (einmalig verbinden + Vorladen) und Initialisierung aller Bots parallel
+    await asyncio.gather(
+        prepare_database(startup_timings),
+        *(
+            startup_timings.timed(f"bot_initialize:{tenant.name}", tenant.application.initialize())
+            for tenant in tenants
+        ),
+    )
+    
+    # Polling erst starten, wenn Whitelist und gelernte Keywords geladen sind
+    async with startup_timings.phase("bot_start"):
+        for tenant in tenants:
+            await tenant.application.start()
+            tenant.restrictions.start(tenant.application.bot)
+            if config.CLUSTER_MODE:
+                # Polling nur mit Poller-Lease, Updates kommen über die Shard-Queue
+                await cluster.start(tenant.application)
+            else:
+                await tenant.application.updater.start_polling(drop_pending_updates=True)
+    
+    # Abgelaufene Neue-User-Einträge periodisch aufräumen
+    membership_sweepers = [
+        asyncio.create_task(tenant.membership.run_sweeper(config.MEMBERSHIP_SWEEP_INTERVAL))
+        for tenant in tenants
+    ]
+    
+    # Treffer gelernter Keywords zählen (Rollups), Pruning im Cluster nur auf dem Leader
+    spam_detector.on_learned_hits = db.count_keyword_hits
+    shadow.start()
+    if config.KEYWORD_PRUNE_INTERVAL > 0:
+        keyword_pruning_task = asyncio.create_task(
+            keyword_pruner.run(lambda: not config.CLUSTER_MODE or cluster.is_leader)
+        )
     
+    startup_timings.finish()
     logger.info("✅ Bot läuft!")
     
     yield
     
     # Shutdown
     logger.info("🛑 Stoppe Bot...")
-    if bot_app:
-        await bot_app.updater.stop()
-        await bot_app.stop()
-        await bot_app.shutdown()
+    for sweeper in membership_sweepers:
+        sweeper.cancel()
+    if keyword_pruning_task:
+        keyword_pruning_task.cancel()
+    await shadow.stop()
+    
+    for tenant in tenants:
+        if not tenant.running:
+            continue
+        if config.CLUSTER_MODE:
+            await cluster.stop()
+        else:
+            await tenant.application.updater.stop()
+        await tenant.restrictions.stop()
+        await tenant.application.stop()
+        await tenant.application.shutdown()
     
     # Schließe MongoDB-Verbindung
     await db.close()
+    await loop_monitor.stop()
     
     logger.info("👋 Bot gestoppt")
 
@@ -655,29 +911,231 @@ async def root():
     }
 
 
+@fastapi_app.get("/health/live")
+async def liveness_check():
+    """Liveness-Check ohne Datenbankzugriff"""
+    return {
+        "status": "alive",
+        "bot_running": tenants.all_running,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
 @fastapi_app.get("/health")
 async def health_check():
     """Health Check für Railway"""
-    stats = await db.get_today_stats()
+    stats = await stats_cache.get("today", db.get_today_stats)
     
     return {
         "status": "healthy",
-        "bot_running": bot_app is not None and bot_app.running,
+        "bot_running": tenants.all_running,
         "mongodb_available": db.available,
-        "pending_captchas": len(pending_verifications),
-        "verified_users": len(verified_users),
+        "mongodb": db.health_status(),
+        "pending_captchas": sum(len(tenant.pending_verifications) for tenant in tenants),
+        "captcha_batches": sum(len(tenant.captcha_batches) for tenant in tenants),
+        "tenants": tenants.status(),
+        "write_buffer": db.buffer.status(),
+        "sqlite_fallback": db.fallback_status(),
+        "startup": startup_timings.report(),
+        "stats_cache": stats_cache.status(),
+        "event_loop": loop_monitor.status(),
+        "logging": logging_pipeline.status(),
+        "detector": spam_detector.status(),
+        "keyword_pruning": keyword_pruner.status(),
+        "shadow": shadow.status(),
+        "cluster": await cluster.status() if config.CLUSTER_MODE else None,
         "stats": stats,
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
+@fastapi_app.get("/health/tenants/{name}")
+async def tenant_health_check(name: str):
+    """Zustand eines einzelnen Tenants (Bot läuft, Overlay, Restrict-Queue)"""
+    tenant = tenants.get(name)
+    if tenant is None:
+        raise HTTPException(status_code=404, detail=f"Unbekannter Tenant: {name}")
+    return {
+        "tenant": tenant.name,
+        **tenant.status(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+# Zustands-Gauges, beim Abruf von /metrics berechnet
+registry.gauge("spambot_pending_captchas", "Offene CAPTCHA-Verifications", lambda: sum(len(tenant.pending_verifications) for tenant in tenants))
+registry.gauge("spambot_mongodb_available", "MongoDB verbunden und Breaker geschlossen", lambda: db.available)
+registry.gauge("spambot_write_buffer_queue_depth", "Gepufferte Event-Dokumente", lambda: db.buffer.status()["queue_depth"])
+registry.gauge("spambot_sqlite_pending_events", "Im SQLite-Fallback wartende Operationen", lambda: db.fallback.pending_events)
+registry.gauge("spambot_restrictions_queued", "Wartende restrict/lift-Aufrufe", lambda: sum(tenant.restrictions.status()["queued"] for tenant in tenants))
+
+
+@fastapi_app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus-Metriken (Text-Format)"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @fastapi_app.get("/stats")
 async def api_stats():
     """API Endpoint für Statistiken"""
-    stats = await db.get_today_stats()
+    stats = await stats_cache.get("today", db.get_today_stats)
     return stats
 
 
+def _parse_range_param(range_param: str) -> Tuple[datetime, datetime]:
+    """Zeitraum-Parameter (z.B. "7d") in (start, end) umwandeln"""
+    try:
+        delta = parse_range(range_param)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    end = datetime.utcnow()
+    return end - delta, end
+
+
+@fastapi_app.get("/stats/range")
+async def api_stats_range(range: str = "7d", chat_id: Optional[int] = None):
+    """Aggregierte Statistiken für einen Zeitraum (aus Stunden-Rollups)"""
+    start, end = _parse_range_param(range)
+    # Schlüssel aus dem geparsten Zeitraum: "7d", "168h" und "07d" teilen sich einen Eintrag
+    stats = await stats_cache.get(
+        ("range", end - start, chat_id), lambda: db.get_range_stats(start, end, chat_id)
+    )
+    if not stats:
+        raise HTTPException(status_code=503, detail="MongoDB nicht verfügbar")
+    return stats
+
+
+@fastapi_app.get("/stats/hourly")
+async def api_stats_hourly(range: str = "24h", chat_id: Optional[int] = None):
+    """Stündliche Zeitreihe für einen Zeitraum"""
+    start, end = _parse_range_param(range)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "chat_id": chat_id,
+        "hours": await stats_cache.get(
+            ("hourly", end - start, chat_id), lambda: db.get_hourly_series(start, end, chat_id)
+        )
+    }
+
+
+def _require_admin_token(x_admin_token: Optional[str], authorization: Optional[str]):
+    """Admin-Token aus X-Admin-Token oder "Authorization: Bearer" prüfen"""
+    if not config.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=503, detail="ADMIN_API_TOKEN nicht gesetzt")
+    
+    token = x_admin_token
+    if not token and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    
+    if not token or not secrets.compare_digest(token, config.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Ungültiges Admin-Token")
+
+
+def _parse_datetime_param(value: Optional[str], name: str) -> Optional[datetime]:
+    """ISO-Zeitstempel (UTC) aus Query-Parameter parsen"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Ungültiger Zeitstempel für {name}: {value}")
+    # Gespeichert wird naive UTC (datetime.utcnow)
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+async def _ndjson_lines(docs: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Dokumente als NDJSON, gebündelt zu einem Chunk pro Cursor-Batch"""
+    lines = []
+    async for doc in docs:
+        lines.append(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS))
+        if len(lines) >= config.EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+@fastapi_app.get("/shadow")
+async def shadow_report(
+    days: int = 7,
+    x_admin_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    """Verdict-Matrix Live vs. Kandidat und Kosten pro Nachricht (Shadow-Mode)"""
+    _require_admin_token(x_admin_token, authorization)
+    if not 1 <= days <= 90:
+        raise HTTPException(status_code=400, detail="days muss zwischen 1 und 90 liegen")
+    return await shadow.report(days)
+
+
+@fastapi_app.get("/profile")
+async def profile_endpoint(
+    seconds: float = 10,
+    x_admin_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    """Sampling-Profil des laufenden Prozesses im Collapsed-Stack-Format"""
+    _require_admin_token(x_admin_token, authorization)
+    
+    try:
+        collapsed, summary = await profiler.profile(seconds)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    filename = f"profile_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.collapsed"
+    return PlainTextResponse(
+        collapsed,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Profile-Samples": str(summary["samples"]),
+            "X-Profile-Loop-CPU-Samples": str(summary["loop_cpu_samples"]),
+        }
+    )
+
+
+@fastapi_app.get("/export/{collection}")
+async def export_collection(
+    collection: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    range: Optional[str] = None,
+    chat_id: Optional[int] = None,
+    x_admin_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+):
+    """NDJSON-Export (gestreamt) von spam_reports, messages, learned_keywords und whitelist"""
+    _require_admin_token(x_admin_token, authorization)
+    
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unbekannte Collection, erlaubt: {', '.join(EXPORT_COLLECTIONS)}"
+        )
+    if chat_id is not None and EXPORT_COLLECTIONS[collection] != "timestamp":
+        raise HTTPException(status_code=400, detail=f"chat_id-Filter nicht möglich für {collection}")
+    
+    start = _parse_datetime_param(since, "since")
+    end = _parse_datetime_param(until, "until")
+    if range:
+        start, end = _parse_range_param(range)
+    
+    if not db.available:
+        raise HTTPException(status_code=503, detail="MongoDB nicht verfügbar")
+    
+    filename = f"{collection}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.ndjson"
+    logger.info(f"📤 Export {collection} gestartet (since={start}, until={end}, chat_id={chat_id})")
+    return StreamingResponse(
+        _ndjson_lines(db.export_documents(collection, start, end, chat_id)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 if __name__ == "__main__":
     # Starte FastAPI Server
     logger.info(f"🚀 Starte Server auf Port {config.PORT}...")
@@ -686,5 +1144,6 @@ if __name__ == "__main__":
         fastapi_app,
         host="0.0.0.0",
         port=config.PORT,
-        log_level="info"
+        log_level="info",
+        log_config=None  # uvicorn-Logs laufen über die Logging-Queue
     )
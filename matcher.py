@@ -0,0 +1,190 @@
+"""
+Kompilierter Keyword-Matcher (Aho-Corasick) in einem flachen, mmap-fähigen Binärformat
+"""
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+MAGIC = b"SPMA"
+FORMAT_VERSION = 1
+
+# magic, Format, Keyword-Version (-1 = unbekannt),
+# Zustände, Kanten, Ausgaben, Muster, Länge des String-Blobs
+_HEADER = struct.Struct("<4sIqIIIII")
+_UNKNOWN_VERSION = -1
+
+
+def build_matcher(patterns: Sequence[str], keywords_version: Optional[int] = None) -> bytes:
+    """
+    Aho-Corasick-Automat aus `patterns` bauen und als Bytes serialisieren.
+
+    Alle Tabellen sind uint32-Arrays (CSR-Layout), die Muster-Strings liegen
+    UTF-8-kodiert in einem Blob. Treffer eines Zustands enthalten bereits die
+    Treffer seiner Suffix-Zustände, beim Suchen muss keine Kette verfolgt werden.
+    """
+    goto: List[Dict[int, int]] = [{}]
+    outputs: List[List[int]] = [[]]
+    for pattern_id, pattern in enumerate(patterns):
+        state = 0
+        for char in pattern:
+            code = ord(char)
+            target = goto[state].get(code)
+            if target is None:
+                target = goto[state][code] = len(goto)
+                goto.append({})
+                outputs.append([])
+            state = target
+        outputs[state].append(pattern_id)
+
+    # Fehler-Links in Breitensuche, Ausgaben entlang der Fehler-Links zusammenführen
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for code, target in goto[state].items():
+            queue.append(target)
+            link = fail[state]
+            while link and code not in goto[link]:
+                link = fail[link]
+            candidate = goto[link].get(code, 0)
+            fail[target] = candidate if candidate != target else 0
+            outputs[target].extend(outputs[fail[target]])
+
+    edge_start, edge_char, edge_target = [0], [], []
+    out_start, out_pattern = [0], []
+    for state, edges in enumerate(goto):
+        for code in sorted(edges):
+            edge_char.append(code)
+            edge_target.append(edges[code])
+        edge_start.append(len(edge_char))
+        out_pattern.extend(sorted(set(outputs[state])))
+        out_start.append(len(out_pattern))
+
+    blob = bytearray()
+    str_offset = [0]
+    for pattern in patterns:
+        blob += pattern.encode("utf-8")
+        str_offset.append(len(blob))
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION,
+        _UNKNOWN_VERSION if keywords_version is None else keywords_version,
+        len(goto), len(edge_char), len(out_pattern), len(patterns), len(blob)
+    )
+    arrays = (edge_start, edge_char, edge_target, fail, out_start, out_pattern, str_offset)
+    return header + b"".join(struct.pack(f"<{len(a)}I", *a) for a in arrays) + bytes(blob)
+
+
+def write_matcher(path: str, data: bytes):
+    """Atomar ersetzen: bestehende Mappings anderer Prozesse behalten die alte Datei"""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MatcherFormatError(ValueError):
+    """Datei ist kein (kompatibler) Matcher"""
+
+
+class CompiledMatcher:
+    """
+    Read-only Sicht auf einen serialisierten Matcher.
+
+    Die Tabellen werden nicht kopiert: `memoryview.cast("I")` liest direkt
+    aus dem Puffer. Bei einer gemappten Datei teilen sich alle Prozesse
+    dieselben Seiten im Page Cache.
+    """
+
+    def __init__(self, buffer, source: str = "<memory>", identity: Optional[Tuple[int, int]] = None):
+        self.source = source
+        self.identity = identity  # (st_dev, st_ino) der gemappten Datei
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < _HEADER.size:
+            raise MatcherFormatError(f"{source}: zu kurz")
+
+        (magic, fmt, version, states, edges, outputs, patterns, blob_len) = _HEADER.unpack_from(view)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise MatcherFormatError(f"{source}: unbekanntes Format")
+
+        self.keywords_version = None if version == _UNKNOWN_VERSION else version
+        self.pattern_count = patterns
+
+        sizes = (states + 1, edges, edges, states, states + 1, outputs, patterns + 1)
+        # Länge vor dem Zugriff prüfen: abgeschnittene Dateien sonst erst als TypeError/IndexError
+        if states < 1 or len(view) != _HEADER.size + sum(sizes) * 4 + blob_len:
+            raise MatcherFormatError(f"{source}: abgeschnitten")
+        offset = _HEADER.size
+        tables = []
+        for size in sizes:
+            tables.append(view[offset:offset + size * 4].cast("I"))
+            offset += size * 4
+        (self._edge_start, self._edge_char, self._edge_target, self._fail,
+         self._out_start, self._out_pattern, self._str_offset) = tables
+        self._blob = view[offset:offset + blob_len]
+        if (self._edge_start[states] != edges or self._out_start[states] != outputs
+                or self._str_offset[patterns] != blob_len):
+            raise MatcherFormatError(f"{source}: inkonsistente Tabellen")
+
+        # Zeichen mit Übergang aus dem Startzustand: alle anderen überspringen ohne Tabellenzugriff
+        self._root_chars = frozenset(self._edge_char[0:self._edge_start[1]])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompiledMatcher":
+        return cls(data)
+
+    @classmethod
+    def open(cls, path: str) -> "CompiledMatcher":
+        """Datei read-only mappen"""
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size < _HEADER.size:
+                # Leere Datei: mmap würde mit ValueError abbrechen
+                raise MatcherFormatError(f"{path}: zu kurz")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, source=path, identity=(stat.st_dev, stat.st_ino))
+
+    def _step(self, state: int, code: int) -> int:
+        while True:
+            start, end = self._edge_start[state], self._edge_start[state + 1]
+            if start != end:
+                index = bisect_left(self._edge_char, code, start, end)
+                if index < end and self._edge_char[index] == code:
+                    return self._edge_target[index]
+            if state == 0:
+                return 0
+            state = self._fail[state]
+
+    def find(self, text: str) -> List[int]:
+        """IDs aller Muster, die in `text` vorkommen (aufsteigend, jedes Muster einmal)"""
+        found = set()
+        root_chars = self._root_chars
+        out_start = self._out_start
+        state = 0
+        for char in text:
+            code = ord(char)
+            if state == 0 and code not in root_chars:
+                continue
+            state = self._step(state, code)
+            start, end = out_start[state], out_start[state + 1]
+            if start != end:
+                found.update(self._out_pattern[start:end])
+        return sorted(found)
+
+    def pattern(self, pattern_id: int) -> str:
+        start, end = self._str_offset[pattern_id], self._str_offset[pattern_id + 1]
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def patterns(self) -> List[str]:
+        """Alle Muster (dekodiert, nur für Listen/Status)"""
+        return [self.pattern(i) for i in range(self.pattern_count)]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buffer)
@@ -0,0 +1,155 @@
+"""
+Kompakter Mitglieder-Store für neue und verifizierte User
+"""
+import asyncio
+import heapq
+import logging
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+MemberKey = Tuple[int, int]  # (chat_id, user_id)
+
+
+class MemberRecord:
+    """Beitritts-/Verifizierungszeit als Epoch-Sekunden (int statt datetime)"""
+
+    __slots__ = ("joined_at", "verified_at")
+
+    def __init__(self, joined_at: int, verified_at: int = 0):
+        self.joined_at = joined_at
+        self.verified_at = verified_at  # 0 = nicht verifiziert
+
+
+class MembershipStore:
+    """
+    Speichert neue/verifizierte User pro (chat_id, user_id).
+
+    Einträge laufen nach `window` Sekunden ab. Abgelaufene Einträge werden
+    beim Zugriff entfernt (lazy) und zusätzlich periodisch über einen
+    Min-Heap nach Ablaufzeit aufgeräumt (sweep).
+    """
+
+    def __init__(self, window: int = config.NEW_USER_WINDOW):
+        self.window = window
+        self._records: Dict[MemberKey, MemberRecord] = {}
+        # Expiry-Index: (expires_at, chat_id, user_id)
+        self._expiry: List[Tuple[int, int, int]] = []
+        self.evicted_total = 0
+        # Wird bei Beitritt/Verifizierung aufgerufen (Cluster-Modus: in MongoDB sichern)
+        self.on_change: Optional[Callable[[int, int, MemberRecord], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _get(self, chat_id: int, user_id: int, now: int) -> Optional[MemberRecord]:
+        """Eintrag holen und abgelaufene Einträge sofort entfernen"""
+        key = (chat_id, user_id)
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if now - record.joined_at >= self.window:
+            del self._records[key]
+            self.evicted_total += 1
+            return None
+        return record
+
+    def add_member(self, chat_id: int, user_id: int, now: Optional[int] = None):
+        """Beitritt speichern (Re-Join setzt Beitrittszeit und Verifizierung zurück)"""
+        now = int(time.time()) if now is None else now
+        record = self._records[(chat_id, user_id)] = MemberRecord(now)
+        heapq.heappush(self._expiry, (now + self.window, chat_id, user_id))
+        if self.on_change:
+            self.on_change(chat_id, user_id, record)
+
+    def mark_verified(self, chat_id: int, user_id: int, now: Optional[int] = None):
+        """User als verifiziert markieren"""
+        now = int(time.time()) if now is None else now
+        record = self._get(chat_id, user_id, now)
+        if record is None:
+            self.add_member(chat_id, user_id, now)
+            record = self._records[(chat_id, user_id)]
+        record.verified_at = now
+        if self.on_change:
+            self.on_change(chat_id, user_id, record)
+
+    def restore(self, chat_id: int, user_id: int, joined_at: int, verified_at: int = 0):
+        """Eintrag aus gesichertem Zustand übernehmen (ohne on_change)"""
+        self._records[(chat_id, user_id)] = MemberRecord(joined_at, verified_at)
+        heapq.heappush(self._expiry, (joined_at + self.window, chat_id, user_id))
+
+    def is_new_user(self, chat_id: int, user_id: int, now: Optional[int] = None) -> bool:
+        """Prüft ob User innerhalb des Neue-User-Fensters beigetreten ist"""
+        now = int(time.time()) if now is None else now
+        return self._get(chat_id, user_id, now) is not None
+
+    def is_verified(self, chat_id: int, user_id: int, now: Optional[int] = None) -> bool:
+        """Prüft ob User im Chat verifiziert ist"""
+        now = int(time.time()) if now is None else now
+        record = self._get(chat_id, user_id, now)
+        return record is not None and record.verified_at > 0
+
+    def sweep(self, now: Optional[int] = None) -> int:
+        """Entfernt alle abgelaufenen Einträge, gibt Anzahl entfernter Einträge zurück"""
+        now = int(time.time()) if now is None else now
+        removed = 0
+
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, chat_id, user_id = heapq.heappop(self._expiry)
+            key = (chat_id, user_id)
+            record = self._records.get(key)
+            # Veraltete Heap-Einträge (Re-Join) überspringen
+            if record is not None and record.joined_at + self.window == expires_at:
+                del self._records[key]
+                removed += 1
+
+        # Heap kompaktieren, falls er durch lazy Eviction/Re-Joins aufgebläht ist
+        if len(self._expiry) > 2 * len(self._records) + 1024:
+            self._expiry = [
+                (r.joined_at + self.window, k[0], k[1]) for k, r in self._records.items()
+            ]
+            heapq.heapify(self._expiry)
+
+        self.evicted_total += removed
+        return removed
+
+    async def run_sweeper(self, interval: int):
+        """Periodischer Sweep als Hintergrund-Task"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(f"🧹 {removed} abgelaufene Mitglieder-Einträge entfernt")
+            except Exception as e:
+                logger.error(f"❌ Fehler beim Mitglieder-Sweep: {e}")
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Ungefährer Speicherverbrauch und Größen für /health"""
+        records_bytes = sys.getsizeof(self._records)
+        if self._records:
+            sample_key, sample_record = next(iter(self._records.items()))
+            per_entry = (
+                sys.getsizeof(sample_key)
+                + sys.getsizeof(sample_record)
+                + sys.getsizeof(sample_key[0])
+                + sys.getsizeof(sample_key[1])
+            )
+            records_bytes += per_entry * len(self._records)
+
+        expiry_bytes = sys.getsizeof(self._expiry)
+        if self._expiry:
+            expiry_bytes += sys.getsizeof(self._expiry[0]) * len(self._expiry)
+
+        return {
+            "tracked": len(self._records),
+            "verified": sum(1 for r in self._records.values() if r.verified_at),
+            "expiry_index": len(self._expiry),
+            "evicted_total": self.evicted_total,
+            "memory_bytes": records_bytes + expiry_bytes,
+        }
+
@@ -0,0 +1,210 @@
+"""
+Leichtgewichtige Prometheus-Metriken (Counter, Histogramme, Gauges)
+"""
+import logging
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latenz-Buckets in Sekunden (0.5 ms bis 10 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monoton steigender Zähler pro Label-Kombination"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class HistogramSeries:
+    """Eine Label-Kombination mit vorab angelegten Bucket-Zählern"""
+
+    __slots__ = ("_buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # letzter Eintrag = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Wert einsortieren (nur Index-Inkrement, keine Allokation)"""
+        self.counts[bisect_left(self._buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram:
+    """
+    Latenz-Histogramm mit festen Buckets.
+
+    Pro Label-Kombination wird einmalig eine HistogramSeries angelegt;
+    Hot Paths holen sich die Series vorab über `labels()` und rufen nur
+    noch `observe()` auf.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], HistogramSeries] = {}
+
+    def labels(self, *labels: str) -> HistogramSeries:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = HistogramSeries(self.buckets)
+        return series
+
+    def observe(self, value: float, *labels: str):
+        self.labels(*labels).observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            plain_labels = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain_labels} {series.sum}")
+            lines.append(f"{self.name}_count{plain_labels} {series.count}")
+        return lines
+
+
+class GaugeFunc:
+    """Gauge, dessen Wert beim Abruf von /metrics berechnet wird"""
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self._func = func
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self._func())
+        except Exception as e:
+            logger.warning(f"⚠️ Gauge {self.name} nicht lesbar: {e}")
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Registry:
+    """Sammelt alle Metriken für /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metrik {metric.name} existiert bereits")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name: str, documentation: str, func: Callable[[], float]) -> GaugeFunc:
+        return self.register(GaugeFunc(name, documentation, func))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ===== Nachrichten-Handler =====
+
+HANDLER_STAGE_SECONDS = registry.register(Histogram(
+    "spambot_handler_stage_seconds",
+    "Dauer der Stufen von handle_message",
+    ("stage",)
+))
+MESSAGES_TOTAL = registry.register(Counter(
+    "spambot_messages_total",
+    "Verarbeitete Nachrichten nach Tenant und Ergebnis",
+    ("tenant", "result")
+))
+
+# Vorab aufgelöste Series für den Hot Path
+STAGE_WHITELIST = HANDLER_STAGE_SECONDS.labels("whitelist")
+STAGE_DB_LOG = HANDLER_STAGE_SECONDS.labels("db_log")
+STAGE_DETECTION = HANDLER_STAGE_SECONDS.labels("detection")
+STAGE_DELETE = HANDLER_STAGE_SECONDS.labels("delete")
+STAGE_NOTIFY = HANDLER_STAGE_SECONDS.labels("notify")
+
+# ===== CAPTCHA =====
+
+CAPTCHA_EVENTS_TOTAL = registry.register(Counter(
+    "spambot_captcha_events_total",
+    "CAPTCHA-Lebenszyklus (joined, sent, passed, failed, timeout, kicked) nach Tenant",
+    ("tenant", "event")
+))
+
+# ===== Telegram API / MongoDB =====
+
+TELEGRAM_API_SECONDS = registry.register(Histogram(
+    "spambot_telegram_api_seconds",
+    "Latenz der Telegram Bot API nach Tenant und Methode",
+    ("tenant", "method")
+))
+TELEGRAM_API_ERRORS_TOTAL = registry.register(Counter(
+    "spambot_telegram_api_errors_total",
+    "Fehlgeschlagene Telegram Bot API Aufrufe nach Tenant und Methode",
+    ("tenant", "method")
+))
+MONGODB_OPERATION_SECONDS = registry.register(Histogram(
+    "spambot_mongodb_operation_seconds",
+    "Latenz der MongoDB-Operationen",
+    ("operation",)
+))
+MONGODB_OPERATION_ERRORS_TOTAL = registry.register(Counter(
+    "spambot_mongodb_operation_errors_total",
+    "Fehlgeschlagene MongoDB-Operationen (inkl. Timeouts)",
+    ("operation",)
+))
+
+# ===== Event-Loop =====
+
+LOOP_LAG_SECONDS = registry.register(Histogram(
+    "spambot_event_loop_lag_seconds",
+    "Verzögerung des Event-Loops (geplante vs. tatsächliche Ausführung)"
+))
+LOOP_STALLS_TOTAL = registry.register(Counter(
+    "spambot_event_loop_stalls_total",
+    "Blockaden des Event-Loops über dem Schwellwert"
+))
+HANDLER_SECONDS = registry.register(Histogram(
+    "spambot_handler_seconds",
+    "Gesamtdauer der Telegram-Handler (inkl. await)",
+    ("handler",)
+))
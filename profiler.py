@@ -0,0 +1,128 @@
+"""
+Sampling-Profiler für den laufenden Prozess (Collapsed-Stack-Format)
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusyError(RuntimeError):
+    """Es läuft bereits ein Profiling"""
+
+
+class SamplingProfiler:
+    """
+    Sampling-Profiler ohne Instrumentierung des Codes.
+
+    Der Event-Loop-Thread (Main-Thread) wird per SIGPROF-Timer abgetastet:
+    der Signal-Handler sieht genau den Frame, der gerade CPU verbraucht
+    (Detector, Handler, Serialisierung). Alle übrigen Threads (z.B.
+    SQLite-Worker) tastet ein Hintergrund-Thread über `sys._current_frames`
+    ab. Ohne SIGPROF (z.B. Windows) wird auch der Main-Thread so abgetastet.
+
+    Das Ergebnis ist im Collapsed-Stack-Format ("a;b;c 42" pro Zeile), das
+    direkt von flamegraph.pl, speedscope oder inferno gelesen werden kann.
+    """
+
+    def __init__(self, interval: float = config.PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.running = False
+        self.last_run: Optional[Dict[str, float]] = None
+
+    @staticmethod
+    def _collapse(frame, root: str) -> str:
+        """Stack als "root;äußerster;...;innerster" Frame"""
+        labels: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        labels.append(root)
+        labels.reverse()
+        return ";".join(labels)
+
+    def _sample_threads(self, seconds: float, skip_main: bool) -> Tuple[Counter, int]:
+        """Läuft im Worker-Thread: Stacks der anderen Threads sammeln bis die Zeit abgelaufen ist"""
+        skip = {threading.get_ident()}
+        if skip_main:
+            skip.add(threading.main_thread().ident)
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: Counter = Counter()
+        samples = 0
+
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in skip:
+                    stacks[self._collapse(frame, thread_names.get(thread_id, str(thread_id)))] += 1
+            samples += 1
+            time.sleep(self.interval)
+
+        return stacks, samples
+
+    async def profile(self, seconds: float) -> Tuple[str, Dict[str, float]]:
+        """Prozess für `seconds` Sekunden profilieren, liefert (collapsed stacks, Zusammenfassung)"""
+        if self.running:
+            raise ProfilerBusyError("Profiling läuft bereits")
+
+        seconds = max(1.0, min(float(seconds), config.PROFILE_MAX_SECONDS))
+        use_signal = hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+        loop_stacks: Counter = Counter()
+
+        def on_sigprof(signum, frame):
+            loop_stacks[self._collapse(frame, "MainThread (CPU)")] += 1
+
+        self.running = True
+        started = time.perf_counter()
+        logger.info(f"🔬 Profiling gestartet ({seconds:.0f}s, Intervall {self.interval * 1000:.0f} ms)")
+        previous_handler = None
+        try:
+            if use_signal:
+                previous_handler = signal.signal(signal.SIGPROF, on_sigprof)
+                signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+            stacks, samples = await asyncio.to_thread(self._sample_threads, seconds, use_signal)
+        finally:
+            if use_signal:
+                signal.setitimer(signal.ITIMER_PROF, 0)
+                signal.signal(signal.SIGPROF, previous_handler or signal.SIG_DFL)
+            self.running = False
+
+        loop_samples = sum(loop_stacks.values())
+        stacks.update(loop_stacks)
+        collapsed = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+        summary = {
+            "seconds": round(time.perf_counter() - started, 2),
+            "samples": samples,
+            "loop_cpu_samples": loop_samples,
+            "stacks": len(stacks),
+        }
+        self.last_run = summary
+        logger.info(
+            f"🔬 Profiling beendet: {loop_samples} Loop-CPU-Samples, "
+            f"{samples} Thread-Samples, {len(stacks)} verschiedene Stacks"
+        )
+        return collapsed, summary
+
+    @staticmethod
+    def top_functions(collapsed: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Häufigste Blatt-Funktionen (Self-Time) aus dem Collapsed-Format"""
+        leaves: Counter = Counter()
+        for line in collapsed.splitlines():
+            stack, _, count = line.rpartition(" ")
+            if stack:
+                leaves[stack.rsplit(";", 1)[-1]] += int(count)
+        return leaves.most_common(limit)
+
+
+# Globale Profiler-Instanz
+profiler = SamplingProfiler()
@@ -0,0 +1,186 @@
+"""
+Gebündelte, rate-limitierte Queue für Mitglieder-Beschränkungen (restrict_chat_member)
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from telegram import Bot, ChatPermissions
+from telegram.error import BadRequest, RetryAfter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+MemberKey = Tuple[int, int]  # (chat_id, user_id)
+
+
+class RestrictionQueue:
+    """
+    Sammelt Restrict-/Freigabe-Aufträge pro (chat_id, user_id) und arbeitet sie
+    in Batches mit begrenzter Rate ab.
+
+    Mehrere Aufträge für denselben User werden zusammengefasst - nur der
+    zuletzt gewünschte Zustand wird an Telegram gesendet (z.B. Beitritt +
+    sofort gelöstes CAPTCHA = kein API-Call).
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float = config.RESTRICT_RATE_PER_SECOND,
+        batch_size: int = config.RESTRICT_BATCH_SIZE
+    ):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.batch_size = batch_size
+        self.bot: Optional[Bot] = None
+
+        # Offene Aufträge in Einfügereihenfolge (True = beschränken, False = freigeben)
+        self._pending: Dict[MemberKey, bool] = {}
+        # Beschränkungen, die bei Telegram aktiv (oder gerade unterwegs) sind
+        self._restricted: Set[MemberKey] = set()
+        # Davon von Telegram bestätigt (Call erfolgreich)
+        self._confirmed: Set[MemberKey] = set()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._next_slot = 0.0
+
+        self.stats = {
+            "applied": 0,
+            "coalesced": 0,
+            "failed": 0,
+            "rate_limited": 0,
+        }
+
+    def _enqueue(self, key: MemberKey, restrict: bool):
+        if key in self._pending:
+            # Älteren Auftrag ersetzen und ans Ende stellen
+            del self._pending[key]
+            self.stats["coalesced"] += 1
+
+        # Zielzustand bereits aktiv -> nichts zu tun
+        if (key in self._restricted) == restrict:
+            return
+
+        self._pending[key] = restrict
+        self._wakeup.set()
+
+    def restrict(self, chat_id: int, user_id: int):
+        """User stummschalten, bis das CAPTCHA gelöst ist"""
+        self._enqueue((chat_id, user_id), True)
+
+    def lift(self, chat_id: int, user_id: int):
+        """Beschränkung wieder aufheben"""
+        self._enqueue((chat_id, user_id), False)
+
+    def discard(self, chat_id: int, user_id: int):
+        """Aufträge verwerfen (z.B. weil der User gekickt wird)"""
+        self._pending.pop((chat_id, user_id), None)
+        self._restricted.discard((chat_id, user_id))
+        self._confirmed.discard((chat_id, user_id))
+    
+    def is_restricted(self, chat_id: int, user_id: int) -> bool:
+        """True nur wenn Telegram die Beschränkung bestätigt hat und keine Freigabe ansteht"""
+        key = (chat_id, user_id)
+        return key in self._confirmed and key not in self._pending
+
+    def start(self, bot: Bot):
+        """Startet den Worker-Task"""
+        self.bot = bot
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stoppt den Worker und hebt alle noch aktiven Beschränkungen auf"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        # Keine User stumm zurücklassen - offene CAPTCHAs gehen beim Neustart verloren
+        lifts = list(self._restricted)
+        self._pending.clear()
+        for key in lifts:
+            await self._apply(key, False)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            while self._pending:
+                # Batch aus den ältesten Aufträgen entnehmen
+                batch = []
+                for key in list(self._pending)[:self.batch_size]:
+                    batch.append((key, self._pending.pop(key)))
+
+                for key, restrict in batch:
+                    # Rate-Limit: gleichmäßiger Abstand zwischen API-Calls
+                    now = time.monotonic()
+                    if self._next_slot > now:
+                        await asyncio.sleep(self._next_slot - now)
+                    self._next_slot = max(now, self._next_slot) + self.interval
+
+                    # Inzwischen neuer Auftrag für denselben User -> dieser ist überholt
+                    if key in self._pending:
+                        self.stats["coalesced"] += 1
+                        continue
+
+                    await self._apply(key, restrict)
+
+    async def _apply(self, key: MemberKey, restrict: bool):
+        chat_id, user_id = key
+        permissions = ChatPermissions.no_permissions() if restrict else ChatPermissions.all_permissions()
+
+        # Zustand vorab setzen, damit eine Freigabe während des Calls nicht verloren geht
+        self._confirmed.discard(key)
+        if restrict:
+            self._restricted.add(key)
+        else:
+            self._restricted.discard(key)
+
+        try:
+            await self.bot.restrict_chat_member(
+                chat_id=chat_id,
+                user_id=user_id,
+                permissions=permissions
+            )
+            self.stats["applied"] += 1
+            # Nur bestätigen, wenn nicht inzwischen freigegeben/verworfen wurde
+            if restrict and key in self._restricted:
+                self._confirmed.add(key)
+
+        except RetryAfter as e:
+            # Flood-Limit von Telegram: Auftrag erneut einreihen und pausieren
+            self.stats["rate_limited"] += 1
+            logger.warning("⏳ Restrict Flood-Limit, warte %ss", e.retry_after, extra={"per_message": True})
+            self._next_slot = time.monotonic() + float(e.retry_after)
+            if key not in self._pending:
+                self._pending[key] = restrict
+                self._wakeup.set()
+
+        except BadRequest as e:
+            # z.B. User hat den Chat bereits verlassen
+            self.stats["failed"] += 1
+            self._restricted.discard(key)
+            logger.debug("Restrict für %s in Chat %s nicht möglich: %s", user_id, chat_id, e)
+
+        except Exception as e:
+            self.stats["failed"] += 1
+            # Nicht als aktiv führen, sonst wird ein späteres restrict() übersprungen
+            if restrict:
+                self._restricted.discard(key)
+            logger.error(f"❌ Fehler beim Beschränken von User {user_id}: {e}")
+
+    def status(self) -> Dict[str, int]:
+        """Queue-Status für /health"""
+        return {
+            "queued": len(self._pending),
+            "restricted": len(self._restricted),
+            "confirmed": len(self._confirmed),
+            **self.stats,
+        }
+
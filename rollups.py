@@ -0,0 +1,165 @@
+"""
+Vorab aggregierte Zähler (Rollups) für Statistiken
+"""
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import config
+
+logger = logging.getLogger(__name__)
+
+RollupKey = Tuple[Tuple[str, Any], ...]
+RollupUpdate = Tuple[Dict[str, Any], Dict[str, int]]  # (Filter, $inc-Felder)
+# False = nichts geschrieben, Liste = diese Updates nicht geschrieben (beide später erneut)
+WriteFunc = Callable[[str, List[RollupUpdate]], Awaitable[Union[None, bool, List[RollupUpdate]]]]
+
+# Chat-ID für die globale Summe über alle Chats
+GLOBAL_CHAT_ID = 0
+
+# Maximaler Zeitraum für Range-Abfragen
+MAX_RANGE = timedelta(days=90)
+
+_RANGE_PATTERN = re.compile(r"^(\d+)\s*([hdw])$")
+_RANGE_UNITS = {"h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_range(value: str) -> timedelta:
+    """Parst Zeiträume wie "24h", "7d" oder "4w" """
+    match = _RANGE_PATTERN.match(value.strip().lower())
+    if not match:
+        raise ValueError(f"Ungültiger Zeitraum: {value} (Beispiele: 24h, 7d, 4w)")
+
+    delta = timedelta(**{_RANGE_UNITS[match.group(2)]: int(match.group(1))})
+    if delta <= timedelta(0) or delta > MAX_RANGE:
+        raise ValueError(f"Zeitraum muss zwischen 1h und {MAX_RANGE.days}d liegen")
+    return delta
+
+
+def hour_bucket(timestamp: Optional[datetime] = None) -> datetime:
+    """Auf die volle Stunde abgerundeter Zeitstempel"""
+    timestamp = timestamp or datetime.utcnow()
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def encode_field(name: str) -> str:
+    """Macht Werte (z.B. Domains) als MongoDB-Feldnamen nutzbar"""
+    return name.replace("$", "\uff04").replace(".", "\uff0e")
+
+
+def decode_field(name: str) -> str:
+    """Umkehrung von encode_field"""
+    return name.replace("\uff04", "$").replace("\uff0e", ".")
+
+
+class RollupBuffer:
+    """
+    Sammelt $inc-Zähler pro Rollup-Dokument im Speicher.
+
+    Mehrere Events für dasselbe Dokument werden zu einem Update
+    zusammengefasst und periodisch als ein bulk_write pro Collection
+    geschrieben. Gibt write_func False bzw. die nicht geschriebenen
+    Updates zurück (z.B. MongoDB nicht erreichbar), bleiben diese Zähler
+    im Speicher und werden später geschrieben. Bei anderen Fehlern (z.B.
+    Timeout) ist offen, ob der Server das $inc angewendet hat; die Zähler
+    werden dann verworfen statt doppelt gezählt.
+
+    Während eines Flushes bleibt der laufende Batch über pending() und
+    iter_pending() sichtbar, bis der Schreibvorgang abgeschlossen ist.
+    """
+
+    def __init__(self, write_func: WriteFunc, flush_interval: float = config.ROLLUP_FLUSH_INTERVAL):
+        self._write_func = write_func
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[RollupKey, Dict[str, int]]] = {}
+        # Gerade geschriebener Batch (bis zur Bestätigung weiter mitgezählt)
+        self._inflight: Dict[str, Dict[RollupKey, Dict[str, int]]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._worker: Optional[asyncio.Task] = None
+
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.dropped_updates = 0
+
+    def inc(self, collection: str, key: Dict[str, Any], field: str, amount: int = 1):
+        """Zähler im Speicher erhöhen"""
+        counters = self._pending.setdefault(collection, {}).setdefault(tuple(key.items()), {})
+        counters[field] = counters.get(field, 0) + amount
+
+    def pending(self, collection: str, key: Dict[str, Any]) -> Dict[str, int]:
+        """Noch nicht geschriebene Zähler eines Dokuments (inkl. laufendem Flush)"""
+        key = tuple(key.items())
+        merged: Dict[str, int] = {}
+        for source in (self._inflight, self._pending):
+            for field, amount in source.get(collection, {}).get(key, {}).items():
+                merged[field] = merged.get(field, 0) + amount
+        return merged
+
+    def iter_pending(self, collection: str) -> Iterator[Tuple[Dict[str, Any], Dict[str, int]]]:
+        """Alle noch nicht geschriebenen Dokumente einer Collection (inkl. laufendem Flush)"""
+        merged: Dict[RollupKey, Dict[str, int]] = {}
+        for source in (self._inflight, self._pending):
+            for key, counters in source.get(collection, {}).items():
+                target = merged.setdefault(key, {})
+                for field, amount in counters.items():
+                    target[field] = target.get(field, 0) + amount
+        for key, counters in merged.items():
+            yield dict(key), counters
+
+    def start(self):
+        """Startet den periodischen Flush-Task"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stoppt den Flush-Task und schreibt alle offenen Zähler"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.shield(self.flush())
+
+    async def flush(self):
+        """Offene Zähler als ein Update pro Dokument schreiben"""
+        async with self._flush_lock:
+            self._inflight, self._pending = self._pending, {}
+            try:
+                for collection in list(self._inflight):
+                    self._flush_collection(collection, await self._write_collection(collection))
+            finally:
+                self._inflight = {}
+
+    async def _write_collection(self, collection: str) -> List[RollupUpdate]:
+        """Batch einer Collection schreiben, gibt die erneut zu versuchenden Updates zurück"""
+        updates = [(dict(key), counters) for key, counters in self._inflight[collection].items()]
+        try:
+            result = await self._write_func(collection, updates)
+        except Exception as e:
+            # Evtl. trotzdem angewendet: nicht erneut schreiben, sonst doppelt gezählt
+            self.flush_errors += 1
+            self.dropped_updates += len(updates)
+            logger.error(f"❌ Fehler beim Schreiben von Rollups ({collection}), {len(updates)} Zähler verworfen: {e}")
+            return []
+
+        if result is False:
+            return updates
+        self.flush_count += 1
+        return result if isinstance(result, list) else []
+
+    def _flush_collection(self, collection: str, retry: List[RollupUpdate]):
+        """Nicht geschriebene Zähler zurücklegen (beim nächsten Flush erneut), Batch abschließen"""
+        for key, counters in retry:
+            for field, amount in counters.items():
+                self.inc(collection, key, field, amount)
+        del self._inflight[collection]
@@ -0,0 +1,295 @@
+"""
+Shadow-Mode: Kandidaten-Detector parallel zum Live-Detector auf echtem Traffic auswerten
+"""
+import asyncio
+import functools
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from database import SHADOW_DISAGREEMENTS_COLLECTION, SHADOW_STATS_COLLECTION, db
+from spam_detector import SpamDetector, spam_detector
+
+logger = logging.getLogger(__name__)
+
+# Felder der Verdict-Matrix: live/kandidat, s = Spam, h = Ham
+MATRIX_FIELDS = ("ss", "sh", "hs", "hh")
+
+
+def load_candidate(path: str) -> SpamDetector:
+    """
+    Kandidaten aus einer JSON-Datei bauen (Format wie die Ausgabe von tuner.py):
+    {"name", "weights", "thresholds", "keywords_add", "keywords_remove", "domains_add"}.
+    Nicht angegebene Werte entsprechen dem Live-Detector.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    removed = {k.lower() for k in data.get("keywords_remove", [])}
+    keywords = [k for k in config.SPAM_KEYWORDS if k not in removed]
+    keywords += [k.lower() for k in data.get("keywords_add", []) if k.lower() not in keywords]
+    domains = list(config.SUSPICIOUS_DOMAINS) + [d.lower() for d in data.get("domains_add", [])]
+
+    name = data.get("name", "candidate")
+    if name == spam_detector.name:
+        raise ValueError(f"Kandidat darf nicht '{name}' heißen (Name des Live-Detectors)")
+
+    return SpamDetector(
+        name=name,
+        weights=data.get("weights"),
+        thresholds=data.get("thresholds"),
+        spam_keywords=keywords,
+        suspicious_domains=domains,
+    )
+
+
+def _timed_detect(candidate: SpamDetector, text: str, has_media: bool, is_new_user: bool, overlay: Any) -> Tuple[Tuple[bool, str, int], float]:
+    """Kandidaten-Urteil samt Dauer (läuft im Executor-Thread)"""
+    start = time.perf_counter()
+    result = candidate.detect_spam(text=text, has_media=has_media, is_new_user=is_new_user, overlay=overlay)
+    return result, time.perf_counter() - start
+
+
+class ShadowEvaluator:
+    """
+    Bewertet Nachrichten zusätzlich mit einem Kandidaten-Detector.
+
+    handle_message reicht nur die Eingaben und das Live-Urteil in eine
+    begrenzte Queue (volle Queue = verworfen); ein Hintergrund-Task
+    bewertet sie nach dem Handler in einem eigenen Thread, damit ein
+    langsamer Kandidat den Event-Loop nicht blockiert.
+
+    Das Budget (SHADOW_BUDGET_MS) ist kein Limit pro Aufruf: Überschreitungen
+    werden gezählt, nach SHADOW_MAX_OVERRUNS in Folge wird pausiert. Hartes
+    Limit pro Aufruf ist SHADOW_TIMEOUT_MS; der Thread lässt sich nicht
+    abbrechen, deshalb pausiert schon eine einzelne Zeitüberschreitung.
+    Die Verdict-Matrix wird pro Kandidat und Tag über die Rollups gezählt,
+    nur Abweichungen werden einzeln gespeichert.
+    """
+
+    def __init__(
+        self,
+        budget_ms: float = config.SHADOW_BUDGET_MS,
+        queue_size: int = config.SHADOW_QUEUE_SIZE,
+        sample_rate: float = config.SHADOW_SAMPLE_RATE,
+        max_overruns: int = config.SHADOW_MAX_OVERRUNS,
+        timeout_ms: float = config.SHADOW_TIMEOUT_MS
+    ):
+        self.budget = budget_ms / 1000
+        self.timeout = timeout_ms / 1000
+        self.queue_size = queue_size
+        self.sample_rate = sample_rate
+        self.max_overruns = max_overruns
+
+        self.candidate: Optional[SpamDetector] = None
+        self.source: Optional[str] = None
+        self.paused_reason: Optional[str] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._overruns = 0
+
+        # Zähler seit dem Laden des Kandidaten (Report ohne MongoDB)
+        self.matrix = dict.fromkeys(MATRIX_FIELDS, 0)
+        self.live_seconds = 0.0
+        self.candidate_seconds = 0.0
+        self.stats = {"submitted": 0, "evaluated": 0, "dropped": 0, "over_budget": 0, "timeouts": 0}
+
+    @property
+    def active(self) -> bool:
+        return self.candidate is not None and self.paused_reason is None
+
+    def load(self, path: str = config.SHADOW_CANDIDATE_PATH) -> SpamDetector:
+        """Kandidaten laden (ersetzt einen laufenden) und Zähler zurücksetzen"""
+        candidate = load_candidate(path)
+        self.candidate, self.source = candidate, path
+        self.paused_reason = None
+        self._overruns = 0
+        self.matrix = dict.fromkeys(MATRIX_FIELDS, 0)
+        self.live_seconds = self.candidate_seconds = 0.0
+        self.stats = dict.fromkeys(self.stats, 0)
+        logger.info(f"🌓 Shadow-Kandidat '{candidate.name}' geladen ({path})")
+        return candidate
+
+    def start(self):
+        """Hintergrund-Task starten (Kandidat aus SHADOW_CANDIDATE_PATH, falls gesetzt)"""
+        if config.SHADOW_CANDIDATE_PATH and self.candidate is None:
+            try:
+                self.load(config.SHADOW_CANDIDATE_PATH)
+            except Exception as e:
+                logger.error(f"❌ Shadow-Kandidat nicht ladbar: {e}")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._executor:
+            # Nicht auf ein hängendes Kandidaten-Urteil warten
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def pause(self, reason: str):
+        self.paused_reason = reason
+
+    def resume(self):
+        self.paused_reason = None
+        self._overruns = 0
+
+    def submit(
+        self,
+        text: str,
+        has_media: bool,
+        is_new_user: bool,
+        overlay: Any,
+        live_verdict: bool,
+        live_score: int,
+        live_seconds: float,
+        chat_id: int,
+        message_id: int
+    ):
+        """Aus handle_message: nur einreihen, nie warten"""
+        if not self.active or self._queue is None:
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((
+                text, has_media, is_new_user, overlay,
+                live_verdict, live_score, live_seconds, chat_id, message_id
+            ))
+            self.stats["submitted"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            # Erst nach den laufenden Handlern bewerten
+            await asyncio.sleep(0)
+            if not self.active:
+                continue
+            try:
+                disagreement = await self._evaluate(*item)
+                if disagreement:
+                    await db.buffer.add(SHADOW_DISAGREEMENTS_COLLECTION, disagreement)
+            except Exception as e:
+                logger.error(f"❌ Shadow-Bewertung fehlgeschlagen: {e}")
+
+    async def _evaluate(
+        self,
+        text: str,
+        has_media: bool,
+        is_new_user: bool,
+        overlay: Any,
+        live_verdict: bool,
+        live_score: int,
+        live_seconds: float,
+        chat_id: int,
+        message_id: int
+    ) -> Optional[Dict[str, Any]]:
+        """Kandidat bewerten und zählen, gibt bei Abweichung das zu speichernde Dokument zurück"""
+        candidate = self.candidate
+        # Gelernte Keywords immer im aktuellen Stand des Live-Detectors (gleicher Matcher)
+        candidate.learned = spam_detector.learned
+
+        loop = asyncio.get_running_loop()
+        call = functools.partial(_timed_detect, candidate, text, has_media, is_new_user, overlay)
+        try:
+            (verdict, reason, score), elapsed = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, call), self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self.pause(f"Zeitlimit {self.timeout * 1000:.0f} ms überschritten")
+            logger.warning(f"⚠️ Shadow-Mode pausiert: {self.paused_reason}")
+            return None
+
+        if elapsed > self.budget:
+            self.stats["over_budget"] += 1
+            self._overruns += 1
+            if self._overruns >= self.max_overruns:
+                self.pause(f"{self._overruns}x über Budget ({elapsed * 1000:.1f} ms)")
+                logger.warning(f"⚠️ Shadow-Mode pausiert: {self.paused_reason}")
+        else:
+            self._overruns = 0
+
+        field = ("s" if live_verdict else "h") + ("s" if verdict else "h")
+        self.matrix[field] += 1
+        self.live_seconds += live_seconds
+        self.candidate_seconds += elapsed
+        self.stats["evaluated"] += 1
+
+        key = {"candidate": candidate.name, "day": datetime.utcnow().strftime("%Y-%m-%d")}
+        db.rollups.inc(SHADOW_STATS_COLLECTION, key, field)
+        db.rollups.inc(SHADOW_STATS_COLLECTION, key, "live_us", int(live_seconds * 1e6))
+        db.rollups.inc(SHADOW_STATS_COLLECTION, key, "candidate_us", int(elapsed * 1e6))
+
+        if verdict == live_verdict:
+            return None
+        # Kompakt: Text steht bereits in `messages` (chat_id + message_id)
+        return {
+            "candidate": candidate.name,
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "live": [live_verdict, live_score],
+            "shadow": [verdict, score, reason],
+            "timestamp": datetime.utcnow()
+        }
+
+    async def report(self, days: int = 7) -> Dict[str, Any]:
+        """Verdict-Matrix und Kosten pro Nachricht (MongoDB-Rollups, sonst seit dem Laden)"""
+        if self.candidate is None:
+            return {"candidate": None}
+
+        matrix, live_us, candidate_us, source = dict(self.matrix), self.live_seconds * 1e6, self.candidate_seconds * 1e6, "memory"
+        docs: Optional[List[Dict[str, Any]]] = await db.get_shadow_stats(self.candidate.name, days)
+        if docs:
+            matrix = {field: sum(doc.get(field, 0) for doc in docs) for field in MATRIX_FIELDS}
+            live_us = sum(doc.get("live_us", 0) for doc in docs)
+            candidate_us = sum(doc.get("candidate_us", 0) for doc in docs)
+            source = f"mongodb ({days}d)"
+
+        total = sum(matrix.values())
+        return {
+            "candidate": self.candidate.name,
+            "source": source,
+            "active": self.active,
+            "paused_reason": self.paused_reason,
+            "total": total,
+            "matrix": matrix,
+            "agreement": (matrix["ss"] + matrix["hh"]) / total if total else None,
+            "live_us_per_message": live_us / total if total else None,
+            "candidate_us_per_message": candidate_us / total if total else None,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """Zustand für /health"""
+        return {
+            "candidate": self.candidate.name if self.candidate else None,
+            "source": self.source,
+            "active": self.active,
+            "paused_reason": self.paused_reason,
+            "budget_ms": self.budget * 1000,
+            "timeout_ms": self.timeout * 1000,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "matrix": self.matrix,
+            **self.stats,
+        }
+
+
+# Globale Shadow-Instanz (aktiv, sobald ein Kandidat geladen ist)
+shadow = ShadowEvaluator()
@@ -3,42 +3,141 @@ Spam Detection Engine
 """
 import re
 import logging
-from typing import List, Tuple, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
-import emoji as emoji_lib
 import config
+from matcher import CompiledMatcher, MatcherFormatError, build_matcher, write_matcher
 
 logger = logging.getLogger(__name__)
 
+# Einmalig kompilierte Muster (statt bei jedem Aufruf)
+URL_PATTERN = re.compile(
+    r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+    r'|(?:www\.)?[a-zA-Z0-9-]+\.[a-zA-Z]{2,}'
+)
+
+# emoji wird erst bei Bedarf importiert (großes Daten-Modul, bremst den Kaltstart)
+_emoji_lib = None
+
+
+def _emoji():
+    global _emoji_lib
+    if _emoji_lib is None:
+        import emoji
+        _emoji_lib = emoji
+    return _emoji_lib
+
+
+@lru_cache(maxsize=8)
+def _repeated_chars_pattern(threshold: int) -> "re.Pattern":
+    return re.compile(r'(.)\1{' + str(threshold - 1) + ',}')
+
 
 class SpamDetector:
     """Spam-Erkennungs-Engine"""
     
-    def __init__(self):
-        self.spam_keywords = config.SPAM_KEYWORDS
-        self.suspicious_domains = config.SUSPICIOUS_DOMAINS
-        self.learned_keywords = []  # Dynamisch aus DB geladen
+    def __init__(
+        self,
+        name: str = "live",
+        weights: Optional[Dict[str, int]] = None,
+        thresholds: Optional[Dict[str, float]] = None,
+        spam_keywords: Optional[List[str]] = None,
+        suspicious_domains: Optional[List[str]] = None
+    ):
+        self.name = name
+        self.spam_keywords = config.SPAM_KEYWORDS if spam_keywords is None else spam_keywords
+        self.suspicious_domains = config.SUSPICIOUS_DOMAINS if suspicious_domains is None else suspicious_domains
+        # Punkte und Schwellen (Kandidaten für Shadow-Mode/Tuning überschreiben einzelne Werte)
+        self.weights = {**config.SPAM_WEIGHTS, **(weights or {})}
+        self.thresholds = {
+            "keyword": config.SPAM_KEYWORD_THRESHOLD,
+            "new_user_keyword": config.NEW_USER_KEYWORD_THRESHOLD,
+            "media_keyword": config.MEDIA_KEYWORD_THRESHOLD,
+            "emoji": config.EMOJI_THRESHOLD,
+            "score": config.SPAM_SCORE_THRESHOLD,
+            **(thresholds or {}),
+        }
+        # Gelernte Keywords als kompilierter Automat, read-only aus der Snapshot-Datei gemappt
+        self.learned: Optional[CompiledMatcher] = None
+        # Wird mit (gelernte Treffer, is_spam) aufgerufen, z.B. db.count_keyword_hits
+        self.on_learned_hits: Optional[Callable[[List[str], bool], None]] = None
+    
+    @property
+    def learned_version(self) -> Optional[int]:
+        """Keyword-Version des geladenen Stands"""
+        return self.learned.keywords_version if self.learned else None
+    
+    @property
+    def learned_count(self) -> int:
+        return self.learned.pattern_count if self.learned else 0
+    
+    @property
+    def learned_keywords(self) -> Tuple[str, ...]:
+        """Gelernte Keywords (sortiert), bei Bedarf aus dem Matcher dekodiert"""
+        return tuple(self.learned.patterns()) if self.learned else ()
+    
+    def set_learned_keywords(self, keywords: List[str], version: Optional[int] = None, path: str = config.DETECTOR_SNAPSHOT_PATH):
+        """
+        Matcher aus den gelernten Keywords bauen, atomar nach `path` schreiben
+        und mappen. Andere Prozesse auf demselben Host übernehmen die Datei über
+        `load_snapshot`, statt selbst zu bauen. CPU-intensiv: im Thread aufrufen.
+        """
+        data = build_matcher(sorted({k.lower() for k in keywords}), version)
+        try:
+            write_matcher(path, data)
+            matcher = CompiledMatcher.open(path)
+        except OSError as e:
+            logger.warning(f"⚠️ Detector-Snapshot nicht speicherbar, Matcher nur im Speicher: {e}")
+            matcher = CompiledMatcher.from_bytes(data)
+        
+        # Referenzwechsel ist atomar; laufende Suchen behalten den alten Matcher
+        self.learned = matcher
+        logger.info(f"📚 {matcher.pattern_count} gelernte Keywords geladen (Version {version}, {matcher.nbytes} Bytes)")
+    
+    def load_snapshot(self, path: str = config.DETECTOR_SNAPSHOT_PATH, expected_version: Optional[int] = None) -> bool:
+        """
+        Snapshot read-only mappen (Millisekunden). Mit `expected_version` nur
+        übernehmen, wenn die Datei genau diesen Stand enthält.
+        """
+        try:
+            matcher = CompiledMatcher.open(path)
+        except FileNotFoundError:
+            return False
+        except (OSError, MatcherFormatError) as e:
+            logger.warning(f"⚠️ Detector-Snapshot nicht lesbar: {e}")
+            return False
+        
+        if expected_version is not None and matcher.keywords_version != expected_version:
+            return False
+        
+        self.learned = matcher
+        logger.info(f"📚 Detector-Snapshot gemappt: {matcher.pattern_count} gelernte Keywords (Version {matcher.keywords_version})")
+        return True
     
-    def set_learned_keywords(self, keywords: List[str]):
-        """Setze gelernte Keywords aus DB"""
-        self.learned_keywords = [k.lower() for k in keywords]
-        logger.info(f"📚 {len(self.learned_keywords)} gelernte Keywords geladen")
+    def status(self) -> dict:
+        """Zustand des Matchers für /health"""
+        return {
+            "learned_keywords": self.learned_count,
+            "learned_version": self.learned_version,
+            "matcher_bytes": self.learned.nbytes if self.learned else 0,
+            "matcher_source": self.learned.source if self.learned else None,
+        }
+    
+    def warm_up(self):
+        """Lazy Imports und Muster vorab laden, damit das erste Urteil nicht wartet"""
+        _emoji()
+        self.detect_spam("Warmup www.example.com 🚀🚀 AAAAAA!!!!!", is_new_user=True)
     
     def has_links(self, text: str) -> bool:
         """Prüft ob Text Links enthält"""
         if not text:
             return False
         
-        # URL Pattern
-        url_pattern = re.compile(
-            r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-            r'|(?:www\.)?[a-zA-Z0-9-]+\.[a-zA-Z]{2,}'
-        )
-        
-        return bool(url_pattern.search(text))
+        return bool(URL_PATTERN.search(text))
     
-    def has_suspicious_links(self, text: str) -> Tuple[bool, List[str]]:
-        """Prüft ob Text verdächtige/gekürzte URLs enthält"""
+    def has_suspicious_links(self, text: str, overlay: Any = None) -> Tuple[bool, List[str]]:
+        """Prüft ob Text verdächtige/gekürzte URLs enthält (inkl. Domains des Tenant-Overlays)"""
         if not text:
             return False, []
         
@@ -49,6 +148,11 @@ class SpamDetector:
             if domain in text_lower:
                 found_domains.append(domain)
         
+        if overlay:
+            for domain in overlay.domains:
+                if domain in text_lower:
+                    found_domains.append(domain)
+        
         return len(found_domains) > 0, found_domains
     
     def count_emojis(self, text: str) -> int:
@@ -58,14 +162,14 @@ class SpamDetector:
         
         try:
             # Nutze emoji library
-            emoji_count = emoji_lib.emoji_count(text)
+            emoji_count = _emoji().emoji_count(text)
             return emoji_count
         except Exception as e:
             logger.warning(f"Emoji counting error: {e}")
             return 0
     
-    def contains_spam_keywords(self, text: str) -> List[str]:
-        """Findet Spam-Keywords im Text (inkl. gelernte Keywords)"""
+    def contains_spam_keywords(self, text: str, overlay: Any = None) -> List[str]:
+        """Findet Spam-Keywords im Text (inkl. Tenant-Overlay und gelernter Keywords)"""
         if not text:
             return []
         
@@ -77,10 +181,18 @@ class SpamDetector:
             if keyword in text_lower:
                 found_keywords.append(keyword)
         
-        # Prüfe dynamisch gelernte Keywords aus DB
-        for keyword in self.learned_keywords:
-            if keyword in text_lower:
-                found_keywords.append(f"{keyword}*")  # * = gelernt
+        # Zusätzliche Keywords des Tenants (tenants.DetectorOverlay)
+        if overlay:
+            for keyword in overlay.keywords:
+                if keyword in text_lower:
+                    found_keywords.append(keyword)
+        
+        # Prüfe dynamisch gelernte Keywords aus DB: ein Durchlauf durch den Automaten,
+        # unabhängig von der Anzahl der Keywords (Treffer in sortierter Reihenfolge)
+        learned = self.learned
+        if learned is not None:
+            for pattern_id in learned.find(text_lower):
+                found_keywords.append(f"{learned.pattern(pattern_id)}*")  # * = gelernt
         
         return found_keywords
     
@@ -103,19 +215,22 @@ class SpamDetector:
             return False
         
         # Pattern für wiederholte Zeichen
-        pattern = re.compile(r'(.)\1{' + str(threshold - 1) + ',}')
-        return bool(pattern.search(text))
+        return bool(_repeated_chars_pattern(threshold).search(text))
     
     def detect_spam(
         self, 
         text: str, 
         has_media: bool = False,
         is_new_user: bool = False,
-        is_whitelisted: bool = False
+        is_whitelisted: bool = False,
+        overlay: Any = None
     ) -> Tuple[bool, str, int]:
         """
         Hauptfunktion zur Spam-Erkennung
         
+        `overlay` ergänzt den gemeinsamen Detector um Keywords/Domains eines
+        Tenants (siehe tenants.DetectorOverlay).
+        
         Returns:
             (is_spam, reason, confidence_score)
         """
@@ -127,64 +242,73 @@ class SpamDetector:
         if not text:
             return False, "", 0
         
+        weights = self.weights
+        thresholds = self.thresholds
         spam_score = 0
         reasons = []
         
         # 1. Verdächtige Links (HOHE PRIORITÄT)
-        has_suspicious, domains = self.has_suspicious_links(text)
+        has_suspicious, domains = self.has_suspicious_links(text, overlay)
         if has_suspicious:
-            spam_score += 50
+            spam_score += weights["suspicious_link"]
             reasons.append(f"Verdächtige URL: {', '.join(domains[:2])}")
         
         # 2. Spam Keywords
-        spam_words = self.contains_spam_keywords(text)
+        spam_words = self.contains_spam_keywords(text, overlay)
         
         # NEUE REGEL: Media + 2 Keywords = Spam (strenger!)
         if has_media:
-            keyword_threshold = 2  # Nur 2 Keywords bei Media!
+            keyword_threshold = thresholds["media_keyword"]  # Nur 2 Keywords bei Media!
         elif is_new_user:
-            keyword_threshold = config.NEW_USER_KEYWORD_THRESHOLD
+            keyword_threshold = thresholds["new_user_keyword"]
         else:
-            keyword_threshold = config.SPAM_KEYWORD_THRESHOLD
+            keyword_threshold = thresholds["keyword"]
         
         if len(spam_words) >= keyword_threshold:
-            spam_score += 30 + (len(spam_words) * 5)
+            spam_score += weights["keywords_base"] + (len(spam_words) * weights["keyword_each"])
             reasons.append(f"Spam-Keywords ({len(spam_words)}): {', '.join(spam_words[:3])}")
         
         # 3. Zu viele Emojis mit Links
         emoji_count = self.count_emojis(text)
         has_links_bool = self.has_links(text)
         
-        if emoji_count > config.EMOJI_THRESHOLD and has_links_bool:
-            spam_score += 25
+        if emoji_count > thresholds["emoji"] and has_links_bool:
+            spam_score += weights["emoji_links"]
             reasons.append(f"Zu viele Emojis ({emoji_count}) mit Links")
         
         # 4. Excessive CAPS
         if self.has_excessive_caps(text):
-            spam_score += 15
+            spam_score += weights["caps"]
             reasons.append("Übermäßige Großbuchstaben")
         
         # 5. Wiederholte Zeichen
         if self.has_repeated_chars(text):
-            spam_score += 10
+            spam_score += weights["repeated_chars"]
             reasons.append("Wiederholte Zeichen")
         
         # 6. Neue User sind verdächtiger
         if is_new_user and (spam_words or has_links_bool):
-            spam_score += 20
+            spam_score += weights["new_user"]
             reasons.append("Neuer User mit verdächtigem Inhalt")
         
         # 7. Media mit Spam-Keywords (extra Punkte!)
-        if has_media and len(spam_words) >= 2:
-            spam_score += 20
+        if has_media and len(spam_words) >= thresholds["media_keyword"]:
+            spam_score += weights["media_keywords"]
             reasons.append("Media mit Spam-Keywords")
         
-        # Entscheidung: Spam wenn Score >= 50
-        is_spam = spam_score >= 50
+        # Entscheidung: Spam wenn Score >= SPAM_SCORE_THRESHOLD (Standard 50)
+        is_spam = spam_score >= thresholds["score"]
         reason = " | ".join(reasons) if reasons else ""
         
-        if is_spam:
-            logger.info(f"🚫 SPAM erkannt (Score: {spam_score}): {reason}")
+        # Treffer gelernter Keywords für Statistik und Pruning melden
+        if self.on_learned_hits is not None:
+            learned_hits = [word[:-1] for word in spam_words if word.endswith("*")]
+            if learned_hits:
+                self.on_learned_hits(learned_hits, is_spam)
+        
+        # Nur der Live-Detector loggt Urteile (Shadow-Kandidaten würden sonst doppelt loggen)
+        if is_spam and self.name == "live":
+            logger.info("🚫 SPAM erkannt (Score: %s): %s", spam_score, reason, extra={"per_message": True})
         
         return is_spam, reason, spam_score
 
@@ -0,0 +1,163 @@
+"""
+Startup-Orchestrierung mit Zeitmessung pro Phase
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Dict, Optional
+
+from database import db
+from spam_detector import spam_detector
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimings:
+    """Misst die Dauer der einzelnen Startphasen"""
+
+    def __init__(self, started: Optional[float] = None):
+        # Startpunkt (perf_counter), z.B. vor den Imports von main.py
+        self._started = started if started is not None else time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.total_ms: Optional[float] = None
+        self.first_verdict_ms: Optional[float] = None
+        self._background: Dict[str, asyncio.Task] = {}
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        """Misst eine Phase (auch wenn sie fehlschlägt)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.phases[name] = round(elapsed_ms, 1)
+            logger.info(f"⏱️ Startphase '{name}': {elapsed_ms:.0f} ms")
+
+    async def timed(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Awaitable als gemessene Phase ausführen"""
+        async with self.phase(name):
+            return await awaitable
+
+    def background(self, name: str, awaitable: Awaitable[Any]) -> asyncio.Task:
+        """Phase im Hintergrund ausführen, ohne den Start zu blockieren"""
+        task = asyncio.create_task(self.timed(name, awaitable))
+        self._background[name] = task
+        return task
+
+    def mark(self, name: str):
+        """Zeit seit Start als Phase festhalten (z.B. Imports)"""
+        elapsed_ms = (time.perf_counter() - self._started) * 1000
+        self.phases[name] = round(elapsed_ms, 1)
+
+    def record_first_verdict(self):
+        """Zeit bis zum ersten Spam-Urteil (nur beim ersten Aufruf)"""
+        if self.first_verdict_ms is None:
+            self.first_verdict_ms = round((time.perf_counter() - self._started) * 1000, 1)
+            logger.info(f"⚖️ Erstes Urteil nach {self.first_verdict_ms:.0f} ms")
+
+    def finish(self):
+        """Startzeit bis "bereit" festhalten"""
+        self.total_ms = round((time.perf_counter() - self._started) * 1000, 1)
+        logger.info(f"🚀 Start abgeschlossen in {self.total_ms:.0f} ms")
+
+    def report(self) -> Dict[str, Any]:
+        """Zeiten für /health"""
+        return {
+            "total_ms": self.total_ms,
+            "first_verdict_ms": self.first_verdict_ms,
+            "phases_ms": dict(self.phases),
+            "background_pending": [name for name, task in self._background.items() if not task.done()],
+        }
+
+
+async def preload_learned_keywords(force: bool = True) -> int:
+    """
+    Gelernte Keywords in den Spam-Detector laden. Ohne force nur, wenn sich
+    die Keyword-Version seit dem letzten Laden geändert hat.
+    """
+    try:
+        version = await db.get_keywords_version()
+        if version is None:
+            # Version unbekannt (MongoDB nicht erreichbar): vorhandenen Matcher/Snapshot
+            # unverändert nutzen, statt ihn aus der SQLite-Kopie neu zu bauen
+            if spam_detector.learned is not None or await asyncio.to_thread(spam_detector.load_snapshot):
+                return spam_detector.learned_count
+        elif not force:
+            if version == spam_detector.learned_version:
+                return spam_detector.learned_count
+            # Ein anderer Prozess auf diesem Host hat den Matcher evtl. schon gebaut
+            if await asyncio.to_thread(spam_detector.load_snapshot, expected_version=version):
+                return spam_detector.learned_count
+        
+        learned_kw = await db.get_learned_keywords()
+        await asyncio.to_thread(spam_detector.set_learned_keywords, learned_kw, version)
+        return len(learned_kw)
+    except Exception as e:
+        logger.error(f"❌ Fehler beim Laden von Keywords: {e}")
+        return 0
+
+
+async def refresh_learned_keywords() -> int:
+    """Detector nach Keyword-Änderungen aktualisieren (einmal pro neuer Version)"""
+    return await preload_learned_keywords(force=False)
+
+
+async def reload_after_reconnect():
+    """Nach einem MongoDB-Ausfall Indizes sicherstellen und Caches neu laden"""
+    await db.create_indexes()
+    # Einstellungen zuerst: sie enthalten die Keyword-Version
+    await db.load_settings()
+    await asyncio.gather(
+        db.load_whitelist(),
+        preload_learned_keywords(),
+        db.seed_daily_stats(),
+    )
+    logger.info("🔄 Caches nach Wiederverbindung neu geladen")
+
+
+async def warm_start(timings: StartupTimings) -> bool:
+    """
+    Lokalen Detector-Snapshot laden (vor MongoDB). Ist er aktuell, bleibt
+    beim Vorladen nur der Versionsvergleich. Lazy Imports und Muster werden
+    im Hintergrund aufgewärmt.
+    """
+    async with timings.phase("detector_snapshot"):
+        loaded = spam_detector.load_snapshot()
+    timings.background("detector_warmup", asyncio.to_thread(spam_detector.warm_up))
+    return loaded
+
+
+async def prepare_database(timings: StartupTimings) -> bool:
+    """
+    Verbindet einmalig mit MongoDB, startet die Index-Erstellung im
+    Hintergrund und lädt die Einstellungen (Keyword-Version), danach
+    Whitelist, gelernte Keywords und persistierten Zustand parallel vor.
+    """
+    db.add_recovery_hook(reload_after_reconnect)
+    connected = await timings.timed("mongodb_connect", db.connect())
+
+    if connected:
+        # Indizes blockieren den Start nicht
+        timings.background("create_indexes", db.create_indexes())
+
+    # Einstellungen vor den Keywords: beide schreiben settings_cache, und die
+    # Keyword-Version für den Snapshot-Vergleich steht in den Einstellungen
+    settings_count = await timings.timed("preload_settings", db.load_settings())
+    whitelist_count, keyword_count, _ = await asyncio.gather(
+        timings.timed("preload_whitelist", db.load_whitelist()),
+        # Nach dem Snapshot nur neu laden, wenn sich die Keyword-Version geändert hat
+        timings.timed("preload_keywords", preload_learned_keywords(force=False)),
+        timings.timed("preload_daily_stats", db.seed_daily_stats()),
+    )
+
+    if connected:
+        # Beginn der Keyword-Trefferzählung festhalten (Schonfrist des Prunings)
+        timings.background("keyword_stats_started", db.get_keyword_stats_started_at())
+
+    logger.info(
+        f"📦 Vorgeladen: {whitelist_count} Whitelist-User, "
+        f"{keyword_count} gelernte Keywords, {settings_count} Einstellungen"
+    )
+    return connected
@@ -0,0 +1,155 @@
+"""
+Mehrere Bots (Tenants) in einem Prozess: Token-Liste, Detector-Overlays, Zustand pro Bot
+"""
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from telegram.ext import Application, ContextTypes
+
+import config
+from membership import MembershipStore
+from restrictions import RestrictionQueue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+
+
+class DetectorOverlay:
+    """
+    Zusätzliche Keywords/Domains eines Tenants.
+
+    Der kompilierte Basis-Detector (statische + gelernte Keywords) wird von
+    allen Tenants geteilt; das Overlay wird nur zusätzlich geprüft.
+    """
+
+    __slots__ = ("keywords", "domains")
+
+    def __init__(self, keywords: Tuple[str, ...] = (), domains: Tuple[str, ...] = ()):
+        self.keywords = keywords
+        self.domains = domains
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords or self.domains)
+
+    @classmethod
+    def from_env(cls, name: str) -> "DetectorOverlay":
+        """TENANT_<NAME>_KEYWORDS / TENANT_<NAME>_DOMAINS (komma-separiert)"""
+        prefix = f"TENANT_{name.upper()}_"
+
+        def read(key: str) -> Tuple[str, ...]:
+            raw = os.getenv(prefix + key, "")
+            return tuple(dict.fromkeys(item.strip().lower() for item in raw.split(",") if item.strip()))
+
+        return cls(read("KEYWORDS"), read("DOMAINS"))
+
+
+class Tenant:
+    """
+    Ein Bot: eigener Token, eigene Application und Restrict-Queue (Rate-Limit
+    gilt pro Bot). Mitglieder und offene CAPTCHAs liegen ebenfalls pro Bot -
+    zwei Bots im selben Chat verifizieren unabhängig voneinander.
+    """
+
+    def __init__(self, name: str, token: str, overlay: Optional[DetectorOverlay] = None):
+        self.name = name
+        self.token = token
+        self.overlay = overlay or DetectorOverlay()
+        self.application: Optional[Application] = None
+        self.restrictions = RestrictionQueue()
+        self.membership = MembershipStore()
+
+        # CAPTCHA-Zustand (CaptchaBatch aus main.py)
+        self.pending_verifications: Dict[Tuple[int, int], Any] = {}  # (chat_id, user_id) -> Batch
+        self.captcha_batches: Dict[str, Any] = {}  # Token -> Batch
+        self.open_batches: Dict[int, Any] = {}  # chat_id -> Batch im Sammelfenster
+
+    @property
+    def running(self) -> bool:
+        return self.application is not None and self.application.running
+
+    def status(self) -> Dict[str, Any]:
+        try:
+            username = self.application.bot.username if self.application else None
+        except RuntimeError:
+            username = None  # Bot noch nicht initialisiert
+        return {
+            "bot_running": self.running,
+            "bot_username": username,
+            "overlay_keywords": len(self.overlay.keywords),
+            "overlay_domains": len(self.overlay.domains),
+            "restrictions": self.restrictions.status(),
+            "pending_captchas": len(self.pending_verifications),
+            "captcha_batches": len(self.captcha_batches),
+            "membership": self.membership.memory_usage(),
+        }
+
+
+def parse_tokens(spec: str) -> List[Tuple[str, str]]:
+    """
+    "name=token,name2=token2" in (Name, Token) zerlegen. Bot-Tokens enthalten
+    selbst einen Doppelpunkt, daher "=" als Trenner.
+    """
+    pairs = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, token = entry.partition("=")
+        if not sep or not name.strip() or not token.strip():
+            raise ValueError(f"Ungültiger Eintrag in TELEGRAM_TOKENS: '{name.strip()}=…' (erwartet name=token)")
+        pairs.append((name.strip(), token.strip()))
+
+    names = [name for name, _ in pairs]
+    if len(set(names)) != len(names):
+        raise ValueError("Doppelte Tenant-Namen in TELEGRAM_TOKENS")
+    return pairs
+
+
+class TenantRegistry:
+    """Alle Tenants des Prozesses (aus TELEGRAM_TOKENS, sonst nur TELEGRAM_TOKEN)"""
+
+    def __init__(self):
+        self._tenants: Dict[str, Tenant] = {}
+
+    def load(self, tokens_spec: str = config.TELEGRAM_TOKENS, default_token: str = config.TELEGRAM_TOKEN):
+        """Tenants aus der Konfiguration anlegen"""
+        pairs = parse_tokens(tokens_spec) if tokens_spec else []
+        if not pairs and default_token:
+            pairs = [(DEFAULT_TENANT, default_token)]
+
+        self._tenants = {
+            name: Tenant(name, token, DetectorOverlay.from_env(name))
+            for name, token in pairs
+        }
+        for tenant in self._tenants.values():
+            logger.info(
+                f"🏢 Tenant '{tenant.name}': {len(tenant.overlay.keywords)} Overlay-Keywords, "
+                f"{len(tenant.overlay.domains)} Overlay-Domains"
+            )
+
+    def __iter__(self) -> Iterator[Tenant]:
+        return iter(self._tenants.values())
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def get(self, name: str) -> Optional[Tenant]:
+        return self._tenants.get(name)
+
+    @property
+    def all_running(self) -> bool:
+        return bool(self._tenants) and all(tenant.running for tenant in self)
+
+    def status(self) -> Dict[str, Any]:
+        return {tenant.name: tenant.status() for tenant in self}
+
+
+# Globale Tenant-Registry (beim Start über load() befüllt)
+tenants = TenantRegistry()
+
+
+def tenant_of(context: ContextTypes.DEFAULT_TYPE) -> Tenant:
+    """Tenant der Application, die das Update verarbeitet"""
+    return context.application.bot_data["tenant"]
@@ -0,0 +1,386 @@
+"""
+Offline-Tuning der Gewichte und Schwellen von detect_spam über die gelabelte Historie
+
+Aufruf:
+    # Features einmal aus MongoDB extrahieren (und cachen), dann tunen
+    python tuner.py --mongodb-url mongodb://... --features features.npz --output candidate.json
+    # Aus NDJSON-Exporten (GET /export/messages, /export/spam_reports, /export/feedback)
+    python tuner.py --messages messages.ndjson --spam-reports spam_reports.ndjson --feedback feedback.ndjson
+    # Erneut tunen, Features aus dem Cache (Sekunden, auch bei Millionen Nachrichten)
+    python tuner.py --features features.npz --min-precision 0.995
+
+Gelernte Keywords: mit --mongodb-url die aktiven Keywords aus MongoDB, sonst
+der lokale Detector-Snapshot (DETECTOR_SNAPSHOT_PATH, muss vorhanden sein).
+
+Labels: Admin-Feedback (/spam, /notspam) hat Vorrang, sonst gilt das
+damalige Urteil des Bots (Nachricht in spam_reports = Spam). Admin-Labels
+zählen `--admin-weight`-fach, mit `--admin-only` nur diese.
+
+Die Suche geht Parameter für Parameter über ein Raster (mehrere Durchläufe).
+Pro Kombination wird der ganze Datensatz vektorisiert bewertet und die beste
+Score-Schwelle über alle Schwellen gleichzeitig bestimmt. Ziel: maximaler
+Recall bei Präzision >= --min-precision. Die Ausgabe ist eine Kandidaten-Datei
+für den Shadow-Mode (SHADOW_CANDIDATE_PATH).
+
+Benötigt numpy (pip install numpy), der Bot selbst nicht.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import config
+
+# Spalten der Feature-Matrix
+FEATURES = (
+    "suspicious_link", "keywords", "emojis", "has_links",
+    "caps", "repeated_chars", "has_media", "is_new_user",
+)
+SUSPICIOUS, KEYWORDS, EMOJIS, LINKS, CAPS, REPEATED, MEDIA, NEW_USER = range(len(FEATURES))
+
+# Raster pro Parameter (Gewichte in Punkten, Schwellen in Anzahl)
+WEIGHT_GRID = list(range(0, 65, 5))
+THRESHOLD_GRID = {
+    "keyword": [1, 2, 3, 4, 5],
+    "new_user_keyword": [1, 2, 3, 4],
+    "media_keyword": [1, 2, 3, 4],
+    "emoji": [3, 5, 8, 10, 15, 20],
+}
+
+DATABASE_NAME = "telegram_spam_bot"
+
+
+def _require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        sys.exit("❌ tuner.py benötigt numpy: pip install numpy")
+    return numpy
+
+
+# ===== Daten laden =====
+
+def _read_ndjson(path: Optional[str]) -> Iterator[Dict[str, Any]]:
+    if not path:
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _load_learned_keywords(detector, args):
+    """
+    Gelernte Keywords wie im Live-Detector: aus MongoDB oder dem lokalen
+    Snapshot. Ohne sie passt das Keyword-Feature nicht zum Live-Scoring.
+    """
+    if args.mongodb_url:
+        from pymongo import MongoClient
+        from matcher import CompiledMatcher, build_matcher
+
+        database = MongoClient(args.mongodb_url)[DATABASE_NAME]
+        keywords = [doc["keyword"] for doc in database.learned_keywords.find({"active": {"$ne": False}}, {"keyword": 1})]
+        version_doc = database.settings.find_one({"key": "keywords_version"}) or {}
+        # Nur im Speicher: der Snapshot des Bots auf diesem Host bleibt unberührt
+        detector.learned = CompiledMatcher.from_bytes(
+            build_matcher(sorted({k.lower() for k in keywords}), version_doc.get("value"))
+        )
+        print(f"📚 {len(keywords)} gelernte Keywords aus MongoDB geladen")
+        return
+
+    if not detector.load_snapshot():
+        sys.exit(
+            f"❌ Kein Detector-Snapshot unter {config.DETECTOR_SNAPSHOT_PATH}: ohne gelernte Keywords "
+            "passen die Features nicht zum Live-Scoring (--mongodb-url nutzen oder Snapshot kopieren)"
+        )
+    print(f"📚 {detector.learned_count} gelernte Keywords aus dem Snapshot geladen")
+
+
+def _load_documents(args) -> Tuple[Iterator[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(messages, spam_reports, feedback) aus MongoDB oder NDJSON-Dateien"""
+    projection = {"_id": 0, "chat_id": 1, "message_id": 1}
+    if args.mongodb_url:
+        from pymongo import MongoClient
+
+        database = MongoClient(args.mongodb_url)[DATABASE_NAME]
+        messages = database.messages.find(
+            {"is_whitelisted": {"$ne": True}},
+            {**projection, "message": 1, "has_media": 1, "is_new_user": 1}
+        ).batch_size(config.EXPORT_BATCH_SIZE)
+        spam_reports = list(database.spam_reports.find({}, projection))
+        feedback = list(database.feedback.find({}, {**projection, "label": 1, "message": 1}))
+        return messages, spam_reports, feedback
+
+    messages = (doc for doc in _read_ndjson(args.messages) if not doc.get("is_whitelisted"))
+    return messages, list(_read_ndjson(args.spam_reports)), list(_read_ndjson(args.feedback))
+
+
+def extract_features(args):
+    """Feature-Matrix, Labels und Gewichte einmal aus der Historie berechnen"""
+    np = _require_numpy()
+    from spam_detector import SpamDetector
+
+    # Gelernte Keywords im aktuellen Stand, wie sie der Live-Detector sieht
+    detector = SpamDetector()
+    _load_learned_keywords(detector, args)
+
+    messages, spam_reports, feedback = _load_documents(args)
+    flagged = {(doc.get("chat_id"), doc.get("message_id")) for doc in spam_reports}
+    # Letztes Admin-Label pro Nachricht gewinnt (Export ist nach Zeit sortiert)
+    admin_labels = {(doc.get("chat_id"), doc.get("message_id")): doc for doc in feedback}
+
+    rows, labels, is_admin = [], [], []
+
+    def add(text: str, has_media: bool, is_new_user: bool, label: int, admin: bool):
+        rows.append((
+            detector.has_suspicious_links(text)[0],
+            len(detector.contains_spam_keywords(text)),
+            detector.count_emojis(text),
+            detector.has_links(text),
+            detector.has_excessive_caps(text),
+            detector.has_repeated_chars(text),
+            has_media,
+            is_new_user,
+        ))
+        labels.append(label)
+        is_admin.append(admin)
+
+    seen = set()
+    for doc in messages:
+        key = (doc.get("chat_id"), doc.get("message_id"))
+        text = doc.get("message") or ""
+        if not text or key in seen:
+            continue
+        seen.add(key)
+        admin = admin_labels.get(key)
+        if admin is not None:
+            add(text, bool(doc.get("has_media")), bool(doc.get("is_new_user")), int(admin["label"] == "spam"), True)
+        elif not args.admin_only:
+            add(text, bool(doc.get("has_media")), bool(doc.get("is_new_user")), int(key in flagged), False)
+
+    # Feedback zu Nachrichten, die nicht (mehr) in `messages` liegen (Retention)
+    for key, doc in admin_labels.items():
+        if key not in seen and doc.get("message"):
+            add(doc["message"], False, False, int(doc["label"] == "spam"), True)
+
+    return (
+        np.array(rows, dtype=np.int32).reshape(-1, len(FEATURES)),
+        np.array(labels, dtype=np.int8),
+        np.array(is_admin, dtype=bool),
+    )
+
+
+# ===== Vektorisierte Bewertung =====
+
+class Dataset:
+    """Feature-Spalten einmal als Arrays vorbereitet (Bewertung ohne Python-Schleife)"""
+
+    def __init__(self, features, labels, sample_weights):
+        np = _require_numpy()
+        self.np = np
+        self.size = len(labels)
+        self.suspicious = features[:, SUSPICIOUS].astype(bool)
+        self.keywords = features[:, KEYWORDS].astype(np.int64)
+        self.emojis = features[:, EMOJIS]
+        self.links = features[:, LINKS].astype(bool)
+        self.caps = features[:, CAPS].astype(bool)
+        self.repeated = features[:, REPEATED].astype(bool)
+        self.media = features[:, MEDIA].astype(bool)
+        self.new_user = features[:, NEW_USER].astype(bool)
+        self.positive = sample_weights * (labels == 1)
+        self.negative = sample_weights * (labels == 0)
+        self.total_positive = float(self.positive.sum())
+        # Fest pro Datensatz: Regel 6 (neuer User mit Keywords oder Links)
+        self.new_user_suspicious = self.new_user & ((self.keywords > 0) | self.links)
+
+    def scores(self, weights: Dict[str, int], thresholds: Dict[str, float]):
+        """Score aller Nachrichten, identisch zu SpamDetector.detect_spam"""
+        np = self.np
+        keyword_threshold = np.where(
+            self.media, thresholds["media_keyword"],
+            np.where(self.new_user, thresholds["new_user_keyword"], thresholds["keyword"])
+        )
+        score = self.suspicious * weights["suspicious_link"]
+        score = score + (self.keywords >= keyword_threshold) * (weights["keywords_base"] + weights["keyword_each"] * self.keywords)
+        score = score + ((self.emojis > thresholds["emoji"]) & self.links) * weights["emoji_links"]
+        score = score + self.caps * weights["caps"] + self.repeated * weights["repeated_chars"]
+        score = score + self.new_user_suspicious * weights["new_user"]
+        score = score + (self.media & (self.keywords >= thresholds["media_keyword"])) * weights["media_keywords"]
+        return score.astype(np.int64)
+
+    def metrics(self, scores, cutoff: int) -> Dict[str, float]:
+        spam = scores >= cutoff
+        tp = float(self.positive[spam].sum())
+        fp = float(self.negative[spam].sum())
+        return _metrics(tp, fp, self.total_positive)
+
+    def best_cutoff(self, scores, min_precision: float) -> Tuple[Tuple[float, ...], int, Dict[str, float]]:
+        """
+        Beste Score-Schwelle über alle Schwellen gleichzeitig (bincount +
+        kumulierte Summen). Rangfolge: Präzision erfüllt, dann Recall, dann F1.
+        """
+        np = self.np
+        size = int(scores.max()) + 1 if self.size else 1
+        tp = np.bincount(scores, weights=self.positive, minlength=size)[::-1].cumsum()[::-1]
+        fp = np.bincount(scores, weights=self.negative, minlength=size)[::-1].cumsum()[::-1]
+        # Schwelle 0 würde alles als Spam werten
+        tp, fp = tp[1:], fp[1:]
+        if not len(tp):
+            return (0.0, 0.0, 0.0), 1, _metrics(0, 0, self.total_positive)
+
+        flagged = tp + fp
+        precision = np.divide(tp, flagged, out=np.zeros_like(tp), where=flagged > 0)
+        recall = tp / self.total_positive if self.total_positive else np.zeros_like(tp)
+        f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(tp), where=(precision + recall) > 0)
+        valid = precision >= min_precision
+
+        # Lexikografisch: gültig > Recall (bzw. Präzision, falls ungültig) > F1
+        primary = np.where(valid, recall, precision)
+        order = np.lexsort((f1, primary, valid))
+        best = int(order[-1])
+        objective = (float(valid[best]), float(primary[best]), float(f1[best]))
+        return objective, best + 1, _metrics(float(tp[best]), float(fp[best]), self.total_positive)
+
+
+def _metrics(tp: float, fp: float, total_positive: float) -> Dict[str, float]:
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / total_positive if total_positive else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1, "flagged": tp + fp}
+
+
+def tune(
+    dataset: Dataset,
+    weights: Dict[str, int],
+    thresholds: Dict[str, float],
+    min_precision: float,
+    passes: int
+) -> Tuple[Dict[str, int], Dict[str, float], int, Dict[str, float], int]:
+    """Koordinatenweise Rastersuche ab der aktuellen Konfiguration"""
+    weights, thresholds = dict(weights), dict(thresholds)
+    best, cutoff, metrics = dataset.best_cutoff(dataset.scores(weights, thresholds), min_precision)
+    evaluations = 1
+
+    for _ in range(passes):
+        improved = False
+        parameters = [(weights, name, WEIGHT_GRID) for name in weights]
+        parameters += [(thresholds, name, grid) for name, grid in THRESHOLD_GRID.items()]
+        for target, name, grid in parameters:
+            current = target[name]
+            for value in grid:
+                if value == current:
+                    continue
+                target[name] = value
+                objective, value_cutoff, value_metrics = dataset.best_cutoff(
+                    dataset.scores(weights, thresholds), min_precision
+                )
+                evaluations += 1
+                if objective > best:
+                    best, cutoff, metrics, current = objective, value_cutoff, value_metrics, value
+                    improved = True
+            target[name] = current
+        if not improved:
+            break
+
+    return weights, thresholds, cutoff, metrics, evaluations
+
+
+def _format(metrics: Dict[str, float]) -> str:
+    return (
+        f"Präzision {metrics['precision']:.4f}  Recall {metrics['recall']:.4f}  "
+        f"F1 {metrics['f1']:.4f}  markiert {metrics['flagged']:.0f}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Gewichte und Schwellen von detect_spam offline tunen")
+    # Bewusst ohne MONGODB_URL aus der Umgebung: sonst würden NDJSON-Exporte stillschweigend ignoriert
+    parser.add_argument("--mongodb-url", help="Historie direkt aus MongoDB (nicht zusammen mit --messages/--feedback)")
+    parser.add_argument("--messages", help="NDJSON-Export von messages")
+    parser.add_argument("--spam-reports", help="NDJSON-Export von spam_reports")
+    parser.add_argument("--feedback", help="NDJSON-Export von feedback (Admin-Labels)")
+    parser.add_argument("--features", help="Feature-Cache (.npz): vorhanden = laden, sonst nach Extraktion schreiben")
+    parser.add_argument("--admin-only", action="store_true", help="Nur Nachrichten mit Admin-Label verwenden")
+    parser.add_argument("--admin-weight", type=float, default=5.0, help="Gewicht eines Admin-Labels")
+    parser.add_argument("--min-precision", type=float, default=0.99, help="Mindest-Präzision (False Positives löschen echte Nachrichten)")
+    parser.add_argument("--passes", type=int, default=5, help="Maximale Durchläufe der Rastersuche")
+    parser.add_argument("--name", default="tuned", help="Name des Kandidaten")
+    parser.add_argument("--output", default="candidate.json", help="Kandidaten-Datei für SHADOW_CANDIDATE_PATH")
+    args = parser.parse_args()
+    if args.mongodb_url and (args.messages or args.spam_reports or args.feedback):
+        parser.error("--mongodb-url und --messages/--spam-reports/--feedback schließen sich aus")
+    np = _require_numpy()
+
+    started = time.perf_counter()
+    if args.features and os.path.exists(args.features):
+        with np.load(args.features) as cached:
+            features, labels, is_admin = cached["features"], cached["labels"], cached["is_admin"]
+        print(f"📦 Features aus {args.features} geladen ({len(labels)} Nachrichten)")
+    else:
+        if not (args.mongodb_url or args.messages or args.feedback):
+            parser.error("--mongodb-url, --messages/--feedback oder ein vorhandener --features-Cache nötig")
+        features, labels, is_admin = extract_features(args)
+        print(f"🔍 Features extrahiert: {len(labels)} Nachrichten in {time.perf_counter() - started:.1f} s")
+        if args.features:
+            np.savez_compressed(args.features, features=features, labels=labels, is_admin=is_admin)
+
+    if args.admin_only:
+        features, labels, is_admin = features[is_admin], labels[is_admin], is_admin[is_admin]
+    if not len(labels) or not labels.any():
+        print("❌ Keine (Spam-)Labels in der Historie")
+        return 1
+
+    sample_weights = np.where(is_admin, args.admin_weight, 1.0)
+    dataset = Dataset(features, labels, sample_weights)
+    print(
+        f"🏷️ {int(labels.sum())} Spam / {int((labels == 0).sum())} Ham, "
+        f"davon {int(is_admin.sum())} mit Admin-Label"
+    )
+
+    baseline_weights = dict(config.SPAM_WEIGHTS)
+    baseline_thresholds = {
+        "keyword": config.SPAM_KEYWORD_THRESHOLD,
+        "new_user_keyword": config.NEW_USER_KEYWORD_THRESHOLD,
+        "media_keyword": config.MEDIA_KEYWORD_THRESHOLD,
+        "emoji": config.EMOJI_THRESHOLD,
+    }
+    baseline = dataset.metrics(dataset.scores(baseline_weights, baseline_thresholds), config.SPAM_SCORE_THRESHOLD)
+
+    tune_started = time.perf_counter()
+    weights, thresholds, cutoff, metrics, evaluations = tune(
+        dataset, baseline_weights, baseline_thresholds, args.min_precision, args.passes
+    )
+    print(f"⚙️ {evaluations} Kombinationen in {time.perf_counter() - tune_started:.1f} s bewertet")
+    print(f"\n   Aktuell:   {_format(baseline)}")
+    print(f"   Kandidat:  {_format(metrics)}")
+
+    changed_weights = {k: v for k, v in weights.items() if v != config.SPAM_WEIGHTS[k]}
+    changed_thresholds = {k: v for k, v in thresholds.items() if v != baseline_thresholds[k]}
+    if cutoff != config.SPAM_SCORE_THRESHOLD:
+        changed_thresholds["score"] = cutoff
+
+    candidate = {
+        "name": args.name,
+        "weights": weights,
+        "thresholds": {**thresholds, "score": cutoff},
+        "metrics": {
+            "labels": int(len(labels)),
+            "admin_labels": int(is_admin.sum()),
+            "min_precision": args.min_precision,
+            "baseline": baseline,
+            "candidate": metrics,
+        },
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(candidate, f, indent=2, ensure_ascii=False)
+
+    changes = {**changed_weights, **changed_thresholds}
+    print(f"\n📝 Änderungen: {json.dumps(changes, ensure_ascii=False) if changes else '-'}")
+    print(f"✅ Kandidat geschrieben: {args.output} (SHADOW_CANDIDATE_PATH={args.output}, dann /shadow)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
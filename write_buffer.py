@@ -0,0 +1,157 @@
+"""
+Write-Behind Buffer für gebündelte Datenbank-Inserts
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+FlushFunc = Callable[[str, List[Dict[str, Any]]], Awaitable[None]]
+
+
+class WriteBehindBuffer:
+    """
+    Sammelt Dokumente pro Collection und schreibt sie gebündelt weg.
+
+    Geflusht wird, sobald eine Collection `batch_size` Dokumente erreicht
+    oder spätestens alle `flush_interval` Sekunden. Die Gesamtgröße ist auf
+    `max_size` begrenzt; bei voller Queue werden neue Dokumente je nach
+    `policy` verworfen ("drop") oder der Aufrufer wartet ("block").
+    """
+
+    def __init__(
+        self,
+        flush_func: FlushFunc,
+        max_size: int = config.WRITE_BUFFER_MAX_SIZE,
+        batch_size: int = config.WRITE_BUFFER_BATCH_SIZE,
+        flush_interval: float = config.WRITE_BUFFER_FLUSH_INTERVAL,
+        policy: str = config.WRITE_BUFFER_POLICY
+    ):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unbekannte Backpressure-Policy: {policy}")
+
+        self._flush_func = flush_func
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._size = 0
+        self._flush_requested = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._flush_lock = asyncio.Lock()
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metriken
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    async def add(self, collection: str, doc: Dict[str, Any]) -> bool:
+        """Dokument einreihen; False wenn es wegen voller Queue verworfen wurde"""
+        while self._size >= self.max_size:
+            if self.policy == "drop":
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"⚠️ Write-Buffer voll - {self.dropped} Dokumente verworfen")
+                return False
+
+            # Block: auf Platz nach dem nächsten Flush warten
+            self._not_full.clear()
+            self._flush_requested.set()
+            await self._not_full.wait()
+
+        buffer = self._buffers.setdefault(collection, [])
+        buffer.append(doc)
+        self._size += 1
+        self.enqueued += 1
+
+        if len(buffer) >= self.batch_size:
+            self._flush_requested.set()
+
+        return True
+
+    def start(self):
+        """Startet den periodischen Flush-Task"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stoppt den Flush-Task und schreibt alle verbleibenden Dokumente"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            # Laufenden Flush bei stop() nicht abbrechen (sonst gehen Dokumente verloren)
+            await asyncio.shield(self.flush())
+
+    async def flush(self):
+        """Alle gepufferten Dokumente wegschreiben"""
+        async with self._flush_lock:
+            if not self._size:
+                return
+
+            buffers, self._buffers = self._buffers, {}
+
+            for collection, docs in buffers.items():
+                for i in range(0, len(docs), self.batch_size):
+                    chunk = docs[i:i + self.batch_size]
+                    start = time.perf_counter()
+                    try:
+                        await self._flush_func(collection, chunk)
+                        self.flushed += len(chunk)
+                    except Exception as e:
+                        self.flush_errors += 1
+                        logger.error(f"❌ Fehler beim Schreiben von {len(chunk)} Dokumenten in {collection}: {e}")
+                    finally:
+                        elapsed_ms = (time.perf_counter() - start) * 1000
+                        self.flush_count += 1
+                        self.last_flush_ms = elapsed_ms
+                        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                        self._total_flush_ms += elapsed_ms
+
+                        self._size -= len(chunk)
+                        self._not_full.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Queue-Tiefe und Flush-Latenzen für /health"""
+        return {
+            "queue_depth": self._size,
+            "max_size": self.max_size,
+            "policy": self.policy,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / max(self.flush_count, 1), 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }